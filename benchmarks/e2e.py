@@ -0,0 +1,344 @@
+"""Benchmarks the pipeline end to end against a local stub LLM and image search.
+
+Runs ``process_prompt`` (the Gradio pipeline), ``POST /generate-animation`` and
+``POST /generate-pdf-scene`` at each concurrency level and render quality and
+reports throughput, p50/p95 latency, mean render time and peak RSS. The model and the image search
+are replaced by ``benchmarks.stubs``, so the numbers measure this code and the
+renderer, not a provider. Rendering still needs manim (or RENDER_BACKEND=cli
+with any ``manim`` on PATH).
+
+Every (scenario, quality, concurrency) runs in a fresh process with empty caches,
+so results do not depend on the order of the runs. Results are saved as JSON;
+pass an earlier file to ``--compare`` to print the change of every metric.
+
+Usage:
+    python benchmarks/e2e.py --concurrency 1,4 --requests 8
+    python benchmarks/e2e.py --scenarios generate_animation --qualities preview,1080p60
+    python benchmarks/e2e.py --compare benchmarks/results/e2e-<time>.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from importlib import resources
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ("process_prompt", "generate_animation", "generate_pdf_scene")
+DEFAULT_OUTPUT_DIR = os.path.join(ROOT, "benchmarks", "results")
+PROMPT = "Explain the Fourier transform"
+# Scenarios that render videos, and so run once per quality
+RENDER_SCENARIOS = ("process_prompt", "generate_animation")
+STUB_MODEL = "openai/stub"
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile, None for no values."""
+
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * fraction) - 1)]
+
+
+def prompts(count: int, warm: bool) -> List[str]:
+    # Distinct prompts keep every request a cache miss, unless measuring caches
+    return [PROMPT if warm else f"{PROMPT} (request {index})" for index in range(count)]
+
+
+def run_process_prompt(count: int, concurrency: int, warm: bool) -> List[tuple]:
+    from manimator.gradio_app import process_prompt
+
+    def one(prompt):
+        started = time.perf_counter()
+        try:
+            *_, (video, _, status) = process_prompt(prompt)
+            error = None if video else status.splitlines()[0]
+        except Exception as e:
+            error = type(e).__name__
+        return time.perf_counter() - started, error
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, prompts(count, warm)))
+
+
+async def _post_all(requests: list, concurrency: int) -> List[tuple]:
+    import httpx
+
+    from manimator import main
+
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+
+        async def one(path, kwargs):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(path, **kwargs)
+                    error = None if response.is_success else str(response.status_code)
+                except Exception as e:
+                    error = type(e).__name__
+                return time.perf_counter() - started, error
+
+        results = await asyncio.gather(*(one(*request) for request in requests))
+    # Wait for the job workers to exit so that their peak RSS is accounted
+    if main.job_queue._executor is not None:
+        main.job_queue._executor.shutdown(wait=True)
+    main.pdf_workers.shutdown()
+    return results
+
+
+def run_generate_animation(count: int, concurrency: int, warm: bool) -> List[tuple]:
+    requests = [
+        ("/generate-animation", {"json": {"prompt": prompt}})
+        for prompt in prompts(count, warm)
+    ]
+    return asyncio.run(_post_all(requests, concurrency))
+
+
+def run_generate_pdf_scene(count: int, concurrency: int, warm: bool) -> List[tuple]:
+    pdf = (resources.files("manimator.few_shot") / "few_shot_1.pdf").read_bytes()
+    requests = []
+    for index in range(count):
+        # Trailing bytes after %%EOF are ignored by readers but change the hash
+        content = pdf if warm else pdf + f"\n%bench-{index}\n".encode()
+        files = {"file": ("paper.pdf", content, "application/pdf")}
+        requests.append(("/generate-pdf-scene", {"files": files}))
+    return asyncio.run(_post_all(requests, concurrency))
+
+
+def run_worker(scenario: str, concurrency: int, count: int, warm: bool) -> dict:
+    from manimator.utils import metrics
+    from manimator.utils.schema import resolve_quality
+
+    runner = globals()[f"run_{scenario}"]
+    started = time.perf_counter()
+    results = runner(count, concurrency, warm)
+    wall = time.perf_counter() - started
+
+    latencies = [seconds for seconds, error in results if error is None]
+    errors = {}
+    for _, error in results:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+    backend = os.getenv("RENDER_BACKEND") or "warm"
+    quality = resolve_quality() if scenario in RENDER_SCENARIOS else None
+    renders, render_seconds = metrics.histogram_value(
+        "stage_duration_seconds", stage="render", backend=backend, quality=quality
+    )
+    # ru_maxrss is in KiB on Linux; children covers job, PDF and manim processes
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "quality": quality,
+        "requests": count,
+        "ok": len(latencies),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 4),
+        "p50_seconds": percentile(latencies, 0.5),
+        "p95_seconds": percentile(latencies, 0.95),
+        "renders": int(renders),
+        "render_seconds_mean": round(render_seconds / renders, 3) if renders else None,
+        "peak_rss_mib": round(own, 1),
+        "peak_children_rss_mib": round(children, 1),
+    }
+
+
+def worker_env(stub_url: str, cache_dir: str, quality: Optional[str]) -> dict:
+    env = dict(os.environ)
+    env.update(
+        {
+            "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")])),
+            "OPENAI_API_BASE": f"{stub_url}/v1",
+            "OPENAI_API_KEY": "stub",
+            "CODE_GEN_MODEL": STUB_MODEL,
+            "PROMPT_SCENE_GEN_MODEL": STUB_MODEL,
+            "PDF_SCENE_GEN_MODEL": STUB_MODEL,
+            "IMAGE_SEARCH_BACKEND": "benchmarks.stubs:search",
+            "BENCH_STUB_URL": stub_url,
+        }
+    )
+    for name in (
+        "PIPELINE_CACHE_DIR",
+        "RENDER_CACHE_DIR",
+        "ARTIFACT_DIR",
+        "ASSET_DIR",
+        "PROJECT_MEDIA_DIR",
+        "TEX_CACHE_DIR",
+        "ARXIV_CACHE_DIR",
+    ):
+        env[name] = os.path.join(cache_dir, name.lower())
+    if quality:
+        env["RENDER_QUALITY"] = quality
+    return env
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: List[dict], baseline: Optional[dict] = None) -> None:
+    columns = (
+        ("throughput_rps", "req/s"),
+        ("p50_seconds", "p50 s"),
+        ("p95_seconds", "p95 s"),
+        ("render_seconds_mean", "render s"),
+        ("peak_rss_mib", "rss MiB"),
+        ("peak_children_rss_mib", "child MiB"),
+    )
+    header = f"{'scenario':<20} {'quality':<8} {'conc':>4} {'ok':>7}"
+    print(header + "".join(f" {title:>16}" for _, title in columns))
+
+    def run_key(result):
+        return result["scenario"], result.get("quality"), result["concurrency"]
+
+    previous = {run_key(result): result for result in (baseline or {}).get("results", [])}
+    for result in results:
+        line = (
+            f"{result['scenario']:<20} {result['quality'] or '-':<8} "
+            f"{result['concurrency']:>4} {result['ok']:>3}/{result['requests']:<3}"
+        )
+        old = previous.get(run_key(result), {})
+        for key, _ in columns:
+            value = result.get(key)
+            cell = "-" if value is None else f"{value:.2f}"
+            if old.get(key) and value is not None:
+                cell += f" ({(value - old[key]) / old[key]:+.0%})"
+            line += f" {cell:>16}"
+        print(line)
+        if result["errors"]:
+            print(f"{'':<20} errors: {result['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,4")
+    parser.add_argument(
+        "--qualities", default="preview", help="Render quality tiers to compare"
+    )
+    parser.add_argument("--requests", type=int, default=8, help="Requests per run")
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.5, help="Seconds per stub completion"
+    )
+    parser.add_argument(
+        "--warm", action="store_true", help="Repeat one prompt/PDF to measure caches"
+    )
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--worker", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        scenario, concurrency = args.worker
+        result = run_worker(scenario, int(concurrency), args.requests, args.warm)
+        print(json.dumps(result))
+        return
+
+    from benchmarks.stubs import StubServer
+    from manimator.utils.schema import QUALITY_TIERS
+
+    scenarios = args.scenarios.split(",")
+    for scenario in scenarios:
+        if scenario not in SCENARIOS:
+            parser.error(f"Unknown scenario {scenario!r}, expected one of {SCENARIOS}")
+    levels = [int(level) for level in args.concurrency.split(",")]
+    qualities = args.qualities.split(",")
+    for quality in qualities:
+        if quality not in QUALITY_TIERS:
+            parser.error(
+                f"Unknown quality {quality!r}, expected one of {tuple(QUALITY_TIERS)}"
+            )
+    runs = [
+        (scenario, quality, concurrency)
+        for scenario in scenarios
+        for quality in (qualities if scenario in RENDER_SCENARIOS else [None])
+        for concurrency in levels
+    ]
+
+    stub = StubServer(latency=args.llm_latency).start()
+    results = []
+    try:
+        for scenario, quality, concurrency in runs:
+            with tempfile.TemporaryDirectory(prefix="manimator-bench-") as cache:
+                command = [
+                    sys.executable,
+                    __file__,
+                    "--worker",
+                    scenario,
+                    str(concurrency),
+                    "--requests",
+                    str(args.requests),
+                ]
+                if args.warm:
+                    command.append("--warm")
+                process = subprocess.run(
+                    command,
+                    env=worker_env(stub.url, cache, quality),
+                    cwd=cache,
+                    capture_output=True,
+                    text=True,
+                )
+            if process.returncode:
+                sys.stderr.write(process.stderr)
+                raise SystemExit(
+                    f"{scenario} at {quality or 'default'} quality and "
+                    f"concurrency {concurrency} failed"
+                )
+            results.append(json.loads(process.stdout.strip().splitlines()[-1]))
+    finally:
+        stub.stop()
+
+    started_at = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    report = {
+        "started_at": started_at,
+        "commit": git_commit(),
+        "config": {
+            "requests": args.requests,
+            "llm_latency": args.llm_latency,
+            "warm": args.warm,
+            "render_backend": os.getenv("RENDER_BACKEND") or "warm",
+        },
+        "results": results,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"e2e-{started_at}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {path}")
+
+
+if __name__ == "__main__":
+    main()
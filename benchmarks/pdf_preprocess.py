@@ -0,0 +1,67 @@
+"""Benchmarks PDF preprocessing: bytes sent to the model and peak RSS per mode.
+
+Every (paper, mode) pair runs in a fresh process, so peak RSS is not polluted
+by earlier runs.
+
+Usage:
+    python benchmarks/pdf_preprocess.py paper.pdf [other.pdf ...]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_one(path: str, mode: str) -> dict:
+    from manimator.utils.pdf_preprocess import content_size, prepare_pdf_content
+
+    with open(path, "rb") as f:
+        pdf = f.read()
+    started = time.perf_counter()
+    content = prepare_pdf_content(pdf, mode=mode)
+    seconds = time.perf_counter() - started
+    return {
+        "input_bytes": len(pdf),
+        "sent_bytes": content_size(content),
+        "seconds": seconds,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--modes", default="full,pages,text")
+    parser.add_argument("--worker", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_one(*args.worker)))
+        return
+
+    print(f"{'paper':<30} {'mode':<6} {'input':>12} {'sent':>12} {'secs':>7} {'rss MiB':>8}")
+    for path in args.pdfs:
+        for mode in args.modes.split(","):
+            output = subprocess.run(
+                [sys.executable, __file__, path, "--worker", path, mode],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{os.path.basename(path)[:30]:<30} {mode:<6} "
+                f"{result['input_bytes']:>12,} {result['sent_bytes']:>12,} "
+                f"{result['seconds']:>7.2f} {result['peak_rss_mib']:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
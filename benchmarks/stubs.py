@@ -0,0 +1,218 @@
+"""Local stand-ins for the LLM provider and the image search, for benchmarks.
+
+``StubServer`` speaks enough of the OpenAI chat completions API (including
+streaming) for litellm's ``openai/`` provider, and serves generated images.
+Responses are canned from the repo's own few-shot examples, so the pipeline
+does the same parsing, validation and rendering work as with a real model.
+
+Point the pipeline at it with:
+    OPENAI_API_BASE=http://127.0.0.1:<port>/v1
+    CODE_GEN_MODEL=PROMPT_SCENE_GEN_MODEL=PDF_SCENE_GEN_MODEL=openai/stub
+    IMAGE_SEARCH_BACKEND=benchmarks.stubs:search
+    BENCH_STUB_URL=http://127.0.0.1:<port>
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from manimator.few_shot.few_shot_prompts import PDF_EXAMPLE_ANSWER, SCENE_EXAMPLES
+from manimator.utils.system_prompts import (
+    IMAGE_EXTRACTION_SYSTEM_PROMPT,
+    MANIM_SYSTEM_PROMPT,
+)
+
+STREAM_CHUNKS = 20
+
+SCENE_ANSWER = SCENE_EXAMPLES[1]["content"]
+IMAGE_QUERIES = json.dumps(
+    [
+        {
+            "image_title": "Fourier series",
+            "search_query": "intitle:Fourier series site:wikipedia",
+        }
+    ]
+)
+CODE_ANSWER = '''```python
+from manim import *
+
+
+class BenchmarkScene(Scene):
+    def construct(self):
+        title = Text("Fourier Transform").to_edge(UP)
+        self.play(Write(title))
+        circle = Circle(radius=1.5, color=BLUE)
+        wave = FunctionGraph(lambda x: np.sin(2 * x), x_range=[-4, 4], color=YELLOW)
+        self.play(Create(circle))
+        self.play(Transform(circle, wave))
+{image}        self.wait(1)
+        self.play(FadeOut(title), FadeOut(circle))
+```'''
+IMAGE_CODE = """        image = ImageMobject("asset_0.png").scale(0.5).to_corner(DR)
+        self.play(FadeIn(image))
+        self.play(FadeOut(image))
+"""
+
+
+def _text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") for part in content or [])
+
+
+def canned_answer(messages: list) -> str:
+    """Picks the canned answer for a chat request from its system prompt."""
+
+    system = _text(messages[0]["content"]) if messages else ""
+    if system == MANIM_SYSTEM_PROMPT:
+        wants_image = "asset_0.png" in _text(messages[-1]["content"])
+        return CODE_ANSWER.format(image=IMAGE_CODE if wants_image else "")
+    if system == IMAGE_EXTRACTION_SYSTEM_PROMPT:
+        return IMAGE_QUERIES
+    if any(not isinstance(m["content"], str) for m in messages[1:]):
+        return PDF_EXAMPLE_ANSWER
+    return SCENE_ANSWER
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "StubServer"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path.startswith("/images/"):
+            self._send(200, self.server.image, "image/png")
+        else:
+            self._send(404, b"", "text/plain")
+
+    def do_POST(self) -> None:
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if not self.path.endswith("/chat/completions"):
+            self._send(404, b"", "text/plain")
+            return
+        answer = canned_answer(request["messages"])
+        usage = {
+            "prompt_tokens": len(json.dumps(request["messages"])) // 4,
+            "completion_tokens": len(answer) // 4,
+            "total_tokens": (len(json.dumps(request["messages"])) + len(answer)) // 4,
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        latency = self.server.latency
+
+        if not request.get("stream"):
+            time.sleep(latency)
+            body = {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": answer},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+            self._send(200, json.dumps(body).encode(), "application/json")
+            return
+
+        # Half of the latency before the first token, the rest spread out
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        time.sleep(latency / 2)
+        size = -(-len(answer) // STREAM_CHUNKS)
+        for start in range(0, len(answer), size):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": answer[start : start + size]},
+                        "finish_reason": None,
+                    }
+                ],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(latency / 2 / STREAM_CHUNKS)
+        if (request.get("stream_options") or {}).get("include_usage"):
+            # Like OpenAI, usage comes in a final chunk without choices
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request["model"],
+                "choices": [],
+                "usage": usage,
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class StubServer(ThreadingHTTPServer):
+    """OpenAI compatible chat completions and image stub, in a background thread.
+
+    Args:
+        latency (float): Seconds each completion takes
+        port (int): Port to listen on, 0 picks a free one
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.5, port: int = 0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.image = _png()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def _png() -> bytes:
+    from PIL import Image
+
+    output = io.BytesIO()
+    Image.new("RGB", (640, 480), (40, 90, 160)).save(output, format="PNG")
+    return output.getvalue()
+
+
+def search(query: str) -> str:
+    """Image search backend returning an image of the stub server for a query."""
+
+    digest = hashlib.sha256(query.encode("utf-8")).hexdigest()[:12]
+    return f"{os.environ['BENCH_STUB_URL']}/images/{digest}.png"
@@ -2,17 +2,62 @@ import litellm
 from fastapi import HTTPException
 from dotenv import load_dotenv
 import os
+from typing import Callable, Optional
 
+from manimator.utils.helpers import build_messages, collect_stream, stream_options
+from manimator.utils import metrics
+from manimator.utils.prompt_cache import record_usage
 from manimator.utils.system_prompts import MANIM_SYSTEM_PROMPT
 
 load_dotenv()
 
+# Static message prefix shared by all requests, see ``build_messages``
+ANIMATION_PREFIX = ({"role": "system", "content": MANIM_SYSTEM_PROMPT},)
 
-def generate_animation_response(prompt: str, image_prompt) -> str:
+REPAIR_PROMPT = """The code above failed to render with this error:
+
+{error}
+
+Fix the error and return the complete corrected scene in a single ```python code block. Keep the scene class name and change only what is needed to fix the error."""
+
+
+def build_animation_messages(
+    prompt: str, image_prompt="", model: Optional[str] = None
+) -> list:
+    """Build the chat messages for Manim code generation.
+
+    Args:
+        prompt (str): Text description of the desired animation
+        image_prompt: Downloaded images available to the animation, if any
+        model (Optional[str]): Model the messages are sent to, see
+            ``build_messages``
+
+    Returns:
+        list: Messages for the code generation model
+    """
+
+    return build_messages(
+        ANIMATION_PREFIX,
+        {
+            "role": "user",
+            "content": f"{prompt} \n {image_prompt}\n\n NOTE!!!: Make sure the objects or text in the generated code are not overlapping at any point in the video. Make sure that each scene is properly cleaned up before transitioning to the next scene.",
+        },
+        model=model,
+    )
+
+
+def generate_animation_response(
+    prompt: str,
+    image_prompt="",
+    on_token: Optional[Callable[[str], None]] = None,
+) -> str:
     """Generate Manim animation code from a text prompt.
 
     Args:
         prompt (str): Text description of the desired animation
+        image_prompt: Downloaded images available to the animation, if any
+        on_token (Optional[Callable[[str], None]]): If given, the response is
+            streamed and every token is passed to it as soon as it arrives
 
     Returns:
         str: Generated Manim Python code
@@ -23,20 +68,123 @@ def generate_animation_response(prompt: str, image_prompt) -> str:
     """
 
     try:
-        messages = [
-            {
-                "role": "system",
-                "content": MANIM_SYSTEM_PROMPT,
-            },
-            {
-                "role": "user",
-                "content": f"{prompt} \n {image_prompt}\n\n NOTE!!!: Make sure the objects or text in the generated code are not overlapping at any point in the video. Make sure that each scene is properly cleaned up before transitioning to the next scene.",
-            },
-        ]
-    
-        response = litellm.completion(
-            model=os.getenv("CODE_GEN_MODEL"), messages=messages, num_retries=2
+        model = os.getenv("CODE_GEN_MODEL")
+        with metrics.span("llm", operation="code", model=model or ""):
+            response = litellm.completion(
+                model=model,
+                messages=build_animation_messages(prompt, image_prompt, model),
+                num_retries=2,
+                **stream_options(on_token),
+            )
+            if on_token is not None:
+                return collect_stream(
+                    response,
+                    on_token,
+                    lambda usage: record_usage(usage, "code", model),
+                )
+            record_usage(response.usage, "code", model)
+        return response.choices[0].message.content
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to generate animation response: {str(e)}"
         )
+
+
+def build_repair_messages(
+    code: str, error: str, prompt: str = "", model: Optional[str] = None
+) -> list:
+    """Build the chat messages asking the model to fix code that failed to render.
+
+    Args:
+        code (str): Manim code that failed to render
+        error (str): Trimmed render error, see ``trim_render_error``
+        prompt (str): Description the code was generated from, if known
+        model (Optional[str]): Model the messages are sent to, see
+            ``build_messages``
+
+    Returns:
+        list: Messages for the code generation model
+    """
+
+    return build_messages(
+        ANIMATION_PREFIX,
+        {"role": "user", "content": prompt or "Write a Manim scene."},
+        {"role": "assistant", "content": f"```python\n{code}\n```"},
+        {"role": "user", "content": REPAIR_PROMPT.format(error=error)},
+        model=model,
+    )
+
+
+def repair_animation_response(
+    code: str,
+    error: str,
+    prompt: str = "",
+    on_token: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Ask ``CODE_GEN_MODEL`` to fix Manim code that failed to render.
+
+    Args:
+        code (str): Manim code that failed to render
+        error (str): Trimmed render error
+        prompt (str): Description the code was generated from, if known
+        on_token (Optional[Callable[[str], None]]): If given, the response is
+            streamed and every token is passed to it as soon as it arrives
+
+    Returns:
+        str: Model response with the fixed code
+
+    Raises:
+        HTTPException: If the request fails, returns 500 status code with
+            error details
+    """
+
+    try:
+        model = os.getenv("CODE_GEN_MODEL")
+        with metrics.span("llm", operation="repair", model=model or ""):
+            response = litellm.completion(
+                model=model,
+                messages=build_repair_messages(code, error, prompt, model),
+                num_retries=2,
+                **stream_options(on_token),
+            )
+            if on_token is not None:
+                return collect_stream(
+                    response,
+                    on_token,
+                    lambda usage: record_usage(usage, "repair", model),
+                )
+            record_usage(response.usage, "repair", model)
+        return response.choices[0].message.content
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to repair animation code: {str(e)}"
+        )
+
+
+async def agenerate_animation_response(prompt: str, image_prompt="") -> str:
+    """Async variant of ``generate_animation_response`` using ``litellm.acompletion``.
+
+    Args:
+        prompt (str): Text description of the desired animation
+        image_prompt: Downloaded images available to the animation, if any
+
+    Returns:
+        str: Generated Manim Python code
+
+    Raises:
+        HTTPException: If code generation fails, returns 500 status code
+            with error details
+    """
+
+    try:
+        model = os.getenv("CODE_GEN_MODEL")
+        with metrics.span("llm", operation="code", model=model or ""):
+            response = await litellm.acompletion(
+                model=model,
+                messages=build_animation_messages(prompt, image_prompt, model),
+                num_retries=2,
+            )
+            record_usage(response.usage, "code", model)
         return response.choices[0].message.content
     except Exception as e:
         raise HTTPException(
@@ -1,21 +1,61 @@
 from fastapi import HTTPException
 import litellm
+import asyncio
 import os
 from dotenv import load_dotenv
 import ast
+import functools
 import json
-import requests
 import re
-from manimator.utils.helpers import compress_pdf
+from typing import Callable, Optional, Tuple, Union
+from manimator.utils.helpers import build_messages, collect_stream, stream_options
+from manimator.utils.pdf_preprocess import (
+    DEFAULT_PDF_MODE,
+    EmptyPdfError,
+    prepare_pdf_content,
+)
+from manimator.utils import metrics
+from manimator.utils.prompt_cache import record_usage
+from manimator.utils.images import SearchFn, fetch_images
 from manimator.utils.system_prompts import SCENE_SYSTEM_PROMPT, IMAGE_EXTRACTION_SYSTEM_PROMPT
-from manimator.few_shot.few_shot_prompts import SCENE_EXAMPLES, PDF_EXAMPLE
-
-from serpapi import GoogleSearch
+from manimator.few_shot.few_shot_prompts import SCENE_EXAMPLES, pdf_example
 
 load_dotenv()
 
+# Static message prefixes shared by all requests, see ``build_messages``
+SCENE_PREFIX = (
+    {"role": "system", "content": SCENE_SYSTEM_PROMPT},
+    *SCENE_EXAMPLES,
+)
+IMAGE_SEARCH_PREFIX = ({"role": "system", "content": IMAGE_EXTRACTION_SYSTEM_PROMPT},)
+
+
+@functools.lru_cache(maxsize=None)
+def pdf_prefix(mode: str) -> Tuple[dict, ...]:
+    """Returns the static message prefix of PDF requests prepared in ``mode``."""
+
+    return (SCENE_PREFIX[0], *pdf_example(mode))
 
-def process_prompt_scene(prompt: str) -> str:
+
+def build_prompt_scene_messages(prompt: str, model: Optional[str] = None) -> list:
+    """Build the chat messages for scene description generation.
+
+    Args:
+        prompt: The text prompt describing the desired scene
+        model: Model the messages are sent to, see ``build_messages``
+
+    Returns:
+        list: System prompt, few-shot examples and the user prompt
+    """
+
+    return build_messages(
+        SCENE_PREFIX, {"role": "user", "content": prompt}, model=model
+    )
+
+
+def process_prompt_scene(
+    prompt: str, on_token: Optional[Callable[[str], None]] = None
+) -> str:
     """Generate a scene description from a text prompt using LLM.
 
     This function takes a text prompt and generates a detailed scene description
@@ -24,6 +64,8 @@ def process_prompt_scene(prompt: str) -> str:
 
     Args:
         prompt: The text prompt describing the desired scene
+        on_token: If given, the response is streamed and every token is passed
+            to it as soon as it arrives
 
     Returns:
         str: Generated scene description
@@ -32,69 +74,129 @@ def process_prompt_scene(prompt: str) -> str:
         HTTPException: If the model fails to generate a description
     """
 
-    messages = [
-        {
-            "role": "system",
-            "content": SCENE_SYSTEM_PROMPT,
-        },
-    ]
-    messages.extend(SCENE_EXAMPLES)
-    messages.append(
-        {
-            "role": "user",
-            "content": prompt,
-        }
-    )
-    response = litellm.completion(
-        model=os.getenv("PROMPT_SCENE_GEN_MODEL"),
-        messages=messages,
-        num_retries=2,
-    )
+    model = os.getenv("PROMPT_SCENE_GEN_MODEL")
+    with metrics.span("llm", operation="scene_description", model=model or ""):
+        response = litellm.completion(
+            model=model,
+            messages=build_prompt_scene_messages(prompt, model),
+            num_retries=2,
+            **stream_options(on_token),
+        )
+        if on_token is not None:
+            return collect_stream(
+                response,
+                on_token,
+                lambda usage: record_usage(usage, "scene_description", model),
+            )
+        record_usage(response.usage, "scene_description", model)
     return response.choices[0].message.content
 
-def search_image_online(prompt: str)-> str:
-    messages = [
-        {
-            "role": "system",
-            "content": IMAGE_EXTRACTION_SYSTEM_PROMPT,
-        },
-    ]
-    messages.append(
-        {
-            "role": "user",
-            "content": prompt,
-        }
-    )
-    response = litellm.completion(
-        model=os.getenv("PROMPT_SCENE_GEN_MODEL"),
-        messages=messages,
-        num_retries=2,
+
+async def aprocess_prompt_scene(prompt: str) -> str:
+    """Async variant of ``process_prompt_scene`` using ``litellm.acompletion``.
+
+    Args:
+        prompt: The text prompt describing the desired scene
+
+    Returns:
+        str: Generated scene description
+
+    Raises:
+        HTTPException: If the model fails to generate a description
+    """
+
+    model = os.getenv("PROMPT_SCENE_GEN_MODEL")
+    with metrics.span("llm", operation="scene_description", model=model or ""):
+        response = await litellm.acompletion(
+            model=model,
+            messages=build_prompt_scene_messages(prompt, model),
+            num_retries=2,
+        )
+        record_usage(response.usage, "scene_description", model)
+    return response.choices[0].message.content
+
+
+def build_image_search_messages(prompt: str, model: Optional[str] = None) -> list:
+    """Build the chat messages for extracting image search queries from a scene description."""
+
+    return build_messages(
+        IMAGE_SEARCH_PREFIX, {"role": "user", "content": prompt}, model=model
     )
+
+
+def parse_image_search_response(content: str):
     try:
-        return json.loads(response.choices[0].message.content)
+        return json.loads(content)
     except:
         print("Output Type Not Correct")
 
-def extract_image_files(prompt):
-    prompt = json.loads(prompt)
-    if len(prompt)>0:
-        for i,j in enumerate(prompt):
-            search_query = j["search_query"]
-            params = {
-            "engine": "google_images",
-            "q": f"{search_query}",
-            "api_key": os.getenv("SERPAPI_API_KEY"),
-            "num": 1
-            }
-            search = GoogleSearch(params)
-            results = search.get_dict()
-            img_url = results["images_results"][0]["original"]
-            file_name = img_url.split('/')[-1]
-            with open(file_name, "wb") as f:
-                f.write(requests.get(f"{img_url}").content)
-            j["file_name"] = file_name
-        
-    return prompt
+
+def search_image_online(prompt: str)-> str:
+    model = os.getenv("PROMPT_SCENE_GEN_MODEL")
+    with metrics.span("llm", operation="image_queries", model=model or ""):
+        response = litellm.completion(
+            model=model,
+            messages=build_image_search_messages(prompt, model),
+            num_retries=2,
+        )
+        record_usage(response.usage, "image_queries", model)
+    return parse_image_search_response(response.choices[0].message.content)
+
+
+async def asearch_image_online(prompt: str) -> str:
+    model = os.getenv("PROMPT_SCENE_GEN_MODEL")
+    with metrics.span("llm", operation="image_queries", model=model or ""):
+        response = await litellm.acompletion(
+            model=model,
+            messages=build_image_search_messages(prompt, model),
+            num_retries=2,
+        )
+        record_usage(response.usage, "image_queries", model)
+    return parse_image_search_response(response.choices[0].message.content)
+
+def extract_image_files(
+    prompt, dest_dir: Optional[str] = None, search_fn: Optional[SearchFn] = None
+) -> list:
+    """Search and download the images requested by a scene description.
+
+    Searches and downloads run concurrently, see ``fetch_images``.
+
+    Args:
+        prompt: Image entries from ``search_image_online``, or their JSON encoding
+        dest_dir: Directory to download into, the directory the scene is
+            rendered from. Defaults to the current working directory
+        search_fn: Query to image URL lookup. Defaults to env IMAGE_SEARCH_BACKEND,
+            or SerpApi
+
+    Returns:
+        list: Entries with the downloaded ``file_name`` and source ``url``
+    """
+
+    if isinstance(prompt, str):
+        prompt = json.loads(prompt)
+    return fetch_images(prompt or [], dest_dir or os.getcwd(), search_fn=search_fn)
+
+
+def build_pdf_messages(
+    pdf_content: list, mode: Optional[str] = None, model: Optional[str] = None
+) -> list:
+    """Build the chat messages for generating a scene description from a PDF.
+
+    Args:
+        pdf_content: Content parts of the PDF, as returned by ``prepare_pdf_content``
+        mode: PDF mode ``pdf_content`` was prepared in, the few-shot example is
+            prepared the same way. Defaults to env PDF_MODE
+        model: Model the messages are sent to, see ``build_messages``
+
+    Returns:
+        list: System prompt, few-shot PDF example and the prepared PDF
+    """
+
+    mode = mode or os.getenv("PDF_MODE") or DEFAULT_PDF_MODE
+    return build_messages(
+        pdf_prefix(mode), {"role": "user", "content": pdf_content}, model=model
+    )
+
 
 def process_pdf_prompt(
     file_content: bytes,
@@ -118,29 +220,76 @@ def process_pdf_prompt(
         raise HTTPException(status_code=400, detail="Empty PDF file provided")
 
     try:
-        encoded_pdf = compress_pdf(file_content)
-        messages = [
-            {"role": "system", "content": SCENE_SYSTEM_PROMPT},
-            *PDF_EXAMPLE,
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image_url",
-                        "image_url": f"data:application/pdf;base64,{encoded_pdf}",
-                    }
-                ],
-            },
-        ]
+        with metrics.span("pdf_preprocess"):
+            pdf_content = prepare_pdf_content(file_content)
+        with metrics.span("llm", operation="pdf_scene_description", model=model or ""):
+            response = litellm.completion(
+                model=model,
+                messages=build_pdf_messages(pdf_content, model=model),
+            )
+            record_usage(response.usage, "pdf_scene_description", model)
+        return response.choices[0].message.content
 
-        response = litellm.completion(
-            model=model,
-            messages=messages,
+    except EmptyPdfError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        retry_model = os.getenv("PDF_RETRY_MODEL")
+        if not retry and retry_model:
+            return process_pdf_prompt(file_content, model=retry_model, retry=True)
+        raise HTTPException(status_code=500, detail=f"Failed to process PDF: {str(e)}")
+
+
+async def aprocess_pdf_prompt(
+    file_content: Union[bytes, str],
+    model: str = os.getenv("PDF_SCENE_GEN_MODEL"),
+    retry: bool = False,
+    pdf_content: Optional[list] = None,
+) -> str:
+    """Async variant of ``process_pdf_prompt`` using ``litellm.acompletion``.
+
+    PDF preprocessing is CPU bound; unless ``pdf_content`` is given it runs in
+    a worker thread so that it does not block the event loop.
+
+    Args:
+        file_content: Raw PDF file bytes or path to the PDF
+        model: LLM model to use for processing. Defaults to env PDF_SCENE_GEN_MODEL
+        retry: Whether this is a retry attempt and should it use the PDF_RETRY_MODEL
+        pdf_content: Previously computed ``prepare_pdf_content(file_content)``,
+            to skip the preprocessing
+
+    Returns:
+        str: Generated scene description
+
+    Raises:
+        HTTPException: If PDF processing fails or invalid input
+    """
+    if not file_content:
+        raise HTTPException(status_code=400, detail="Empty PDF file provided")
+
+    try:
+        if pdf_content is None:
+            with metrics.span("pdf_preprocess"):
+                pdf_content = await asyncio.to_thread(
+                    prepare_pdf_content, file_content
+                )
+        # The first call prepares the few-shot example, which is CPU bound too
+        messages = await asyncio.to_thread(
+            build_pdf_messages, pdf_content, model=model
         )
+        with metrics.span("llm", operation="pdf_scene_description", model=model or ""):
+            response = await litellm.acompletion(
+                model=model,
+                messages=messages,
+            )
+            record_usage(response.usage, "pdf_scene_description", model)
         return response.choices[0].message.content
 
+    except EmptyPdfError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         retry_model = os.getenv("PDF_RETRY_MODEL")
         if not retry and retry_model:
-            return process_pdf_prompt(file_content, model=retry_model, retry=True)
+            return await aprocess_pdf_prompt(
+                file_content, model=retry_model, retry=True, pdf_content=pdf_content
+            )
         raise HTTPException(status_code=500, detail=f"Failed to process PDF: {str(e)}")
@@ -1,3 +1,7 @@
+import functools
+from importlib import resources
+from typing import Tuple
+
 from manimator.utils.helpers import read_base64_few_shot_file
 
 FOURIER_TRANSFORM_EXAMPLE = [
@@ -69,19 +73,7 @@ SCENE_EXAMPLES = [
     for message in example
 ]
 
-few_shot_pdf = read_base64_few_shot_file()
-
-PDF_EXAMPLE = {
-    "role": "user",
-    "content": [
-        {
-            "type": "image_url",
-            "image_url": "data:application/pdf;base64,{}".format(few_shot_pdf),
-        },
-    ],
-}, {
-    "role": "assistant",
-    "content": r"""*Topic*: Deep Residual Learning for Image Recognition
+PDF_EXAMPLE_ANSWER = r"""*Topic*: Deep Residual Learning for Image Recognition
 *Key Points*:
 1. *Degradation Problem*: Explain how deeper networks suffer from higher training error despite having more capacity.
 2. *Residual Learning*: Show how residual learning reformulates the problem by learning residual functions \( \mathcal{F}(\mathbf{x}) = \mathcal{H}(\mathbf{x}) - \mathbf{x} \) instead of direct mappings \( \mathcal{H}(\mathbf{x}) \).
@@ -94,5 +86,49 @@ PDF_EXAMPLE = {
 - Include mathematical formulas (e.g., \( \mathcal{F}(\mathbf{x}) = \mathcal{H}(\mathbf{x}) - \mathbf{x} \)) and graphs (e.g., training error vs. depth).
 - Use color coding to differentiate between plain networks and residual networks.
 - Animate the flow of data through shortcut connections and residual blocks.
-- Provide step-by-step explanations for each concept.""",
-}
+- Provide step-by-step explanations for each concept."""
+
+
+@functools.lru_cache(maxsize=None)
+def pdf_example(mode: str = "full") -> Tuple[dict, ...]:
+    """Returns the few-shot PDF example, prepared like user PDFs in ``mode``.
+
+    The example PDF is only read the first time it is needed, then memoized,
+    so processes that never handle PDFs (workers, the prompt-only paths) never
+    pay for it. The result is shared and must not be mutated.
+
+    Args:
+        mode (str): PDF mode, see ``prepare_pdf_content``
+
+    Returns:
+        Tuple[dict, ...]: The example user and assistant messages
+    """
+
+    if mode == "full":
+        content = [
+            {
+                "type": "image_url",
+                "image_url": "data:application/pdf;base64,{}".format(
+                    read_base64_few_shot_file()
+                ),
+            },
+        ]
+    else:
+        from manimator.utils.pdf_preprocess import prepare_pdf_content
+
+        pdf_file = resources.files("manimator.few_shot") / "few_shot_1.pdf"
+        with resources.as_file(pdf_file) as pdf_path:
+            content = prepare_pdf_content(str(pdf_path), mode)
+    return (
+        {"role": "user", "content": content},
+        {"role": "assistant", "content": PDF_EXAMPLE_ANSWER},
+    )
+
+
+def __getattr__(name: str):
+    # PDF_EXAMPLE and few_shot_pdf used to be computed at import time
+    if name == "PDF_EXAMPLE":
+        return pdf_example()
+    if name == "few_shot_pdf":
+        return read_base64_few_shot_file()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,59 +1,349 @@
 import gradio as gr
-import re
 from importlib import resources
-from typing import Tuple, Optional, Dict
+from typing import Any, Callable, Tuple, Optional, Dict
 import functools
+import hashlib
+import os
+import queue
+import threading
 
 from manimator.api.animation_generation import generate_animation_response
 from manimator.api.scene_description import process_prompt_scene, process_pdf_prompt, search_image_online, extract_image_files
-from manimator.utils.schema import ManimProcessor
+from manimator.utils import metrics
+from manimator.utils.dag import StageGraph
+from manimator.utils.images import assign_placeholders, fill_missing_images
+from manimator.utils.schema import (
+    QUALITY_TIERS,
+    ManimProcessor,
+    RenderError,
+    resolve_quality,
+)
+from manimator.utils.single_flight import SingleFlight
+from manimator.utils.pipeline_cache import PipelineCache
+from manimator.utils.projects import make_project_id
+from manimator.utils.repair import render_with_repair, trim_render_error
+from manimator.utils.validation import CodeValidationError, validate_scene_code
+
+
+# Identical prompts or PDFs submitted while one is in flight share its run
+prompt_flights = SingleFlight("gradio_prompt")
+pdf_flights = SingleFlight("gradio_pdf")
+
+# Gradio runs one call per event listener at a time by default, which would
+# queue identical requests behind each other instead of sharing a run
+DEFAULT_GRADIO_CONCURRENCY = 8
+
+STREAM_STATUS = {
+    "scene_description": "Writing scene description...",
+    "code": "Generating Manim code...",
+}
+
+_DONE = object()
+
+
+def _run_streaming(fn: Callable[[], Any], events: queue.Queue, to_update: Callable):
+    """Runs ``fn`` in a thread, yielding a UI update for every event it reports.
+
+    Args:
+        fn (Callable[[], Any]): Blocking work that puts events on ``events``
+        events (queue.Queue): Events reported by ``fn``
+        to_update (Callable): Turns an event into a ``(video, code, status)`` update
+
+    Returns:
+        Any: The return value of ``fn``. Exceptions raised by ``fn`` are re-raised
+    """
+
+    outcome = {}
+
+    def target():
+        try:
+            outcome["value"] = fn()
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            events.put(_DONE)
+
+    threading.Thread(target=target, daemon=True).start()
+    while (event := events.get()) is not _DONE:
+        yield to_update(event)
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome.get("value")
+
 
+def _cached_videos(stages: Dict[str, Any]) -> Dict[str, str]:
+    """Render cache keys of a pipeline cache entry's videos by quality tier."""
+
+    # Entries written before quality tiers hold a single render cache key
+    videos = stages.get("video")
+    return videos if isinstance(videos, dict) else {}
+
+
+def process_prompt(
+    prompt: str, quality: Optional[str] = None, progressive: bool = False
+):
+    """Runs the prompt to video pipeline, yielding ``(video, code, status)`` updates.
+
+    The scene description and the code are streamed token by token into the
+    code output, and manim's progress is reported in the status while rendering.
+    When manim fails, the code and its error are sent back to the model and
+    the fixed code is streamed and rendered, see ``render_with_repair``.
+
+    Args:
+        prompt (str): Text description of the desired animation
+        quality (Optional[str]): Render quality tier, see ``QUALITY_TIERS``
+        progressive (bool): Render and show a ``preview`` quality video first,
+            then replace it with the video at ``quality``
+    """
+
+    quality = resolve_quality(quality)
+    tiers = ["preview", quality] if progressive and quality != "preview" else [quality]
 
-def process_prompt(prompt: str):
     max_attempts = 2
     attempts = 0
+    pipeline_cache = PipelineCache()
+    cache_key = pipeline_cache.make_key(
+        prompt, [os.getenv("PROMPT_SCENE_GEN_MODEL"), os.getenv("CODE_GEN_MODEL")]
+    )
+    project_id = make_project_id(prompt)
+    feedback = ""
 
     while attempts < max_attempts:
         try:
             processor = ManimProcessor()
+            cached = pipeline_cache.load(cache_key)
+            if quality in _cached_videos(cached):
+                video_path = processor.cached_video(_cached_videos(cached)[quality])
+                if video_path:
+                    yield (
+                        video_path,
+                        cached["code"],
+                        "Animation generated successfully! (pipeline cache hit)",
+                    )
+                    return
+
             with processor.create_temp_dir() as temp_dir:
-                scene_description = process_prompt_scene(prompt)
-                image_extracted = search_image_online(scene_description)
-                img_json = extract_image_files(image_extracted)
-                response = generate_animation_response(scene_description, img_json)
-                code = processor.extract_code(response)
+                events = queue.Queue()
+                streamed = {stage: "" for stage in STREAM_STATUS}
+
+                def to_update(event):
+                    kind, text = event
+                    if kind == "status":
+                        return gr.update(), gr.update(), text
+                    if kind == "repair":
+                        # The fixed code replaces the streamed code
+                        streamed["code"] = ""
+                        return gr.update(), gr.update(), text
+                    streamed[kind] += text
+                    return None, streamed[kind], STREAM_STATUS[kind]
+
+                def describe():
+                    return pipeline_cache.stage(
+                        cache_key,
+                        "scene_description",
+                        lambda: process_prompt_scene(
+                            prompt,
+                            on_token=lambda token: events.put(
+                                ("scene_description", token)
+                            ),
+                        ),
+                    )
+
+                def find_images(scene_description):
+                    return pipeline_cache.stage(
+                        cache_key,
+                        "image_json",
+                        lambda: assign_placeholders(
+                            search_image_online(scene_description)
+                        ),
+                    )
+
+                def generate_code(scene_description, image_queries):
+                    image_prompt = [
+                        {
+                            key: value
+                            for key, value in entry.items()
+                            if key not in ("url", "asset_hash")
+                        }
+                        for entry in image_queries
+                    ]
+                    return pipeline_cache.stage(
+                        cache_key,
+                        "code",
+                        lambda: processor.extract_code(
+                            generate_animation_response(
+                                scene_description + feedback,
+                                image_prompt,
+                                on_token=lambda token: events.put(("code", token)),
+                            )
+                        ),
+                    )
+
+                # Images are downloaded while the code is generated against
+                # their placeholder file names
+                graph = StageGraph()
+                graph.add("scene_description", describe)
+                graph.add("image_queries", find_images, ["scene_description"])
+                graph.add(
+                    "images",
+                    lambda image_queries: extract_image_files(image_queries, temp_dir),
+                    ["image_queries"],
+                )
+                graph.add(
+                    "code", generate_code, ["scene_description", "image_queries"]
+                )
+                yield None, None, "Generating scene description..."
+                results = yield from _run_streaming(graph.run, events, to_update)
+                metrics.log_timings(
+                    {
+                        "pipeline": "gradio_prompt",
+                        "stages": {
+                            name: round(seconds, 4)
+                            for name, seconds in graph.timings.items()
+                        },
+                    }
+                )
+
+                code = results["code"]
+                img_json = results["images"]
+                fetched = {entry["file_name"]: entry for entry in img_json}
+                resolved = [
+                    fetched.get(entry["file_name"], entry)
+                    for entry in results["image_queries"]
+                ]
+                if resolved != results["image_queries"]:
+                    # Keep the resolved URLs so a resumed run skips the searches
+                    pipeline_cache.save_stage(cache_key, "image_json", resolved)
+                fill_missing_images(resolved, temp_dir)
 
                 if not code:
                     attempts += 1
                     if attempts < max_attempts:
                         continue
-                    return (
+                    yield (
                         None,
                         None,
                         "No valid Manim code generated after multiple attempts",
                     )
-
-                class_match = re.search(r"class (\w+)\(Scene\)", code)
-                if not class_match:
+                    return
+
+                try:
+                    scene_name = validate_scene_code(code)
+                except CodeValidationError as e:
+                    pipeline_cache.drop_stage(cache_key, "code")
+                    feedback = (
+                        "\n\nThe previously generated code was rejected, "
+                        f"avoid these problems:\n{e.detail}"
+                    )
                     attempts += 1
                     if attempts < max_attempts:
+                        yield None, code, "Generated code was rejected, retrying..."
                         continue
-                    return None, None, "No Scene class found after multiple attempts"
-
-                scene_name = class_match.group(1)
-                scene_file = processor.save_code(code, temp_dir)
-                video_path = processor.render_scene(scene_file, scene_name, temp_dir)
-
-                if not video_path:
-                    return None, None, "Failed to render animation"
-
-                return video_path, code, "Animation generated successfully!"
+                    yield None, code, f"{e.detail}\n(after multiple attempts)"
+                    return
+
+                assets = {entry["file_name"]: entry["asset_hash"] for entry in img_json}
+                for tier in tiers:
+                    if tier != quality:
+                        label = "Rendering preview..."
+                    elif len(tiers) > 1:
+                        label = f"Rendering {quality} animation..."
+                    else:
+                        label = "Rendering animation..."
+                    yield gr.update(), code, label
+
+                    def render(scene_file, scene_name):
+                        return processor.render_scene(
+                            scene_file,
+                            scene_name,
+                            temp_dir,
+                            project_id=project_id,
+                            assets=assets,
+                            on_progress=lambda progress: events.put(
+                                ("status", f"{label} {progress}")
+                            ),
+                            quality=tier,
+                        )
+
+                    def on_repair(attempt, budget):
+                        events.put(
+                            (
+                                "repair",
+                                "Render failed, fixing the code "
+                                f"(attempt {attempt}/{budget})...",
+                            )
+                        )
+
+                    try:
+                        fixed_video, fixed_code = yield from _run_streaming(
+                            lambda: render_with_repair(
+                                processor,
+                                code,
+                                scene_name,
+                                temp_dir,
+                                render,
+                                results["scene_description"],
+                                on_repair=on_repair,
+                                on_token=lambda token: events.put(("code", token)),
+                            ),
+                            events,
+                            to_update,
+                        )
+                    except RenderError as e:
+                        # Repairs are exhausted, regenerating from scratch
+                        # would only repeat the slowest stages
+                        pipeline_cache.drop_stage(cache_key, "code")
+                        yield (
+                            gr.update() if tier != tiers[0] else None,
+                            code,
+                            f"Failed to render animation:\n{trim_render_error(e.output)}",
+                        )
+                        return
+                    except Exception:
+                        pipeline_cache.drop_stage(cache_key, "code")
+                        raise
+                    video_path = fixed_video
+                    if fixed_code != code:
+                        code = fixed_code
+                        scene_name = validate_scene_code(code)
+                        pipeline_cache.save_stage(cache_key, "code", code)
+
+                    if not video_path:
+                        pipeline_cache.drop_stage(cache_key, "code")
+                        if tier != tiers[0]:
+                            yield (
+                                gr.update(),
+                                code,
+                                f"Failed to render the {quality} animation, "
+                                "showing the preview",
+                            )
+                            return
+                        yield None, None, "Failed to render animation"
+                        return
+
+                    if processor.cache_key:
+                        videos = _cached_videos(pipeline_cache.load(cache_key))
+                        pipeline_cache.save_stage(
+                            cache_key, "video", {**videos, tier: processor.cache_key}
+                        )
+                    if tier != quality:
+                        yield video_path, code, f"Preview ready, rendering {quality}..."
+                timings = f"Stage timings: {graph.format_timings()}"
+                if processor.cache_hit:
+                    yield (
+                        video_path,
+                        code,
+                        f"Animation generated successfully! (render cache hit)\n{timings}",
+                    )
+                    return
+                yield video_path, code, f"Animation generated successfully!\n{timings}"
+                return
 
         except Exception as e:
             attempts += 1
             if attempts < max_attempts:
                 continue
-            return None, None, f"Error after multiple attempts: {str(e)}"
+            yield None, None, f"Error after multiple attempts: {str(e)}"
 
 
 def process_pdf(file_path: str):
@@ -70,20 +360,50 @@ def process_pdf(file_path: str):
         return f"Error processing PDF: {str(e)}"
 
 
-def interface_fn(prompt=None, pdf_file=None):
+def interface_fn(prompt=None, pdf_file=None, quality=None, progressive=False):
     if prompt:
-        video_path, code, message = process_prompt(prompt)
-        if video_path:
-            return [video_path, code, message]
-        return [None, None, message]
+        for video_path, code, message in prompt_flights.stream(
+            (make_project_id(prompt), quality, progressive),
+            lambda: process_prompt(prompt, quality, progressive),
+        ):
+            yield [video_path, code, message]
+        return
     elif pdf_file:
-        scene_description = process_pdf(pdf_file)
+        yield [None, None, "Processing PDF..."]
+        with open(pdf_file, "rb") as f:
+            pdf_hash = hashlib.sha256(f.read()).hexdigest()
+        scene_description = pdf_flights.do(pdf_hash, lambda: process_pdf(pdf_file))
         if scene_description:
-            video_path, code, message = process_prompt(scene_description)
-            if video_path:
-                return [video_path, code, message]
-            return [None, None, message]
-    return [None, None, "Please provide either a prompt or upload a PDF file"]
+            yield from interface_fn(
+                prompt=scene_description, quality=quality, progressive=progressive
+            )
+            return
+    yield [None, None, "Please provide either a prompt or upload a PDF file"]
+
+
+def text_interface_fn(prompt, quality, progressive):
+    yield from interface_fn(prompt=prompt, quality=quality, progressive=progressive)
+
+
+def pdf_interface_fn(pdf_file, quality, progressive):
+    yield from interface_fn(
+        prompt=None, pdf_file=pdf_file, quality=quality, progressive=progressive
+    )
+
+
+def quality_inputs() -> Tuple[gr.Dropdown, gr.Checkbox]:
+    """Render quality selector and progressive rendering toggle."""
+
+    with gr.Row():
+        quality = gr.Dropdown(
+            choices=list(QUALITY_TIERS),
+            value=resolve_quality(),
+            label="Render quality",
+        )
+        progressive = gr.Checkbox(
+            label="Show a preview while the final quality renders", value=False
+        )
+    return quality, progressive
 
 
 description_md = """
@@ -144,6 +464,7 @@ with gr.Blocks(title="manimator") as demo:
                     placeholder="Explain the working of neural networks",
                     lines=3,
                 )
+                text_quality, text_progressive = quality_inputs()
                 text_button = gr.Button("Generate Animation from Text")
 
             with gr.Row():
@@ -158,14 +479,15 @@ with gr.Blocks(title="manimator") as demo:
                 label="Status", interactive=False, show_copy_button=True
             )
             text_button.click(
-                fn=interface_fn,
-                inputs=[text_input],
+                fn=text_interface_fn,
+                inputs=[text_input, text_quality, text_progressive],
                 outputs=[video_output, code_output, status_output],
             )
 
         with gr.TabItem("📄 PDF Upload"):
             with gr.Column():
                 file_input = gr.File(label="Upload a PDF paper", file_types=[".pdf"])
+                pdf_quality, pdf_progressive = quality_inputs()
                 pdf_button = gr.Button("Generate Animation from PDF")
 
             with gr.Row():
@@ -180,8 +502,8 @@ with gr.Blocks(title="manimator") as demo:
                 label="Status", interactive=False, show_copy_button=True
             )
             pdf_button.click(
-                fn=lambda pdf: interface_fn(prompt=None, pdf_file=pdf),
-                inputs=[file_input],
+                fn=pdf_interface_fn,
+                inputs=[file_input, pdf_quality, pdf_progressive],
                 outputs=[pdf_video_output, pdf_code_output, pdf_status_output],
             )
 
@@ -200,6 +522,12 @@ with gr.Blocks(title="manimator") as demo:
                 outputs=[sample_video, sample_markdown],
             )
 
+demo.queue(
+    default_concurrency_limit=int(
+        os.getenv("GRADIO_CONCURRENCY") or DEFAULT_GRADIO_CONCURRENCY
+    )
+)
+
 
 def main():
     """Entry point for the Manimator application."""
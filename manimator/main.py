@@ -1,24 +1,68 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-import re
+import asyncio
+import hashlib
+import os
+import time
 from pydantic import BaseModel
+from typing import Optional
 from dotenv import load_dotenv
 
-from manimator.utils.schema import ManimProcessor
-from manimator.utils.helpers import download_arxiv_pdf
-from manimator.api.animation_generation import generate_animation_response
-from manimator.api.scene_description import process_prompt_scene, process_pdf_prompt
+from manimator.utils import metrics
+from manimator.utils.jobs import JobQueue, render_animation_job, render_code_job
+from manimator.utils.pipeline_cache import normalize_prompt
+from manimator.utils.projects import check_project_id, make_project_id
+from manimator.utils.render_cache import normalize_code
+from manimator.utils.schema import resolve_quality
+from manimator.utils.encoding import (
+    DEFAULT_OUTPUT_FORMATS,
+    MEDIA_TYPES,
+    EncodeOptions,
+)
+from manimator.utils.single_flight import AsyncSingleFlight
+from manimator.utils.arxiv_cache import ArxivCache
+from manimator.utils.pdf_preprocess import DEFAULT_PDF_MODE
+from manimator.utils.pdf_workers import UPLOAD_OVERHEAD_BYTES, PdfWorkers
+from manimator.api.scene_description import aprocess_prompt_scene, aprocess_pdf_prompt
 
 
 load_dotenv()
 
+# Polled constantly, their timings would drown the log
+UNLOGGED_PATHS = ("/health-check", "/metrics")
+
+
+class RenderOptions(BaseModel):
+    # One of QUALITY_TIERS, defaults to env RENDER_QUALITY
+    quality: Optional[str] = None
+    # Format returned by /generate-animation: mp4, webm, gif or png (last frame)
+    output_format: Optional[str] = None
+    # Encoder settings, default to env VIDEO_CODEC, VIDEO_CRF, VIDEO_PRESET and
+    # ENCODE_THREADS (0 lets ffmpeg choose)
+    codec: Optional[str] = None
+    crf: Optional[int] = None
+    preset: Optional[str] = None
+    threads: Optional[int] = None
 
-class PromptRequest(BaseModel):
+
+class PromptRequest(RenderOptions):
     prompt: str
+    project_id: Optional[str] = None
+    # Render a preview first, then the requested quality in the background
+    progressive: bool = False
+
+
+class CodeRenderRequest(RenderOptions):
+    code: str
 
 
 app = FastAPI()
+job_queue = JobQueue()
+arxiv_cache = ArxivCache()
+pdf_workers = PdfWorkers()
+# Identical concurrent requests share one in-flight LLM call
+scene_flights = AsyncSingleFlight("scene_description")
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,20 +78,128 @@ async def health_check():
     return {"status": "ok"}
 
 
-@app.post("/generate-pdf-scene")
-async def generate_pdf_scene(file: UploadFile = File(...)):
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Metrics in the Prometheus text format, including those of job workers"""
+    metrics.set_gauge("job_queue_depth", job_queue.depth())
+    metrics.set_gauge("pdf_requests_in_progress", pdf_workers.active)
+    return PlainTextResponse(
+        metrics.render_prometheus(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.middleware("http")
+async def limit_pdf_upload_size(request: Request, call_next):
+    """Rejects oversized PDF uploads before their body is read."""
+
+    if request.url.path == "/generate-pdf-scene":
+        # Uploads without a Content-Length are capped while they are streamed
+        limit = pdf_workers.max_upload_bytes + UPLOAD_OVERHEAD_BYTES
+        if int(request.headers.get("content-length") or 0) > limit:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": "PDF exceeds the upload size limit"},
+            )
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def log_request_timings(request: Request, call_next):
+    """Records the duration of every request and logs it with its stage spans."""
+
+    started = time.perf_counter()
+    status_code = 500
+    with metrics.collect_spans() as spans:
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            seconds = time.perf_counter() - started
+            # Route templates like /jobs/{job_id} keep the label set bounded
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            metrics.observe(
+                "http_request_duration_seconds",
+                seconds,
+                method=request.method,
+                route=route,
+                status=str(status_code),
+            )
+            if route not in UNLOGGED_PATHS:
+                metrics.log_timings(
+                    {
+                        "method": request.method,
+                        "route": route,
+                        "status": status_code,
+                        "seconds": round(seconds, 4),
+                        "spans": spans,
+                    }
+                )
+
+
+# The body is streamed by the handler, so the file field is documented here
+PDF_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+
+@app.post("/generate-pdf-scene", openapi_extra=PDF_UPLOAD_BODY)
+async def generate_pdf_scene(request: Request):
     try:
-        content = await file.read()
-        scene_description = process_pdf_prompt(content)
+        async with pdf_workers.slot():
+            path, content_hash = await pdf_workers.spool_request(request)
+            started = []
+
+            def start() -> asyncio.Task:
+                # The shared task owns the spooled file from here on and removes
+                # it when it finishes, even if this request is cancelled first
+                task = asyncio.ensure_future(pdf_scene(path))
+                task.add_done_callback(lambda _: os.remove(path))
+                started.append(task)
+                return task
+
+            try:
+                scene_description = await scene_flights.do(
+                    ("pdf", content_hash), start
+                )
+            finally:
+                if not started:
+                    # Attached to an identical PDF in flight, which uses its own file
+                    os.remove(path)
         return {"scene_description": scene_description}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def pdf_scene(path: str) -> str:
+    """Generates the scene description of a spooled PDF upload."""
+
+    mode = os.getenv("PDF_MODE") or DEFAULT_PDF_MODE
+    payload = await pdf_workers.prepare(path, mode)
+    return await aprocess_pdf_prompt(path, pdf_content=payload)
+
+
 @app.post("/generate-prompt-scene")
 async def generate_prompt_scene(request: PromptRequest):
     try:
-        return {"scene_description": process_prompt_scene(request.prompt)}
+        scene_description = await scene_flights.do(
+            ("prompt", normalize_prompt(request.prompt)),
+            lambda: aprocess_prompt_scene(request.prompt),
+        )
+        return {"scene_description": scene_description}
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error generating scene descriptions: {str(e)}"
@@ -57,42 +209,246 @@ async def generate_prompt_scene(request: PromptRequest):
 @app.get("/pdf/{arxiv_id}")
 async def process_arxiv_by_id(arxiv_id: str):
     """Process arxiv paper by ID"""
+    # Not lowercased: old style ids like math.GT/0309136 are case sensitive,
+    # and the flight key must match the id the cache and download use
+    arxiv_id = arxiv_id.strip()
     try:
-        arxiv_url = f"https://arxiv.org/pdf/{arxiv_id}"
-        pdf_content = download_arxiv_pdf(arxiv_url)
-        scene_description = process_pdf_prompt(pdf_content)
+        scene_description = await scene_flights.do(
+            ("arxiv", arxiv_id), lambda: arxiv_scene(arxiv_id)
+        )
         return {"scene_description": scene_description}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def arxiv_scene(arxiv_id: str) -> str:
+    """Generates the scene description of an arXiv paper, reusing cached work.
+
+    The PDF, its preprocessed content and the scene description are all taken
+    from the ``ArxivCache`` when available.
+    """
+
+    pdf_content, content_hash = await asyncio.to_thread(arxiv_cache.fetch, arxiv_id)
+    model = os.getenv("PDF_SCENE_GEN_MODEL")
+    mode = os.getenv("PDF_MODE") or DEFAULT_PDF_MODE
+    scene_description = arxiv_cache.get_scene_description(content_hash, model, mode)
+    if scene_description is None:
+        payload = arxiv_cache.get_payload(content_hash, mode)
+        if payload is None:
+            payload = await pdf_workers.prepare(pdf_content, mode)
+            arxiv_cache.put_payload(content_hash, mode, payload)
+        scene_description = await aprocess_pdf_prompt(
+            pdf_content, model=model, pdf_content=payload
+        )
+        arxiv_cache.put_scene_description(
+            content_hash, model, mode, scene_description
+        )
+    return scene_description
+
+
+def check_quality(quality: Optional[str]) -> str:
+    """Resolves a requested render quality, rejecting unknown tiers with a 422."""
+
+    try:
+        return resolve_quality(quality)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def check_encode_options(request: RenderOptions) -> EncodeOptions:
+    """Builds the encoder settings of a request, rejecting invalid ones with a 422.
+
+    The requested ``output_format`` is rendered in addition to the formats of
+    env OUTPUT_FORMATS.
+    """
+
+    formats = (os.getenv("OUTPUT_FORMATS") or DEFAULT_OUTPUT_FORMATS).split(",")
+    if request.output_format:
+        formats.append(request.output_format)
+    try:
+        return EncodeOptions(
+            codec=request.codec,
+            crf=request.crf,
+            preset=request.preset,
+            threads=request.threads,
+            formats=formats,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def code_job_key(
+    code: str, project_id: str, quality: str, options: EncodeOptions
+) -> tuple:
+    """Identity of a code render job, shared by identical concurrent renders."""
+
+    code_hash = hashlib.sha256(normalize_code(code).encode("utf-8")).hexdigest()
+    return ("code", project_id, code_hash, quality, options.key())
+
+
+def submit_animation_job(request: PromptRequest) -> str:
+    """Queues the render of a prompt, as a preview first if ``progressive``.
+
+    A progressive request renders at ``preview`` quality, which takes seconds,
+    and chains the render of the same code at the requested quality. The video
+    of the preview job is swapped for the final one once that completes.
+    """
+
+    project_id = check_project_id(
+        request.project_id or make_project_id(request.prompt)
+    )
+    quality = check_quality(request.quality)
+    options = check_encode_options(request)
+    progressive = request.progressive and quality != "preview"
+
+    def final_render(result: dict):
+        return (
+            render_code_job,
+            (result["code"], project_id, quality, options),
+            code_job_key(result["code"], project_id, quality, options),
+        )
+
+    return job_queue.submit(
+        render_animation_job,
+        request.prompt,
+        project_id,
+        "preview" if progressive else quality,
+        options,
+        key=(
+            "animation",
+            normalize_prompt(request.prompt),
+            project_id,
+            quality,
+            progressive,
+            options.key(),
+        ),
+        then=final_render if progressive else None,
+    )
+
+
 @app.post("/generate-animation")
 async def generate_animation(request: PromptRequest):
-    processor = ManimProcessor()
+    job_id = submit_animation_job(request)
+    output_format = request.output_format or "mp4"
+    await asyncio.wrap_future(job_queue.future(job_id))
+    job = job_queue.status(job_id)
+    metrics.add_spans(job.get("timings") or [])
+    if job["status"] == "failed":
+        raise HTTPException(status_code=job["status_code"], detail=job["error"])
+    return video_response(job, output_format)
+
+
+@app.post("/jobs", status_code=202)
+async def create_animation_job(request: PromptRequest):
+    return job_status(submit_animation_job(request))
+
+
+@app.post("/projects/{project_id}/render", status_code=202)
+async def render_project_code(project_id: str, request: CodeRenderRequest):
+    """Re-render edited code, reusing the project's unchanged animations"""
+    check_project_id(project_id)
+    quality = check_quality(request.quality)
+    options = check_encode_options(request)
+    job_id = job_queue.submit(
+        render_code_job,
+        request.code,
+        project_id,
+        quality,
+        options,
+        key=code_job_key(request.code, project_id, quality, options),
+    )
+    return job_status(job_id)
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return job_status(job_id)
+
+
+@app.get("/jobs/{job_id}/video")
+async def get_job_video(job_id: str, format: str = "mp4"):
+    """Serves the video of a job, the final quality one once it is rendered"""
+    job = job_queue.status(job_id)
+    if job["status"] == "failed":
+        raise HTTPException(status_code=job["status_code"], detail=job["error"])
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    final = final_job(job)
+    if final and final["status"] == "completed":
+        return video_response(final, format)
+    return video_response(job, format)
 
+
+def final_job(job: dict) -> Optional[dict]:
+    """Returns the final quality render chained to a preview job, if any."""
+
+    if not job.get("next_job_id"):
+        return None
     try:
-        with processor.create_temp_dir() as temp_dir:
-            response = generate_animation_response(request.prompt)
-            code = processor.extract_code(response)
-            if not code:
-                raise HTTPException(
-                    status_code=400, detail="No valid Manim code generated"
-                )
-            class_match = re.search(r"class (\w+)\(Scene\)", code)
-            if not class_match:
-                raise HTTPException(
-                    status_code=400, detail="No Scene class found in code"
-                )
-            scene_name = class_match.group(1)
-            scene_file = processor.save_code(code, temp_dir)
-            video_path = processor.render_scene(scene_file, scene_name, temp_dir)
-            if not video_path:
-                raise HTTPException(
-                    status_code=500, detail="Failed to render animation"
-                )
-            return FileResponse(video_path, media_type="video/mp4")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        return job_queue.status(job["next_job_id"])
+    except HTTPException:
+        return None
+
+
+def video_response(job: dict, output_format: str = "mp4") -> FileResponse:
+    """Serves the video of a completed job from the artifact store.
+
+    ``FileResponse`` streams the file and honours ``Range`` requests, so
+    players can seek and start playback before the download completes.
+    """
+
+    outputs = job.get("outputs") or {"mp4": job["video_path"]}
+    if output_format not in outputs:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No {output_format} output, rendered formats: {sorted(outputs)}",
+        )
+    if not os.path.exists(outputs[output_format]):
+        raise HTTPException(status_code=410, detail="Video has expired")
+    headers = {
+        "X-Render-Cache": "hit" if job["cache_hit"] else "miss",
+        "X-Render-Quality": job["quality"],
+        "X-Job-Id": job["job_id"],
+    }
+    if job.get("next_job_id"):
+        headers["X-Final-Job-Id"] = job["next_job_id"]
+    return FileResponse(
+        outputs[output_format], media_type=MEDIA_TYPES[output_format], headers=headers
+    )
+
+
+def job_status(job_id: str) -> dict:
+    """Returns the public view of a job, hiding server-side file paths.
+
+    Preview jobs of progressive requests also report the ``final_job_id`` and
+    ``final_status`` of the final quality render.
+    """
+
+    job = job_queue.status(job_id)
+    job.pop("video_path", None)
+    outputs = job.pop("outputs", None) or {}
+    final = final_job(job)
+    if final:
+        job["final_job_id"] = final["job_id"]
+        job["final_status"] = final["status"]
+        if final["status"] == "completed":
+            job["quality"] = final["quality"]
+    job.pop("next_job_id", None)
+    if job["status"] == "completed":
+        job["video_url"] = f"/jobs/{job_id}/video"
+        job["output_urls"] = {
+            fmt: f"/jobs/{job_id}/video?format={fmt}" for fmt in sorted(outputs)
+        }
+    job["queue_depth"] = job_queue.depth()
+    return job
+
+
+@app.on_event("shutdown")
+def shutdown_job_queue():
+    job_queue.shutdown()
+    pdf_workers.shutdown()
 
 
 def main():
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import Optional
+
+
+DEFAULT_ARTIFACT_DIR = os.path.join(tempfile.gettempdir(), "manimator", "artifacts")
+DEFAULT_ARTIFACT_TTL = 6 * 3600
+GC_INTERVAL = 60
+
+
+class ArtifactStore:
+    """Managed directory of rendered videos handed out to clients.
+
+    Files are hardlinked (or moved) into the store instead of being copied, so
+    adding a video costs no I/O when it lives on the same filesystem. Artifact
+    names start with their creation timestamp, which is used to garbage collect
+    artifacts older than ``ttl`` seconds. The timestamp is kept in the name
+    because hardlinks share their modification time with the render cache entry.
+
+    Args:
+        artifact_dir (Optional[str]): Directory holding the artifacts. Defaults to
+            env ARTIFACT_DIR
+        ttl (Optional[int]): Seconds to keep artifacts. Defaults to env ARTIFACT_TTL
+    """
+
+    _last_gc = 0.0
+    _gc_lock = threading.Lock()
+
+    def __init__(self, artifact_dir: Optional[str] = None, ttl: Optional[int] = None):
+        self.artifact_dir = (
+            artifact_dir or os.getenv("ARTIFACT_DIR") or DEFAULT_ARTIFACT_DIR
+        )
+        self.ttl = ttl or int(os.getenv("ARTIFACT_TTL") or DEFAULT_ARTIFACT_TTL)
+        os.makedirs(self.artifact_dir, exist_ok=True)
+
+    def add(self, path: str, move: bool = False) -> str:
+        """Adds a file to the store without copying it where possible.
+
+        Args:
+            path (str): File to add
+            move (bool): Whether the source may be moved instead of linked, for
+                files that are about to be deleted anyway
+
+        Returns:
+            str: Path of the artifact inside the store
+        """
+
+        self.maybe_collect_garbage()
+        suffix = os.path.splitext(path)[1]
+        artifact_path = os.path.join(
+            self.artifact_dir, f"{int(time.time())}_{uuid.uuid4().hex}{suffix}"
+        )
+        try:
+            if move:
+                os.replace(path, artifact_path)
+            else:
+                os.link(path, artifact_path)
+        except OSError:
+            # Different filesystem or no hardlink support
+            if move:
+                shutil.move(path, artifact_path)
+            else:
+                shutil.copyfile(path, artifact_path)
+        return artifact_path
+
+    def maybe_collect_garbage(self) -> None:
+        """Runs ``collect_garbage`` at most once every ``GC_INTERVAL`` seconds per process."""
+
+        with ArtifactStore._gc_lock:
+            if time.time() - ArtifactStore._last_gc < GC_INTERVAL:
+                return
+            ArtifactStore._last_gc = time.time()
+        self.collect_garbage()
+
+    def collect_garbage(self) -> None:
+        """Deletes artifacts older than ``ttl`` seconds."""
+
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.artifact_dir):
+            created_at, _, _ = name.partition("_")
+            if not created_at.isdigit() or int(created_at) >= cutoff:
+                continue
+            try:
+                os.remove(os.path.join(self.artifact_dir, name))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from typing import List, Optional, Tuple
+from fastapi import HTTPException
+
+from manimator.utils import metrics
+from manimator.utils.helpers import DEFAULT_HTTP_TIMEOUT, get_session
+
+
+DEFAULT_ARXIV_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "manimator", "arxiv"
+)
+DEFAULT_ARXIV_CACHE_MAX_BYTES = 1024**3
+DEFAULT_ARXIV_REVALIDATE_AFTER = 24 * 3600
+DEFAULT_ARXIV_PDF_URL = "https://arxiv.org/pdf"
+
+# Versioned ids like 2310.11453v2 (or math/0601001v1) never change on arXiv
+VERSIONED_ID = re.compile(r".+v\d+")
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ArxivCache:
+    """On-disk cache of arXiv papers and everything derived from them.
+
+    A small index maps an arXiv id to the hash of its PDF and the validators
+    (``ETag``/``Last-Modified``) of the download. Everything else is stored by
+    content hash: the raw PDF, the preprocessed content sent to the model for
+    each PDF mode and the scene description generated by each model and mode. Versioned ids are
+    immutable and never re-fetched; unversioned ids are revalidated with a
+    conditional GET once they are older than ``revalidate_after`` seconds, so
+    an unchanged paper costs at most a ``304``. The least recently used files
+    are evicted once the cache exceeds ``max_bytes``.
+
+    Args:
+        cache_dir (Optional[str]): Cache directory. Defaults to env ARXIV_CACHE_DIR
+        max_bytes (Optional[int]): Size limit. Defaults to env ARXIV_CACHE_MAX_BYTES
+        revalidate_after (Optional[int]): Seconds before an unversioned id is
+            checked for a new version. Defaults to env ARXIV_REVALIDATE_AFTER
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        revalidate_after: Optional[int] = None,
+    ):
+        self.cache_dir = (
+            cache_dir or os.getenv("ARXIV_CACHE_DIR") or DEFAULT_ARXIV_CACHE_DIR
+        )
+        if max_bytes is None:
+            max_bytes = int(
+                os.getenv("ARXIV_CACHE_MAX_BYTES") or DEFAULT_ARXIV_CACHE_MAX_BYTES
+            )
+        self.max_bytes = max_bytes
+        if revalidate_after is None:
+            revalidate_after = int(
+                os.getenv("ARXIV_REVALIDATE_AFTER") or DEFAULT_ARXIV_REVALIDATE_AFTER
+            )
+        self.revalidate_after = revalidate_after
+        for name in ("ids", "blobs"):
+            os.makedirs(os.path.join(self.cache_dir, name), exist_ok=True)
+
+    def _index_path(self, arxiv_id: str) -> str:
+        digest = hashlib.sha256(arxiv_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, "ids", f"{digest}.json")
+
+    def _blob_path(self, content_hash: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, "blobs", f"{content_hash}{suffix}")
+
+    def _read_blob(self, path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return data
+
+    def _load_index(self, arxiv_id: str) -> dict:
+        try:
+            with open(self._index_path(arxiv_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def fetch(self, arxiv_id: str) -> Tuple[bytes, str]:
+        """Returns the PDF of a paper, downloading it only when needed.
+
+        Args:
+            arxiv_id (str): arXiv id, optionally with a version suffix
+
+        Returns:
+            Tuple[bytes, str]: Raw PDF content and its sha256 content hash
+
+        Raises:
+            HTTPException: 500 if the paper cannot be downloaded
+        """
+
+        arxiv_id = arxiv_id.strip()
+        entry = self._load_index(arxiv_id)
+        pdf = self._read_blob(self._blob_path(entry["hash"], ".pdf")) if entry else None
+        if pdf is not None and (
+            VERSIONED_ID.fullmatch(arxiv_id)
+            or time.time() - entry["checked_at"] < self.revalidate_after
+        ):
+            metrics.increment("cache_requests_total", cache="arxiv_pdf", result="hit")
+            return pdf, entry["hash"]
+
+        base_url = os.getenv("ARXIV_PDF_URL") or DEFAULT_ARXIV_PDF_URL
+        url = f"{base_url.rstrip('/')}/{arxiv_id}"
+        headers = {}
+        if pdf is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            with metrics.span("arxiv_download"):
+                response = get_session(url).get(
+                    url, headers=headers, timeout=DEFAULT_HTTP_TIMEOUT
+                )
+                if response.status_code != 304:
+                    response.raise_for_status()
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail=f"Failed to download arxiv PDF: {str(e)}"
+            )
+
+        result = "revalidated" if response.status_code == 304 else "miss"
+        metrics.increment("cache_requests_total", cache="arxiv_pdf", result=result)
+        if response.status_code == 304:
+            entry["checked_at"] = time.time()
+        else:
+            pdf = response.content
+            content_hash = hashlib.sha256(pdf).hexdigest()
+            _atomic_write(self._blob_path(content_hash, ".pdf"), pdf)
+            entry = {
+                "hash": content_hash,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "checked_at": time.time(),
+            }
+            self.evict()
+        _atomic_write(self._index_path(arxiv_id), json.dumps(entry).encode("utf-8"))
+        return pdf, entry["hash"]
+
+    def _payload_path(self, content_hash: str, mode: str) -> str:
+        return self._blob_path(content_hash, f".{mode}.json")
+
+    def get_payload(self, content_hash: str, mode: str) -> Optional[List[dict]]:
+        """Returns the cached preprocessed content of a PDF in a mode, if any."""
+
+        data = self._read_blob(self._payload_path(content_hash, mode))
+        return json.loads(data) if data is not None else None
+
+    def put_payload(self, content_hash: str, mode: str, payload: List[dict]) -> None:
+        """Stores the preprocessed content of a PDF in a mode."""
+
+        _atomic_write(
+            self._payload_path(content_hash, mode), json.dumps(payload).encode("utf-8")
+        )
+        self.evict()
+
+    def _scene_path(self, content_hash: str, model: Optional[str], mode: str) -> str:
+        key = f"{model or ''}\0{mode}"
+        key_hash = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        return self._blob_path(content_hash, f".{key_hash}.scene.txt")
+
+    def get_scene_description(
+        self, content_hash: str, model: Optional[str], mode: str
+    ) -> Optional[str]:
+        """Returns the scene description generated for a PDF, if cached."""
+
+        data = self._read_blob(self._scene_path(content_hash, model, mode))
+        metrics.increment(
+            "cache_requests_total",
+            cache="arxiv_scene",
+            result="miss" if data is None else "hit",
+        )
+        return data.decode("utf-8") if data is not None else None
+
+    def put_scene_description(
+        self, content_hash: str, model: Optional[str], mode: str, scene_description: str
+    ) -> None:
+        """Stores the scene description a model generated for a PDF in a mode."""
+
+        _atomic_write(
+            self._scene_path(content_hash, model, mode),
+            scene_description.encode("utf-8"),
+        )
+
+    def evict(self) -> None:
+        """Removes least recently used files until the cache fits in ``max_bytes``."""
+
+        blob_dir = os.path.join(self.cache_dir, "blobs")
+        entries = []
+        total = 0
+        for name in os.listdir(blob_dir):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(blob_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Optional
+
+from manimator.utils.pipeline_cache import normalize_prompt
+
+
+DEFAULT_ASSET_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "manimator", "assets"
+)
+DEFAULT_ASSET_TTL = 7 * 24 * 3600
+DEFAULT_ASSET_MAX_BYTES = 1024**3
+DEFAULT_ASSET_MAX_DIMENSION = 1920
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def normalize_image(src_path: str, dst_path: str, max_dimension: int) -> None:
+    """Decodes an image once and stores it as a PNG ready for ``ImageMobject``.
+
+    The image is rotated according to its EXIF orientation, converted to RGB or
+    RGBA and shrunk to fit in ``max_dimension`` pixels, so renders neither
+    decode oversized photos nor trip over exotic modes like CMYK or palettes.
+
+    Raises:
+        OSError: If the file is not an image Pillow can read
+    """
+
+    from PIL import Image, ImageOps
+
+    with Image.open(src_path) as image:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or (
+            image.mode == "P" and "transparency" in image.info
+        )
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        image.thumbnail((max_dimension, max_dimension))
+        image.save(dst_path, format="PNG")
+
+
+class AssetStore:
+    """Persistent, deduplicated store of the images used by scenes.
+
+    Two small JSON indexes map a normalized search query to the image URL it
+    resolved to, and a URL to the hash of its content. Blobs are stored once
+    per content hash as normalized PNGs (see ``normalize_image``) and handed to
+    renders as hardlinks, so a hot query costs no search, no download and no
+    re-encoding. Entries unused for ``ttl`` seconds are dropped, and the least
+    recently used blobs are evicted once the store exceeds ``max_bytes``.
+
+    Args:
+        asset_dir (Optional[str]): Store directory. Defaults to env ASSET_DIR
+        ttl (Optional[int]): Seconds to keep unused entries. Defaults to env ASSET_TTL
+        max_bytes (Optional[int]): Size limit of the blobs. Defaults to env
+            ASSET_MAX_BYTES
+        max_dimension (Optional[int]): Largest width or height of a stored image.
+            Defaults to env ASSET_MAX_DIMENSION
+    """
+
+    def __init__(
+        self,
+        asset_dir: Optional[str] = None,
+        ttl: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_dimension: Optional[int] = None,
+    ):
+        self.asset_dir = asset_dir or os.getenv("ASSET_DIR") or DEFAULT_ASSET_DIR
+        self.ttl = ttl or int(os.getenv("ASSET_TTL") or DEFAULT_ASSET_TTL)
+        if max_bytes is None:
+            max_bytes = int(os.getenv("ASSET_MAX_BYTES") or DEFAULT_ASSET_MAX_BYTES)
+        self.max_bytes = max_bytes
+        self.max_dimension = max_dimension or int(
+            os.getenv("ASSET_MAX_DIMENSION") or DEFAULT_ASSET_MAX_DIMENSION
+        )
+        for name in ("queries", "urls", "blobs"):
+            os.makedirs(os.path.join(self.asset_dir, name), exist_ok=True)
+
+    def _index_path(self, index: str, value: str) -> str:
+        return os.path.join(self.asset_dir, index, f"{_digest(value)}.json")
+
+    def blob_path(self, content_hash: str) -> str:
+        """Returns the path of the stored PNG for a content hash."""
+
+        return os.path.join(self.asset_dir, "blobs", f"{content_hash}.png")
+
+    def _read_index(self, index: str, value: str) -> Optional[dict]:
+        path = self._index_path(index, value)
+        try:
+            if os.stat(path).st_mtime < time.time() - self.ttl:
+                return None
+            with open(path) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not os.path.exists(self.blob_path(entry["hash"])):
+            return None
+        os.utime(path)
+        return entry
+
+    def _write_index(self, index: str, value: str, entry: dict) -> None:
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.join(self.asset_dir, index), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._index_path(index, value))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def lookup_query(self, query: str) -> Optional[dict]:
+        """Returns the cached ``{"url", "hash"}`` of a search query, if any."""
+
+        return self._read_index("queries", normalize_prompt(query))
+
+    def lookup_url(self, url: str) -> Optional[str]:
+        """Returns the content hash of a previously downloaded URL, if any."""
+
+        entry = self._read_index("urls", url)
+        return entry["hash"] if entry else None
+
+    def add(self, file_path: str, url: str, query: Optional[str] = None) -> str:
+        """Stores a downloaded image and indexes it by URL and search query.
+
+        Args:
+            file_path (str): Downloaded file, left in place
+            url (str): URL the file was downloaded from
+            query (Optional[str]): Search query that resolved to ``url``
+
+        Returns:
+            str: Content hash of the image
+
+        Raises:
+            OSError: If the file is not a readable image
+        """
+
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+
+        blob_path = self.blob_path(content_hash)
+        if not os.path.exists(blob_path):
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.join(self.asset_dir, "blobs"), suffix=".tmp"
+            )
+            os.close(fd)
+            try:
+                normalize_image(file_path, tmp_path, self.max_dimension)
+                os.replace(tmp_path, blob_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self.evict()
+
+        self._write_index("urls", url, {"hash": content_hash})
+        if query:
+            self.index_query(query, url, content_hash)
+        return content_hash
+
+    def index_query(self, query: str, url: str, content_hash: str) -> None:
+        """Records that a search query resolved to an already stored image."""
+
+        self._write_index(
+            "queries", normalize_prompt(query), {"url": url, "hash": content_hash}
+        )
+
+    def materialize(self, content_hash: str, dest_path: str) -> bool:
+        """Places a stored image at ``dest_path``, hardlinked when possible.
+
+        Returns:
+            bool: False if the image is no longer stored
+        """
+
+        blob_path = self.blob_path(content_hash)
+        try:
+            os.utime(blob_path)
+        except FileNotFoundError:
+            return False
+        try:
+            os.link(blob_path, dest_path)
+        except FileExistsError:
+            pass
+        except OSError:
+            shutil.copyfile(blob_path, dest_path)
+        return True
+
+    def evict(self) -> None:
+        """Drops expired index entries and blobs, then least recently used blobs
+        until the store fits in ``max_bytes``."""
+
+        cutoff = time.time() - self.ttl
+        for index in ("queries", "urls"):
+            index_dir = os.path.join(self.asset_dir, index)
+            for name in os.listdir(index_dir):
+                path = os.path.join(index_dir, name)
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+        entries = []
+        total = 0
+        blob_dir = os.path.join(self.asset_dir, "blobs")
+        for name in os.listdir(blob_dir):
+            if not name.endswith(".png"):
+                continue
+            path = os.path.join(blob_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes and mtime >= cutoff:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -0,0 +1,100 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from manimator.utils import metrics
+
+
+class StageGraph:
+    """Runs pipeline stages as a DAG, each as soon as its dependencies are done.
+
+    A stage is a function receiving the results of its dependencies as keyword
+    arguments, named after the dependencies. Independent stages run
+    concurrently in a thread pool, which suits the pipeline's stages since
+    they mostly wait on LLM and HTTP round-trips. The wall-clock duration of
+    every stage is recorded in ``timings`` and in the stage metrics.
+
+    Example:
+        graph = StageGraph()
+        graph.add("description", lambda: describe(prompt))
+        graph.add("queries", lambda description: queries(description), ["description"])
+        results = graph.run()
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Tuple[Callable[..., Any], Tuple[str, ...]]] = {}
+        self.timings: Dict[str, float] = {}
+
+    def add(
+        self, name: str, fn: Callable[..., Any], deps: Sequence[str] = ()
+    ) -> None:
+        """Adds a stage.
+
+        Args:
+            name (str): Unique stage name, also the keyword its result is
+                passed to dependent stages as
+            fn (Callable[..., Any]): Stage function
+            deps (Sequence[str]): Stages that must finish before this one starts.
+                They must have been added already, which rules out cycles
+        """
+
+        if name in self._stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        missing = [dep for dep in deps if dep not in self._stages]
+        if missing:
+            raise ValueError(f"Unknown dependencies of {name}: {missing}")
+        self._stages[name] = (fn, tuple(deps))
+
+    def run(self, max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """Runs all stages and waits for them to finish.
+
+        Args:
+            max_workers (Optional[int]): Stages running at the same time.
+                Defaults to the number of stages
+
+        Returns:
+            Dict[str, Any]: Result of every stage by name
+
+        Raises:
+            Exception: The first exception raised by a stage. Stages that have
+                not started yet are skipped; running stages are waited for
+        """
+
+        results: Dict[str, Any] = {}
+        running: Dict[Future, str] = {}
+        pending = dict(self._stages)
+        self.timings = {}
+
+        def timed(name: str, fn: Callable[..., Any], kwargs: Dict[str, Any]) -> Any:
+            started = time.perf_counter()
+            try:
+                with metrics.span(name):
+                    return fn(**kwargs)
+            finally:
+                self.timings[name] = time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(pending) or 1) as pool:
+            while pending or running:
+                for name, (fn, deps) in list(pending.items()):
+                    if all(dep in results for dep in deps):
+                        del pending[name]
+                        kwargs = {dep: results[dep] for dep in deps}
+                        running[pool.submit(timed, name, fn, kwargs)] = name
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        pending.clear()
+                        wait(running)
+                        raise error
+                    results[name] = future.result()
+        return results
+
+    def format_timings(self) -> str:
+        """Formats the stage timings of the last run, e.g. ``code 4.20s``."""
+
+        return ", ".join(
+            f"{name} {seconds:.2f}s" for name, seconds in self.timings.items()
+        )
@@ -0,0 +1,247 @@
+import os
+import shutil
+import subprocess
+from typing import List, Optional, Sequence, Tuple
+
+from manimator.utils import metrics
+
+
+DEFAULT_VIDEO_CODEC = "copy"
+DEFAULT_VIDEO_CRF = 23
+DEFAULT_VIDEO_PRESET = "veryfast"
+# 0 lets ffmpeg pick the number of threads
+DEFAULT_ENCODE_THREADS = 0
+DEFAULT_OUTPUT_FORMATS = "mp4"
+
+# "copy" keeps manim's own encode and only remuxes it
+VIDEO_CODECS = ("copy", "libx264", "libx265")
+VIDEO_PRESETS = (
+    "ultrafast",
+    "superfast",
+    "veryfast",
+    "faster",
+    "fast",
+    "medium",
+    "slow",
+    "slower",
+    "veryslow",
+)
+OUTPUT_FORMATS = ("mp4", "webm", "gif", "png")
+MEDIA_TYPES = {
+    "mp4": "video/mp4",
+    "webm": "video/webm",
+    "gif": "image/gif",
+    "png": "image/png",
+}
+# Settings of the derived formats, which are previews rather than masters
+WEBM_CRF = 33
+GIF_FPS = 15
+GIF_WIDTH = 480
+
+
+class EncodeOptions:
+    """Encoder settings and output formats of rendered videos.
+
+    manim always encodes its MP4 with the same settings. With the default
+    ``copy`` codec that MP4 is kept as is and, with ``faststart``, only remuxed
+    so that its ``moov`` atom comes first and playback starts before the
+    download completes. Other codecs re-encode it with ``crf`` and ``preset``,
+    e.g. ``libx264`` with ``veryfast`` and CRF 28 for small files of short
+    explainers. WebM, GIF and last frame PNG outputs are derived from the
+    final MP4.
+
+    Args:
+        codec (Optional[str]): One of ``VIDEO_CODECS``. Defaults to env VIDEO_CODEC
+        crf (Optional[int]): Constant rate factor of re-encodes, lower is
+            better quality. Defaults to env VIDEO_CRF
+        preset (Optional[str]): One of ``VIDEO_PRESETS``, faster presets use
+            less CPU for larger files. Defaults to env VIDEO_PRESET
+        threads (Optional[int]): ffmpeg threads per encode, 0 for automatic.
+            Defaults to env ENCODE_THREADS
+        formats (Optional[Sequence[str]]): Outputs among ``OUTPUT_FORMATS``, the
+            MP4 is always produced. Defaults to env OUTPUT_FORMATS, comma
+            separated
+        faststart (Optional[bool]): Whether to move the ``moov`` atom to the
+            front of the MP4. Defaults to env FASTSTART, or true
+
+    Raises:
+        ValueError: If a setting is out of range
+    """
+
+    def __init__(
+        self,
+        codec: Optional[str] = None,
+        crf: Optional[int] = None,
+        preset: Optional[str] = None,
+        threads: Optional[int] = None,
+        formats: Optional[Sequence[str]] = None,
+        faststart: Optional[bool] = None,
+    ):
+        self.codec = codec or os.getenv("VIDEO_CODEC") or DEFAULT_VIDEO_CODEC
+        self.crf = crf if crf is not None else int(
+            os.getenv("VIDEO_CRF") or DEFAULT_VIDEO_CRF
+        )
+        self.preset = preset or os.getenv("VIDEO_PRESET") or DEFAULT_VIDEO_PRESET
+        self.threads = threads if threads is not None else int(
+            os.getenv("ENCODE_THREADS") or DEFAULT_ENCODE_THREADS
+        )
+        if formats is None:
+            formats = os.getenv("OUTPUT_FORMATS") or DEFAULT_OUTPUT_FORMATS
+            formats = formats.split(",")
+        self.formats = tuple(
+            sorted({"mp4", *(fmt.strip().lower() for fmt in formats if fmt.strip())})
+        )
+        if faststart is None:
+            faststart = (os.getenv("FASTSTART") or "true").lower() in (
+                "1",
+                "true",
+                "yes",
+            )
+        self.faststart = faststart
+
+        if self.codec not in VIDEO_CODECS:
+            raise ValueError(
+                f"Unknown video codec {self.codec!r}, expected one of {VIDEO_CODECS}"
+            )
+        if self.preset not in VIDEO_PRESETS:
+            raise ValueError(
+                f"Unknown preset {self.preset!r}, expected one of {VIDEO_PRESETS}"
+            )
+        if not 0 <= self.crf <= 51:
+            raise ValueError(f"CRF must be between 0 and 51, got {self.crf}")
+        if self.threads < 0:
+            raise ValueError(f"Threads must be 0 or more, got {self.threads}")
+        unknown = set(self.formats) - set(OUTPUT_FORMATS)
+        if unknown:
+            raise ValueError(
+                f"Unknown output formats {sorted(unknown)}, expected {OUTPUT_FORMATS}"
+            )
+
+    def cache_flags(self) -> List[str]:
+        """Settings that change the final MP4, part of the render cache key."""
+
+        flags = ["--faststart"] if self.faststart else []
+        if self.codec != "copy":
+            flags += [
+                f"--codec={self.codec}",
+                f"--crf={self.crf}",
+                f"--preset={self.preset}",
+            ]
+        return flags
+
+    def key(self) -> Tuple[str, ...]:
+        """Identity of the outputs these options produce, e.g. for job keys."""
+
+        return (*self.cache_flags(), *self.formats)
+
+
+def _ffmpeg(args: List[str]) -> None:
+    cmd = ["ffmpeg", "-y", "-loglevel", "error", *args]
+    subprocess.run(cmd, check=True, capture_output=True, text=True)
+
+
+def encode_video(video_path: str, options: EncodeOptions, output_path: str) -> str:
+    """Applies the codec and faststart settings to a video rendered by manim.
+
+    The faststart remux copies the streams, so it costs I/O but no encoding.
+    It is skipped, with the video returned as is, when ffmpeg is not installed.
+
+    Args:
+        video_path (str): MP4 written by manim
+        options (EncodeOptions): Encoder settings
+        output_path (str): Where to write the final MP4
+
+    Returns:
+        str: Path to the final MP4, ``video_path`` if nothing had to be done
+
+    Raises:
+        subprocess.CalledProcessError: If ffmpeg fails
+        FileNotFoundError: If re-encoding is requested without ffmpeg
+    """
+
+    if options.codec == "copy" and not (options.faststart and shutil.which("ffmpeg")):
+        return video_path
+
+    args = ["-i", video_path]
+    if options.codec == "copy":
+        args += ["-c", "copy"]
+    else:
+        args += [
+            "-c:v",
+            options.codec,
+            "-crf",
+            str(options.crf),
+            "-preset",
+            options.preset,
+            "-pix_fmt",
+            "yuv420p",
+            "-c:a",
+            "copy",
+        ]
+        if options.codec == "libx265":
+            # Tag HEVC the way Apple players expect
+            args += ["-tag:v", "hvc1"]
+    args += ["-threads", str(options.threads)]
+    if options.faststart:
+        args += ["-movflags", "+faststart"]
+    with metrics.span("encode", format="mp4", codec=options.codec):
+        _ffmpeg([*args, output_path])
+    return output_path
+
+
+def export_video(
+    video_path: str, fmt: str, options: EncodeOptions, output_path: str
+) -> str:
+    """Derives a WebM, GIF or last frame PNG from a final MP4.
+
+    Args:
+        video_path (str): Final MP4
+        fmt (str): ``webm``, ``gif`` or ``png``
+        options (EncodeOptions): Encoder settings, for the thread count
+        output_path (str): Where to write the output
+
+    Returns:
+        str: ``output_path``
+
+    Raises:
+        subprocess.CalledProcessError: If ffmpeg fails
+    """
+
+    threads = ["-threads", str(options.threads)]
+    if fmt == "webm":
+        args = [
+            "-i",
+            video_path,
+            "-c:v",
+            "libvpx-vp9",
+            "-crf",
+            str(WEBM_CRF),
+            "-b:v",
+            "0",
+            "-row-mt",
+            "1",
+            # Realtime deadline trades some size for a much faster encode
+            "-deadline",
+            "realtime",
+            "-cpu-used",
+            "8",
+            "-c:a",
+            "libopus",
+            *threads,
+        ]
+    elif fmt == "gif":
+        palette = (
+            f"fps={GIF_FPS},scale={GIF_WIDTH}:-1:flags=lanczos,"
+            "split[frames][copy];[copy]palettegen[palette];"
+            "[frames][palette]paletteuse"
+        )
+        args = ["-i", video_path, "-vf", palette, "-loop", "0", *threads]
+    elif fmt == "png":
+        # Decode only the last second; every frame overwrites the image
+        args = ["-sseof", "-1", "-i", video_path, "-update", "1", *threads]
+    else:
+        raise ValueError(f"Cannot export {fmt!r}, expected webm, gif or png")
+    with metrics.span("encode", format=fmt, codec=options.codec):
+        _ffmpeg([*args, output_path])
+    return output_path
+
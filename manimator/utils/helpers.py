@@ -2,16 +2,53 @@ from fastapi import HTTPException
 from PyPDF2 import PdfReader, PdfWriter
 from io import BytesIO
 import base64
+import functools
+import mmap
 import requests
+import threading
 from importlib import resources
 from pathlib import Path
-from typing import Optional
+from requests.adapters import HTTPAdapter
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence
+from urllib.parse import urlsplit
+
+from manimator.utils.prompt_cache import cacheable_prefix, uses_cache_markers
 import base64
 
 
+DEFAULT_HTTP_TIMEOUT = 30
+HTTP_POOL_SIZE = 16
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(url: str) -> requests.Session:
+    """Returns the pooled session for the host of ``url``.
+
+    Requests to the same host reuse kept-alive connections instead of opening
+    a new TCP and TLS connection per request.
+    """
+
+    host = urlsplit(url).netloc
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[host] = session
+        return session
+
+
+@functools.lru_cache(maxsize=None)
 def read_base64_few_shot_file(filename: str = "few_shot_1.pdf") -> str:
     """Reads and returns content of a few-shot example file.
 
+    The file is memory-mapped rather than read into a separate buffer, and the
+    encoded content is memoized per process.
+
     Args:
         filename: Name of the file in few_shot package
 
@@ -27,10 +64,10 @@ def read_base64_few_shot_file(filename: str = "few_shot_1.pdf") -> str:
             if not pdf_path:
                 raise FileNotFoundError("PDF resource not found")
 
-            with open(pdf_path, "rb") as pdf_file:
-                pdf_bytes = pdf_file.read()
-                base64_str = base64.b64encode(pdf_bytes).decode("utf-8")
-                return base64_str
+            with open(pdf_path, "rb") as pdf_file, mmap.mmap(
+                pdf_file.fileno(), 0, access=mmap.ACCESS_READ
+            ) as pdf_bytes:
+                return base64.b64encode(pdf_bytes).decode("utf-8")
     except Exception as e:
         print(f"Error accessing resource {filename}: {e}")
         return None
@@ -50,7 +87,7 @@ def download_arxiv_pdf(url: str) -> bytes:
     """
 
     try:
-        response = requests.get(url)
+        response = get_session(url).get(url, timeout=DEFAULT_HTTP_TIMEOUT)
         response.raise_for_status()
         return response.content
     except Exception as e:
@@ -88,3 +125,74 @@ def compress_pdf(content: bytes, compression_level: int = 5) -> str:
         return base64.b64encode(compressed_bytes).decode("utf-8")
     except Exception as e:
         return base64.b64encode(content).decode("utf-8")
+
+
+def stream_options(on_token: Optional[Callable[[str], None]]) -> Dict[str, Any]:
+    """Returns the ``litellm.completion`` arguments to stream a response, if any.
+
+    Streamed responses only report their token usage, in a final chunk, when
+    asked to with ``include_usage``; see ``collect_stream``.
+
+    Args:
+        on_token (Optional[Callable[[str], None]]): Token callback of the caller,
+            the response is streamed if given
+    """
+
+    if on_token is None:
+        return {"stream": False}
+    return {"stream": True, "stream_options": {"include_usage": True}}
+
+
+def collect_stream(
+    chunks: Iterable,
+    on_token: Callable[[str], None],
+    on_usage: Optional[Callable[[Any], None]] = None,
+) -> str:
+    """Collects a streamed litellm completion, reporting every token.
+
+    Args:
+        chunks (Iterable): Response of ``litellm.completion(..., stream=True)``
+        on_token (Callable[[str], None]): Called with each content delta
+        on_usage (Optional[Callable[[Any], None]]): Called with the token usage
+            once the stream ends, None if the provider did not report it
+
+    Returns:
+        str: The complete message content
+    """
+
+    parts = []
+    usage = None
+    for chunk in chunks:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            parts.append(delta)
+            on_token(delta)
+        usage = getattr(chunk, "usage", None) or usage
+    if on_usage is not None:
+        on_usage(usage)
+    return "".join(parts)
+
+
+def build_messages(
+    prefix: Sequence[dict], *messages: dict, model: Optional[str] = None
+) -> list:
+    """Appends the per-request messages to a prebuilt message prefix.
+
+    Prefixes (system prompt and few-shot examples) are built once at import
+    and shared by every request; their messages are reused as-is, not copied,
+    and must not be mutated. Keeping them byte-identical across requests is
+    also what lets providers serve them from their prompt cache. For models
+    that need explicit markers, the prefix is marked as cacheable.
+
+    Args:
+        prefix (Sequence[dict]): Static leading messages
+        *messages (dict): Messages specific to the request
+        model (Optional[str]): Model the messages are sent to
+
+    Returns:
+        list: A new message list
+    """
+
+    if uses_cache_markers(model):
+        prefix = cacheable_prefix(prefix)
+    return [*prefix, *messages]
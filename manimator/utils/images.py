@@ -0,0 +1,230 @@
+import importlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from manimator.utils import metrics
+from manimator.utils.assets import AssetStore
+from manimator.utils.helpers import get_session
+
+
+DEFAULT_IMAGE_FETCH_CONCURRENCY = 6
+DEFAULT_IMAGE_FETCH_TIMEOUT = 15
+DEFAULT_IMAGE_MAX_BYTES = 20 * 1024**2
+
+SearchFn = Callable[[str], Optional[str]]
+
+def serpapi_search(query: str) -> Optional[str]:
+    """Looks up the first Google Images result for a query through SerpApi.
+
+    Args:
+        query (str): Image search query
+
+    Returns:
+        Optional[str]: URL of the original image, None if nothing was found
+    """
+
+    from serpapi import GoogleSearch
+
+    results = GoogleSearch(
+        {
+            "engine": "google_images",
+            "q": query,
+            "api_key": os.getenv("SERPAPI_API_KEY"),
+            "num": 1,
+        }
+    ).get_dict()
+    images = results.get("images_results") or []
+    return images[0].get("original") if images else None
+
+
+def get_search_backend() -> SearchFn:
+    """Returns the configured image search function.
+
+    Env IMAGE_SEARCH_BACKEND may name any ``module:function`` taking a query and
+    returning an image URL, e.g. a local stub for tests. Defaults to SerpApi.
+    """
+
+    backend = os.getenv("IMAGE_SEARCH_BACKEND")
+    if not backend:
+        return serpapi_search
+    module_name, _, function_name = backend.partition(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def image_file_name(index: int, content_hash: str) -> str:
+    """Names the ``index``-th image of a scene after its content.
+
+    Different content never shares a name, so the name pins the image for the
+    render cache, which is keyed by the scene code referencing it.
+    """
+
+    return f"{index}_{content_hash[:16]}.png"
+
+
+def assign_placeholders(entries: Optional[List[dict]]) -> List[dict]:
+    """Gives every image entry a placeholder ``file_name`` of ``asset_<i>.png``.
+
+    The names are known before any image is downloaded, so code generation can
+    reference them while the downloads are still running; ``fetch_images``
+    binds each name to its image once the download lands.
+    """
+
+    return [
+        {**entry, "file_name": entry.get("file_name") or f"asset_{index}.png"}
+        for index, entry in enumerate(entries or [])
+    ]
+
+
+def fill_missing_images(entries: List[dict], dest_dir: str) -> List[str]:
+    """Binds placeholders whose image could not be fetched to a blank image.
+
+    The generated code already references every placeholder, so a failed
+    download must not make the whole render fail.
+
+    Returns:
+        List[str]: File names that were filled with a blank image
+    """
+
+    from PIL import Image
+
+    missing = []
+    for entry in entries:
+        file_path = os.path.join(dest_dir, entry["file_name"])
+        if not os.path.exists(file_path):
+            Image.new("RGBA", (1, 1), (0, 0, 0, 0)).save(file_path, format="PNG")
+            missing.append(entry["file_name"])
+    return missing
+
+
+def download_image(url: str, file_path: str, timeout: float, max_bytes: int) -> None:
+    """Streams an image to ``file_path``, failing on errors or oversized files.
+
+    The file only appears under its final name once completely downloaded.
+    """
+
+    tmp_path = f"{file_path}.part"
+    try:
+        with get_session(url).get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            size = 0
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ValueError(f"Image larger than {max_bytes} bytes: {url}")
+                    f.write(chunk)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def fetch_images(
+    entries: List[dict],
+    dest_dir: str,
+    search_fn: Optional[SearchFn] = None,
+    max_workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+    asset_store: Optional[AssetStore] = None,
+) -> List[dict]:
+    """Searches and downloads the images of a scene concurrently.
+
+    Every entry with a ``search_query`` is resolved to a ``url`` and an image in
+    the ``AssetStore``, which is then linked into ``dest_dir`` as ``file_name``.
+    Queries and URLs already known to the store cost no network calls. Entries
+    whose image is already present are left alone, so calling this again on a
+    cached result only re-materializes the missing files.
+
+    Args:
+        entries (List[dict]): Image entries as returned by ``search_image_online``
+        dest_dir (str): Directory to download into, usually the render's temp dir
+        search_fn (Optional[SearchFn]): Query to URL lookup. Defaults to
+            ``get_search_backend()``
+        max_workers (Optional[int]): Concurrent fetches. Defaults to env
+            IMAGE_FETCH_CONCURRENCY
+        timeout (Optional[float]): Seconds per request. Defaults to env
+            IMAGE_FETCH_TIMEOUT
+        asset_store (Optional[AssetStore]): Image store. A store in the default
+            location is used when omitted
+
+    Returns:
+        List[dict]: The entries whose image is available in ``dest_dir``, with
+            ``url``, ``asset_hash`` and ``file_name`` set. Entries that failed
+            are dropped
+    """
+
+    search_fn = search_fn or get_search_backend()
+    asset_store = asset_store or AssetStore()
+    max_workers = max_workers or int(
+        os.getenv("IMAGE_FETCH_CONCURRENCY") or DEFAULT_IMAGE_FETCH_CONCURRENCY
+    )
+    timeout = timeout or float(
+        os.getenv("IMAGE_FETCH_TIMEOUT") or DEFAULT_IMAGE_FETCH_TIMEOUT
+    )
+    max_bytes = int(os.getenv("IMAGE_MAX_BYTES") or DEFAULT_IMAGE_MAX_BYTES)
+
+    def resolve(entry: dict) -> None:
+        query = entry.get("search_query")
+        if not entry.get("url") and query:
+            cached = asset_store.lookup_query(query)
+            metrics.increment(
+                "cache_requests_total",
+                cache="image_query",
+                result="hit" if cached else "miss",
+            )
+            if cached:
+                entry["url"], entry["asset_hash"] = cached["url"], cached["hash"]
+                return
+            with metrics.span("image_search"):
+                entry["url"] = search_fn(query)
+            if not entry["url"]:
+                raise LookupError("no image found")
+        content_hash = asset_store.lookup_url(entry["url"])
+        metrics.increment(
+            "cache_requests_total",
+            cache="image_url",
+            result="miss" if content_hash is None else "hit",
+        )
+        if content_hash is None:
+            fd, tmp_path = tempfile.mkstemp(dir=dest_dir, suffix=".download")
+            os.close(fd)
+            try:
+                with metrics.span("image_download"):
+                    download_image(entry["url"], tmp_path, timeout, max_bytes)
+                content_hash = asset_store.add(tmp_path, entry["url"], query)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        elif query:
+            asset_store.index_query(query, entry["url"], content_hash)
+        entry["asset_hash"] = content_hash
+
+    def fetch(index: int, entry: dict) -> Optional[dict]:
+        entry = dict(entry)
+        try:
+            if entry.get("file_name") and os.path.exists(
+                os.path.join(dest_dir, entry["file_name"])
+            ):
+                return entry
+            if not (
+                entry.get("asset_hash")
+                and os.path.exists(asset_store.blob_path(entry["asset_hash"]))
+            ):
+                resolve(entry)
+            entry.setdefault("file_name", image_file_name(index, entry["asset_hash"]))
+            file_path = os.path.join(dest_dir, entry["file_name"])
+            if not asset_store.materialize(entry["asset_hash"], file_path):
+                raise LookupError("image evicted while in use")
+            return entry
+        except Exception as e:
+            print(f"Failed to fetch image {entry.get('search_query')!r}: {e}")
+            return None
+
+    if not entries:
+        return []
+    os.makedirs(dest_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(entries))) as executor:
+        results = list(executor.map(fetch, range(len(entries)), entries))
+    return [entry for entry in results if entry is not None]
@@ -0,0 +1,352 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from fastapi import HTTPException
+
+from manimator.api.animation_generation import generate_animation_response
+from manimator.utils import metrics
+from manimator.utils.encoding import EncodeOptions
+from manimator.utils.repair import render_with_repair
+from manimator.utils.schema import ManimProcessor, resolve_quality
+from manimator.utils.validation import validate_scene_code
+
+
+DEFAULT_RENDER_WORKERS = 2
+DEFAULT_MAX_QUEUED_JOBS = 16
+DEFAULT_JOB_TTL = 3600
+
+logger = logging.getLogger(__name__)
+
+# A follow-up job: job function, its arguments and its ``key``
+FollowUp = Tuple[Callable[..., Dict[str, Any]], tuple, Optional[Hashable]]
+
+
+def render_code(
+    processor: ManimProcessor,
+    code: str,
+    temp_dir: str,
+    project_id: Optional[str],
+    quality: Optional[str] = None,
+    prompt: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Renders generated Manim code and returns the job result fields.
+
+    If the prompt the code was generated from is given, render errors are sent
+    back to the model to fix the code, see ``render_with_repair``, and the
+    result holds the fixed code.
+
+    Raises:
+        HTTPException: If the code fails validation (422) or rendering fails
+    """
+
+    scene_name = validate_scene_code(code)
+    quality = resolve_quality(quality)
+
+    def render(scene_file: str, scene_name: str) -> Optional[str]:
+        return processor.render_scene(
+            scene_file, scene_name, temp_dir, project_id=project_id, quality=quality
+        )
+
+    if prompt is None:
+        video_path = render(processor.save_code(code, temp_dir), scene_name)
+    else:
+        video_path, code = render_with_repair(
+            processor, code, scene_name, temp_dir, render, prompt
+        )
+    if not video_path:
+        raise HTTPException(status_code=500, detail="Failed to render animation")
+    return {
+        "video_path": video_path,
+        "code": code,
+        "cache_hit": processor.cache_hit,
+        "project_id": project_id,
+        "quality": quality,
+        "outputs": processor.outputs,
+    }
+
+
+def render_animation_job(
+    prompt: str,
+    project_id: Optional[str] = None,
+    quality: Optional[str] = None,
+    encode_options: Optional[EncodeOptions] = None,
+) -> Dict[str, Any]:
+    """Generates Manim code for a prompt and renders it to video.
+
+    Render errors are fed back to the model to fix the code, within env
+    REPAIR_BUDGET attempts. Runs inside a render worker process, so errors are
+    returned as part of the result instead of being raised across the process
+    boundary.
+
+    Args:
+        prompt (str): Text description of the desired animation
+        project_id (Optional[str]): Project whose persistent media directory is
+            used for rendering
+        quality (Optional[str]): Render quality tier, see ``QUALITY_TIERS``
+        encode_options (Optional[EncodeOptions]): Encoder settings and output
+            formats
+
+    Returns:
+        Dict[str, Any]: Job result with ``video_path``, ``code``, ``cache_hit``,
+            ``quality`` and ``outputs`` (artifact paths by format) on success, or
+            ``status_code`` and ``error`` on failure
+    """
+
+    processor = ManimProcessor(encode_options=encode_options)
+    try:
+        with processor.create_temp_dir() as temp_dir:
+            response = generate_animation_response(prompt)
+            code = processor.extract_code(response)
+            if not code:
+                raise HTTPException(
+                    status_code=400, detail="No valid Manim code generated"
+                )
+            return render_code(
+                processor, code, temp_dir, project_id, quality, prompt
+            )
+    except HTTPException as e:
+        return {"status_code": e.status_code, "error": e.detail}
+    except Exception as e:
+        return {"status_code": 500, "error": str(e)}
+
+
+def render_code_job(
+    code: str,
+    project_id: str,
+    quality: Optional[str] = None,
+    encode_options: Optional[EncodeOptions] = None,
+) -> Dict[str, Any]:
+    """Re-renders edited Manim code within an existing project.
+
+    Only the animations that differ from the project's previous renders are
+    rendered again; the others are reused from manim's partial movie cache.
+
+    Args:
+        code (str): Complete Manim scene code
+        project_id (str): Project whose persistent media directory is used
+        quality (Optional[str]): Render quality tier, see ``QUALITY_TIERS``
+        encode_options (Optional[EncodeOptions]): Encoder settings and output
+            formats
+
+    Returns:
+        Dict[str, Any]: Job result, see ``render_animation_job``
+    """
+
+    processor = ManimProcessor(encode_options=encode_options)
+    try:
+        with processor.create_temp_dir() as temp_dir:
+            return render_code(processor, code, temp_dir, project_id, quality)
+    except HTTPException as e:
+        return {"status_code": e.status_code, "error": e.detail}
+    except Exception as e:
+        return {"status_code": 500, "error": str(e)}
+
+
+def _run_job(fn: Callable[..., Dict[str, Any]], *args: Any) -> Dict[str, Any]:
+    """Runs a job in a worker process and attaches what it measured.
+
+    The spans of the job become its ``timings``. The metrics recorded by the
+    worker are drained into ``metrics``, to be merged into the API process.
+    """
+
+    with metrics.collect_spans() as spans:
+        result = fn(*args)
+    return {**result, "timings": spans, "metrics": metrics.drain()}
+
+
+class JobQueue:
+    """Bounded queue of jobs executed by a pool of worker processes.
+
+    Jobs move through the ``queued``, ``running``, ``completed`` and ``failed``
+    states. Submissions beyond ``max_queued`` unfinished jobs are rejected with
+    a 429 so that callers back off instead of piling up work, and finished jobs
+    are forgotten after ``job_ttl`` seconds. Metrics recorded by a job in its
+    worker process are merged into this process's metrics when it finishes.
+    A job may chain a follow-up job, submitted once it completes, e.g. the
+    final quality render after a quick preview.
+
+    Args:
+        max_workers (Optional[int]): Number of worker processes. Defaults to env
+            RENDER_WORKERS
+        max_queued (Optional[int]): Maximum number of unfinished jobs. Defaults to
+            env MAX_QUEUED_JOBS
+        job_ttl (Optional[int]): Seconds to keep finished jobs. Defaults to env
+            JOB_TTL
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_queued: Optional[int] = None,
+        job_ttl: Optional[int] = None,
+    ):
+        self.max_workers = max_workers or int(
+            os.getenv("RENDER_WORKERS") or DEFAULT_RENDER_WORKERS
+        )
+        self.max_queued = max_queued or int(
+            os.getenv("MAX_QUEUED_JOBS") or DEFAULT_MAX_QUEUED_JOBS
+        )
+        self.job_ttl = job_ttl or int(os.getenv("JOB_TTL") or DEFAULT_JOB_TTL)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def depth(self) -> int:
+        """Returns the number of queued or running jobs."""
+
+        with self._lock:
+            return sum(not job["future"].done() for job in self._jobs.values())
+
+    def submit(
+        self,
+        fn: Callable[..., Dict[str, Any]],
+        *args: Any,
+        key: Optional[Hashable] = None,
+        then: Optional[Callable[[Dict[str, Any]], Optional[FollowUp]]] = None,
+    ) -> str:
+        """Enqueues a job for execution in the worker pool.
+
+        Jobs submitted with the ``key`` of an unfinished job are coalesced into
+        it: the existing job id is returned and no new work is queued.
+
+        Args:
+            fn (Callable[..., Dict[str, Any]]): Picklable job function returning a
+                result dict, with ``error`` and ``status_code`` keys on failure
+            *args: Picklable arguments for ``fn``
+            key (Optional[Hashable]): Normalized identity of the request
+            then (Optional[Callable]): Called with the result of the completed
+                job, may return a ``FollowUp`` job to submit. Its id becomes the
+                job's ``next_job_id``
+
+        Returns:
+            str: Identifier of the new, or coalesced, job
+
+        Raises:
+            HTTPException: 429 if the queue is full
+        """
+
+        self._prune()
+        with self._lock:
+            if key is not None:
+                for job_id, job in self._jobs.items():
+                    if job["key"] == key and not job["future"].done():
+                        metrics.increment(
+                            "single_flight_coalesced_total", operation="job"
+                        )
+                        return job_id
+            pending = sum(not job["future"].done() for job in self._jobs.values())
+            if pending >= self.max_queued:
+                raise HTTPException(
+                    status_code=429,
+                    detail="Render queue is full, please retry later",
+                    headers={"Retry-After": "30"},
+                )
+            job_id = uuid.uuid4().hex
+            try:
+                future = self.executor.submit(_run_job, fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. a crashing render), start a fresh pool
+                self._executor = None
+                future = self.executor.submit(_run_job, fn, *args)
+            self._jobs[job_id] = {
+                "future": future,
+                "key": key,
+                "created_at": time.time(),
+                "finished_at": None,
+                "then": then,
+                "next_job_id": None,
+            }
+        future.add_done_callback(lambda _: self._mark_finished(job_id))
+        return job_id
+
+    def _mark_finished(self, job_id: str) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job["finished_at"] = time.time()
+        if not job or job["future"].cancelled() or job["future"].exception():
+            return
+        result = job["future"].result()
+        metrics.merge(result.get("metrics") or {})
+        follow_up = job["then"] and "error" not in result and job["then"](result)
+        if follow_up:
+            fn, args, key = follow_up
+            try:
+                job["next_job_id"] = self.submit(fn, *args, key=key)
+            except HTTPException as e:
+                metrics.increment("follow_up_jobs_dropped_total")
+                logger.warning(
+                    "Follow-up of job %s was not queued: %s", job_id, e.detail
+                )
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.job_ttl
+        with self._lock:
+            expired = [
+                job_id
+                for job_id, job in self._jobs.items()
+                if job["finished_at"] and job["finished_at"] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def future(self, job_id: str) -> Future:
+        """Returns the future of a job.
+
+        Raises:
+            HTTPException: 404 if the job is unknown or expired
+        """
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        return job["future"]
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        """Returns the status and, once finished, the result of a job.
+
+        Args:
+            job_id (str): Identifier returned by ``submit``
+
+        Returns:
+            Dict[str, Any]: ``job_id`` and ``status`` plus the job result fields,
+                and ``next_job_id`` once a follow-up job was submitted
+
+        Raises:
+            HTTPException: 404 if the job is unknown or expired
+        """
+
+        future = self.future(job_id)
+        if not future.done():
+            status = "running" if future.running() else "queued"
+            return {"job_id": job_id, "status": status}
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {"status_code": 500, "error": str(e)}
+        status = "failed" if "error" in result else "completed"
+        result = {key: value for key, value in result.items() if key != "metrics"}
+        with self._lock:
+            next_job_id = self._jobs.get(job_id, {}).get("next_job_id")
+        if next_job_id:
+            result["next_job_id"] = next_job_id
+        return {"job_id": job_id, "status": status, **result}
+
+    def shutdown(self) -> None:
+        """Stops the worker pool, cancelling jobs that have not started."""
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,243 @@
+import contextlib
+import contextvars
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+# Upper bounds in seconds, from cache lookups to full renders
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+_lock = threading.Lock()
+_counters: Dict[Key, float] = defaultdict(float)
+_gauges: Dict[Key, float] = {}
+# Per series: non-cumulative bucket counts (the last one is +Inf), sum, count
+_histograms: Dict[Key, List[float]] = {}
+_spans: contextvars.ContextVar = contextvars.ContextVar("spans", default=None)
+
+
+def _key(name: str, labels: Dict[str, str]) -> Key:
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def increment(name: str, value: float = 1, **labels: str) -> None:
+    """Increments a process-wide counter.
+
+    Args:
+        name (str): Counter name, e.g. ``tex_cache_hits_total``
+        value (float): Amount to add. Defaults to 1
+        **labels: Label values distinguishing series of the same counter
+    """
+
+    if not value:
+        return
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def counter_value(name: str, **labels: str) -> float:
+    """Returns the current value of a counter, 0 if it was never incremented."""
+
+    with _lock:
+        return _counters.get(_key(name, labels), 0)
+
+
+def histogram_value(name: str, **labels: str) -> Tuple[float, float]:
+    """Returns the ``(count, sum)`` of a histogram, zeros if never observed."""
+
+    with _lock:
+        series = _histograms.get(_key(name, labels))
+        return (series[-1], series[-2]) if series else (0, 0)
+
+
+def set_gauge(name: str, value: float, **labels: str) -> None:
+    """Sets a gauge, a value that can go up and down like a queue depth."""
+
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    """Records a value, usually a duration in seconds, in a histogram.
+
+    Args:
+        name (str): Histogram name, e.g. ``stage_duration_seconds``
+        value (float): Observed value
+        **labels: Label values distinguishing series of the same histogram
+    """
+
+    key = _key(name, labels)
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [0.0] * (len(DEFAULT_BUCKETS) + 3)
+        series[bisect_left(DEFAULT_BUCKETS, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+
+@contextlib.contextmanager
+def span(name: str, **labels: str) -> Iterator[None]:
+    """Times a pipeline stage.
+
+    The duration is observed in the ``stage_duration_seconds`` histogram and,
+    if the stage raises, ``stage_errors_total`` is incremented. Spans are also
+    appended to the list of the enclosing ``collect_spans``, if any.
+
+    Example:
+        with metrics.span("llm", operation="code"):
+            response = litellm.completion(...)
+    """
+
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        observe("stage_duration_seconds", seconds, stage=name, **labels)
+        if failed:
+            increment("stage_errors_total", stage=name, **labels)
+        spans = _spans.get()
+        if spans is not None:
+            spans.append({"stage": name, **labels, "seconds": round(seconds, 4)})
+
+
+@contextlib.contextmanager
+def collect_spans() -> Iterator[List[dict]]:
+    """Collects the spans ended within the block, e.g. those of one request.
+
+    Spans are tracked with a context variable, so they are collected from
+    coroutines and ``asyncio.to_thread`` calls of the block, but not from
+    threads of a plain thread pool.
+
+    Yields:
+        List[dict]: Filled with one ``{"stage", **labels, "seconds"}`` per span
+    """
+
+    spans: List[dict] = []
+    token = _spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _spans.reset(token)
+
+
+def add_spans(spans: List[dict]) -> None:
+    """Adds spans measured elsewhere, e.g. in a worker process, to ``collect_spans``."""
+
+    collected = _spans.get()
+    if collected is not None:
+        collected.extend(spans)
+
+
+def log_timings(record: Dict[str, Any]) -> None:
+    """Prints a structured timing record as one JSON line."""
+
+    print(json.dumps({"event": "timings", **record}), flush=True)
+
+
+def drain() -> Dict[str, list]:
+    """Returns and resets the counters and histograms of this process.
+
+    Worker processes attach the drained metrics to their results so that the
+    API process can ``merge`` them into its own.
+
+    Returns:
+        Dict[str, list]: Picklable ``counters`` and ``histograms`` series
+    """
+
+    with _lock:
+        counters = [
+            (name, labels, value) for (name, labels), value in _counters.items()
+        ]
+        histograms = [
+            (name, labels, series) for (name, labels), series in _histograms.items()
+        ]
+        _counters.clear()
+        _histograms.clear()
+    return {"counters": counters, "histograms": histograms}
+
+
+def merge(state: Dict[str, list]) -> None:
+    """Adds metrics drained from another process to this process's metrics."""
+
+    with _lock:
+        for name, labels, value in state.get("counters", ()):
+            _counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, series in state.get("histograms", ()):
+            key = (name, tuple(map(tuple, labels)))
+            current = _histograms.get(key)
+            if current is None:
+                _histograms[key] = list(series)
+            else:
+                for index, value in enumerate(series):
+                    current[index] += value
+
+
+def _format_labels(labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def snapshot() -> Dict[str, float]:
+    """Returns all counters as a ``{"name{label=value}": value}`` mapping."""
+
+    with _lock:
+        items = list(_counters.items())
+    result = {}
+    for (name, labels), value in sorted(items):
+        label_str = ",".join(f'{key}="{label}"' for key, label in labels)
+        result[f"{name}{{{label_str}}}" if labels else name] = value
+    return result
+
+
+def render_prometheus() -> str:
+    """Renders all metrics in the Prometheus text exposition format."""
+
+    with _lock:
+        counters = sorted(_counters.items())
+        gauges = sorted(_gauges.items())
+        histograms = sorted((key, list(series)) for key, series in _histograms.items())
+
+    lines = []
+    typed = set()
+    for kind, items in (("counter", counters), ("gauge", gauges)):
+        for (name, labels), value in items:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name}{_format_labels(labels)} {_number(value)}")
+
+    for (name, labels), series in histograms:
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0.0
+        for bound, count in zip((*DEFAULT_BUCKETS, "+Inf"), series[:-2]):
+            cumulative += count
+            le = (("le", bound if bound == "+Inf" else f"{bound:g}"),)
+            lines.append(
+                f"{name}_bucket{_format_labels(labels, le)} {_number(cumulative)}"
+            )
+        lines.append(f"{name}_sum{_format_labels(labels)} {_number(series[-2])}")
+        lines.append(f"{name}_count{_format_labels(labels)} {_number(series[-1])}")
+    return "\n".join(lines) + "\n"
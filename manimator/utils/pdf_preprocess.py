@@ -0,0 +1,236 @@
+import base64
+import io
+import os
+import re
+import tempfile
+from typing import List, Optional, Union
+
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import NameObject, NumberObject
+
+from manimator.utils.helpers import compress_pdf
+
+
+PDF_MODES = ("full", "pages", "text")
+DEFAULT_PDF_MODE = "full"
+DEFAULT_PDF_MAX_PAGES = 8
+DEFAULT_PDF_IMAGE_MAX_DIMENSION = 1024
+DEFAULT_PDF_IMAGE_QUALITY = 60
+
+METHOD_PATTERN = re.compile(
+    r"\b(method|approach|architecture|algorithm|framework|we propose|model)\b",
+    re.IGNORECASE,
+)
+FIGURE_PATTERN = re.compile(r"\b(fig\.|figure)\s*\d", re.IGNORECASE)
+REFERENCES_PATTERN = re.compile(
+    r"^\s*(\d+\.?\s*)?(references|bibliography)\s*$", re.IGNORECASE | re.MULTILINE
+)
+
+
+class EmptyPdfError(ValueError):
+    """Raised when a PDF has no pages to select from.
+
+    A plain ``ValueError`` rather than an ``HTTPException`` so that it can be
+    raised in a PDF worker process; callers turn it into a 400.
+    """
+
+
+def _xobjects(resources, seen=None):
+    """Yields the XObjects of a resource dictionary, including nested forms."""
+
+    seen = set() if seen is None else seen
+    try:
+        xobjects = resources.get_object().get("/XObject")
+    except AttributeError:
+        return
+    if not xobjects:
+        return
+    for xobject in xobjects.get_object().values():
+        xobject = xobject.get_object()
+        if id(xobject) in seen:
+            continue
+        seen.add(id(xobject))
+        yield xobject
+        if xobject.get("/Subtype") == "/Form" and "/Resources" in xobject:
+            yield from _xobjects(xobject["/Resources"], seen)
+
+
+def _page_xobjects(page) -> list:
+    return list(_xobjects(page["/Resources"])) if "/Resources" in page else []
+
+
+def select_pages(reader: PdfReader, texts: List[str], max_pages: int) -> List[int]:
+    """Picks the pages of a paper most useful for explaining it.
+
+    The first page (title and abstract) is always kept. Pages after the
+    references heading (bibliography, appendices) are dropped, and the rest are
+    ranked by method keywords, figure captions and embedded figures.
+
+    Args:
+        reader (PdfReader): The paper
+        texts (List[str]): Extracted text of every page
+        max_pages (int): Maximum number of pages to keep
+
+    Returns:
+        List[int]: Indices of the selected pages, in document order
+
+    Raises:
+        EmptyPdfError: If the PDF has no pages
+    """
+
+    if not texts:
+        raise EmptyPdfError("PDF has no pages")
+    last_page = len(texts) - 1
+    for index, text in enumerate(texts[1:], start=1):
+        if REFERENCES_PATTERN.search(text):
+            last_page = index
+            break
+
+    scores = []
+    for index in range(1, last_page + 1):
+        text = texts[index]
+        score = min(len(METHOD_PATTERN.findall(text)), 5)
+        score += 3 * bool(FIGURE_PATTERN.search(text))
+        score += 2 * bool(_page_xobjects(reader.pages[index]))
+        scores.append((-score, index))
+    selected = [0] + [index for _, index in sorted(scores)[: max_pages - 1]]
+    return sorted(selected)
+
+
+def downsample_images(page, max_dimension: int, quality: int) -> None:
+    """Re-encodes the large images of a page as smaller JPEGs, in place.
+
+    Images nested in form XObjects (figures) are included. Only 8 bit
+    RGB/grayscale images (JPEG or Flate encoded) are touched; masks, indexed
+    and exotic color spaces are left alone. An image is only replaced when the
+    re-encoded version is smaller.
+    """
+
+    from PIL import Image
+
+    for image in _page_xobjects(page):
+        if image.get("/Subtype") != "/Image" or image.get("/ImageMask"):
+            continue
+        color_space = image.get("/ColorSpace")
+        modes = {"/DeviceRGB": "RGB", "/DeviceGray": "L"}
+        if color_space not in modes or image.get("/BitsPerComponent") != 8:
+            continue
+        if "/Decode" in image:
+            continue
+        size = (int(image["/Width"]), int(image["/Height"]))
+        try:
+            if image.get("/Filter") == "/DCTDecode":
+                decoded = Image.open(io.BytesIO(image._data))
+            elif image.get("/Filter") == "/FlateDecode":
+                decoded = Image.frombytes(modes[color_space], size, image.get_data())
+            else:
+                continue
+            decoded.thumbnail((max_dimension, max_dimension))
+            output = io.BytesIO()
+            decoded.convert(modes[color_space]).save(
+                output, format="JPEG", quality=quality, optimize=True
+            )
+        except Exception:
+            continue
+        if output.tell() >= len(image._data):
+            continue
+
+        # PyPDF2 3.0 has no public API to replace an encoded stream
+        image._data = output.getvalue()
+        image.decoded_self = None
+        image[NameObject("/Filter")] = NameObject("/DCTDecode")
+        image[NameObject("/Width")] = NumberObject(decoded.width)
+        image[NameObject("/Height")] = NumberObject(decoded.height)
+        image.pop(NameObject("/DecodeParms"), None)
+
+
+def _base64_file(path: str) -> str:
+    """Base64-encodes a file in chunks instead of reading it whole first."""
+
+    parts = []
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(3 * 256 * 1024), b""):
+            parts.append(base64.b64encode(chunk).decode("ascii"))
+    return "".join(parts)
+
+
+def prepare_pdf_content(
+    source: Union[bytes, str],
+    mode: Optional[str] = None,
+    max_pages: Optional[int] = None,
+) -> List[dict]:
+    """Turns a PDF into the message content sent to the scene description model.
+
+    Modes:
+        ``full``: the whole PDF as a data URL, as before.
+        ``pages``: only the pages chosen by ``select_pages``, with embedded
+            images downsampled. The reduced PDF is written to a temporary file
+            and base64-encoded from there, so no extra in-memory copies of the
+            document are made.
+        ``text``: the extracted text of the selected pages, no PDF at all.
+
+    Args:
+        source (Union[bytes, str]): PDF content or path to the PDF
+        mode (Optional[str]): One of ``PDF_MODES``. Defaults to env PDF_MODE
+        max_pages (Optional[int]): Pages kept by ``pages`` and ``text``. Defaults
+            to env PDF_MAX_PAGES
+
+    Returns:
+        List[dict]: Content parts of the user message
+
+    Raises:
+        EmptyPdfError: If the PDF has no pages, in ``pages`` and ``text`` mode
+    """
+
+    mode = mode or os.getenv("PDF_MODE") or DEFAULT_PDF_MODE
+    if mode not in PDF_MODES:
+        raise ValueError(f"Unknown PDF mode {mode!r}, expected one of {PDF_MODES}")
+
+    if mode == "full":
+        if not isinstance(source, bytes):
+            with open(source, "rb") as f:
+                source = f.read()
+        return [
+            {
+                "type": "image_url",
+                "image_url": f"data:application/pdf;base64,{compress_pdf(source)}",
+            }
+        ]
+
+    max_pages = max_pages or int(os.getenv("PDF_MAX_PAGES") or DEFAULT_PDF_MAX_PAGES)
+    reader = PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+    texts = [page.extract_text() or "" for page in reader.pages]
+    pages = select_pages(reader, texts, max_pages)
+
+    if mode == "text":
+        text = "\n\n".join(f"[Page {index + 1}]\n{texts[index]}" for index in pages)
+        return [{"type": "text", "text": text}]
+
+    max_dimension = int(
+        os.getenv("PDF_IMAGE_MAX_DIMENSION") or DEFAULT_PDF_IMAGE_MAX_DIMENSION
+    )
+    quality = int(os.getenv("PDF_IMAGE_QUALITY") or DEFAULT_PDF_IMAGE_QUALITY)
+    writer = PdfWriter()
+    for index in pages:
+        page = writer.add_page(reader.pages[index])
+        downsample_images(page, max_dimension, quality)
+        page.compress_content_streams()
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as output:
+        writer.write(output)
+        output.flush()
+        encoded = _base64_file(output.name)
+    return [
+        {
+            "type": "image_url",
+            "image_url": f"data:application/pdf;base64,{encoded}",
+        }
+    ]
+
+
+def content_size(content: List[dict]) -> int:
+    """Returns the number of bytes of a prepared message content."""
+
+    return sum(
+        len(part.get("text") or part.get("image_url") or "") for part in content
+    )
@@ -0,0 +1,244 @@
+import asyncio
+import contextlib
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, List, Optional, Tuple, Union
+from fastapi import HTTPException, Request
+from python_multipart import MultipartParser
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import parse_options_header
+
+from manimator.utils import metrics
+from manimator.utils.pdf_preprocess import (
+    DEFAULT_PDF_MODE,
+    EmptyPdfError,
+    prepare_pdf_content,
+)
+
+
+DEFAULT_PDF_WORKERS = 2
+DEFAULT_MAX_CONCURRENT_PDFS = 4
+DEFAULT_MAX_PDF_UPLOAD_BYTES = 50 * 1024**2
+# Worker processes are recycled after this many PDFs so that memory held by
+# PyPDF2 and Pillow does not accumulate
+DEFAULT_PDF_TASKS_PER_WORKER = 20
+# Room for the multipart boundaries, headers and other fields of an upload
+UPLOAD_OVERHEAD_BYTES = 64 * 1024
+
+
+class PdfWorkers:
+    """Runs PDF preprocessing in worker processes, off the event loop.
+
+    Preprocessing a large paper is seconds of pure CPU, which would block every
+    other request if run on the event loop and would still contend for the GIL
+    in a thread. At most ``max_concurrent`` PDF requests are handled at a time
+    (further ones are rejected with a 429), and uploads are streamed to disk
+    as they arrive, never held in memory as a whole.
+
+    Args:
+        max_workers (Optional[int]): Number of worker processes. Defaults to env
+            PDF_WORKERS
+        max_concurrent (Optional[int]): Maximum number of PDF requests in
+            progress. Defaults to env MAX_CONCURRENT_PDFS
+        max_upload_bytes (Optional[int]): Size limit of uploaded PDFs. Defaults
+            to env MAX_PDF_UPLOAD_BYTES
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_concurrent: Optional[int] = None,
+        max_upload_bytes: Optional[int] = None,
+    ):
+        self.max_workers = max_workers or int(
+            os.getenv("PDF_WORKERS") or DEFAULT_PDF_WORKERS
+        )
+        self.max_concurrent = max_concurrent or int(
+            os.getenv("MAX_CONCURRENT_PDFS") or DEFAULT_MAX_CONCURRENT_PDFS
+        )
+        self.max_upload_bytes = max_upload_bytes or int(
+            os.getenv("MAX_PDF_UPLOAD_BYTES") or DEFAULT_MAX_PDF_UPLOAD_BYTES
+        )
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._active = 0
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                max_tasks_per_child=DEFAULT_PDF_TASKS_PER_WORKER,
+            )
+        return self._executor
+
+    @property
+    def active(self) -> int:
+        """Number of PDF requests in progress."""
+
+        return self._active
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Holds one of the ``max_concurrent`` PDF request slots.
+
+        Raises:
+            HTTPException: 429 if all slots are taken
+        """
+
+        if self._active >= self.max_concurrent:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many PDFs are being processed, please retry later",
+                headers={"Retry-After": "10"},
+            )
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+
+    async def prepare(
+        self, source: Union[bytes, str], mode: Optional[str] = None
+    ) -> List[dict]:
+        """Runs ``prepare_pdf_content`` in a worker process.
+
+        Args:
+            source (Union[bytes, str]): PDF content or path to the PDF. Paths are
+                cheaper, the content is not copied to the worker
+            mode (Optional[str]): PDF mode, see ``prepare_pdf_content``
+
+        Returns:
+            List[dict]: Content parts of the user message
+
+        Raises:
+            HTTPException: 400 if the PDF has no pages
+        """
+
+        mode = mode or os.getenv("PDF_MODE") or DEFAULT_PDF_MODE
+        loop = asyncio.get_running_loop()
+        with metrics.span("pdf_preprocess", mode=mode):
+            try:
+                future = loop.run_in_executor(
+                    self.executor, prepare_pdf_content, source, mode
+                )
+            except BrokenProcessPool:
+                # A worker died (e.g. on a malformed PDF), start a fresh pool
+                self._executor = None
+                future = loop.run_in_executor(
+                    self.executor, prepare_pdf_content, source, mode
+                )
+            try:
+                return await future
+            except EmptyPdfError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+    async def spool_request(self, request: Request) -> Tuple[str, str]:
+        """Streams the ``file`` part of a multipart PDF upload to a temporary file.
+
+        The request body is parsed as it is received instead of being parsed
+        into a form first, so an upload is written to disk once and rejected as
+        soon as it exceeds ``max_upload_bytes``, also when it is sent without a
+        ``Content-Length``. The caller owns the returned file and must remove it.
+
+        Args:
+            request (Request): Request with a ``multipart/form-data`` body
+
+        Returns:
+            Tuple[str, str]: Path of the temporary file and sha256 of its content
+
+        Raises:
+            HTTPException: 413 if the upload exceeds ``max_upload_bytes``, 400 if
+                it is not a multipart upload with a non empty ``file`` field
+        """
+
+        content_type, params = parse_options_header(
+            request.headers.get("content-type", "")
+        )
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise HTTPException(
+                status_code=400, detail="Expected a multipart/form-data PDF upload"
+            )
+
+        digest = hashlib.sha256()
+        size = 0
+        part = {"field": b"", "value": b"", "headers": {}, "is_file": False}
+        found = False
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        f = os.fdopen(fd, "wb")
+
+        def on_part_begin():
+            part.update(field=b"", value=b"", headers={}, is_file=False)
+
+        def on_header_field(data, start, end):
+            part["field"] += data[start:end]
+
+        def on_header_value(data, start, end):
+            part["value"] += data[start:end]
+
+        def on_header_end():
+            part["headers"][part["field"].lower()] = part["value"]
+            part.update(field=b"", value=b"")
+
+        def on_headers_finished():
+            nonlocal found
+            _, options = parse_options_header(
+                part["headers"].get(b"content-disposition", b"")
+            )
+            part["is_file"] = options.get(b"name") == b"file" and not found
+            found = found or part["is_file"]
+
+        def on_part_data(data, start, end):
+            nonlocal size
+            if not part["is_file"]:
+                return
+            size += end - start
+            if size > self.max_upload_bytes:
+                raise self._too_large()
+            digest.update(data[start:end])
+            f.write(data[start:end])
+
+        parser = MultipartParser(
+            params[b"boundary"],
+            {
+                "on_part_begin": on_part_begin,
+                "on_header_field": on_header_field,
+                "on_header_value": on_header_value,
+                "on_header_end": on_header_end,
+                "on_headers_finished": on_headers_finished,
+                "on_part_data": on_part_data,
+            },
+        )
+        received = 0
+        try:
+            with f:
+                async for chunk in request.stream():
+                    received += len(chunk)
+                    if received > self.max_upload_bytes + UPLOAD_OVERHEAD_BYTES:
+                        raise self._too_large()
+                    parser.write(chunk)
+                parser.finalize()
+            if not size:
+                raise HTTPException(status_code=400, detail="Empty PDF file provided")
+        except MultipartParseError as e:
+            os.remove(path)
+            raise HTTPException(status_code=400, detail=f"Malformed upload: {e}")
+        except BaseException:
+            os.remove(path)
+            raise
+        return path, digest.hexdigest()
+
+    def _too_large(self) -> HTTPException:
+        return HTTPException(
+            status_code=413,
+            detail=f"PDF exceeds the {self.max_upload_bytes // 1024**2} MiB limit",
+        )
+
+    def shutdown(self) -> None:
+        """Stops the worker pool, cancelling PDFs that have not started."""
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
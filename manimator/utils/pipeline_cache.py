@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from manimator.utils import metrics
+
+
+DEFAULT_PIPELINE_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "manimator", "pipeline"
+)
+DEFAULT_PIPELINE_CACHE_MAX_ENTRIES = 1000
+
+PIPELINE_STAGES = ("scene_description", "image_json", "code", "video")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalizes a user prompt so that trivially different prompts share a cache entry.
+
+    Args:
+        prompt (str): Raw user prompt
+
+    Returns:
+        str: Case-folded prompt with collapsed whitespace
+    """
+
+    return re.sub(r"\s+", " ", prompt).strip().casefold()
+
+
+class PipelineCache:
+    """Persistent per-stage cache of the prompt to video pipeline.
+
+    Every entry is a small JSON file holding the output of each completed stage
+    (see ``PIPELINE_STAGES``). The ``video`` stage stores the render cache key
+    of the final video rather than the video itself, so the bytes live only in
+    the ``RenderCache``. A pipeline can therefore resume from the first stage
+    that is missing from its entry.
+    """
+
+    def __init__(
+        self, cache_dir: Optional[str] = None, max_entries: Optional[int] = None
+    ):
+        self.cache_dir = (
+            cache_dir or os.getenv("PIPELINE_CACHE_DIR") or DEFAULT_PIPELINE_CACHE_DIR
+        )
+        if max_entries is None:
+            max_entries = int(
+                os.getenv("PIPELINE_CACHE_MAX_ENTRIES")
+                or DEFAULT_PIPELINE_CACHE_MAX_ENTRIES
+            )
+        self.max_entries = max_entries
+        # Stages of one entry may be saved concurrently by independent stages
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, prompt: str, models: List[Optional[str]]) -> str:
+        """Builds the cache key for a prompt and the models used to process it.
+
+        Args:
+            prompt (str): User prompt
+            models (List[Optional[str]]): Names of the models used by the pipeline
+
+        Returns:
+            str: Hex digest identifying the pipeline run
+        """
+
+        digest = hashlib.sha256()
+        for part in (normalize_prompt(prompt), *(model or "" for model in models)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def load(self, key: str) -> Dict[str, Any]:
+        """Loads all cached stages of a pipeline run.
+
+        Args:
+            key (str): Cache key from ``make_key``
+
+        Returns:
+            Dict[str, Any]: Mapping of stage name to its cached output
+        """
+
+        path = self._entry_path(key)
+        try:
+            with open(path) as f:
+                stages = json.load(f)
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        return stages
+
+    def _write(self, key: str, stages: Dict[str, Any]) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(stages, f)
+            os.replace(tmp_path, self._entry_path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def save_stage(self, key: str, stage: str, value: Any) -> None:
+        """Stores the output of a single stage.
+
+        Args:
+            key (str): Cache key from ``make_key``
+            stage (str): One of ``PIPELINE_STAGES``
+            value (Any): JSON serializable stage output
+        """
+
+        if stage not in PIPELINE_STAGES:
+            raise ValueError(f"Unknown pipeline stage: {stage}")
+        with self._lock:
+            stages = self.load(key)
+            stages[stage] = value
+            self._write(key, stages)
+        self.evict(keep=key)
+
+    def drop_stage(self, key: str, stage: str) -> None:
+        """Invalidates a stage and every stage that follows it.
+
+        Args:
+            key (str): Cache key from ``make_key``
+            stage (str): First stage to invalidate
+        """
+
+        later = PIPELINE_STAGES[PIPELINE_STAGES.index(stage) :]
+        with self._lock:
+            stages = self.load(key)
+            remaining = {
+                name: value for name, value in stages.items() if name not in later
+            }
+            if remaining != stages:
+                self._write(key, remaining)
+
+    def stage(self, key: str, stage: str, compute: Callable[[], Any]) -> Any:
+        """Returns a cached stage output, computing and storing it on a miss.
+
+        Args:
+            key (str): Cache key from ``make_key``
+            stage (str): One of ``PIPELINE_STAGES``
+            compute (Callable[[], Any]): Produces the stage output on a miss
+
+        Returns:
+            Any: Cached or freshly computed stage output. ``None`` results are
+                returned but not cached
+        """
+
+        stages = self.load(key)
+        metrics.increment(
+            "cache_requests_total",
+            cache=f"pipeline_{stage}",
+            result="hit" if stage in stages else "miss",
+        )
+        if stage in stages:
+            return stages[stage]
+        value = compute()
+        if value is not None:
+            self.save_stage(key, stage, value)
+        return value
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Removes least recently used entries beyond ``max_entries``.
+
+        Args:
+            keep (Optional[str]): Key of an entry that must not be evicted
+        """
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                entries.append((os.stat(path).st_mtime, path))
+            except FileNotFoundError:
+                continue
+
+        keep_path = self._entry_path(keep) if keep else None
+        excess = len(entries) - self.max_entries
+        for _, path in sorted(entries):
+            if excess <= 0:
+                break
+            if path == keep_path:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            excess -= 1
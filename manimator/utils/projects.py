@@ -0,0 +1,214 @@
+import fcntl
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+from fastapi import HTTPException
+
+from manimator.utils.pipeline_cache import normalize_prompt
+
+
+DEFAULT_PROJECT_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "manimator", "projects"
+)
+DEFAULT_PROJECT_TTL = 7 * 24 * 3600
+DEFAULT_PROJECT_MAX_BYTES = 2 * 1024**3
+GC_INTERVAL = 60
+
+
+def make_project_id(prompt: str) -> str:
+    """Derives a stable project id from a prompt.
+
+    Args:
+        prompt (str): User prompt
+
+    Returns:
+        str: Project id shared by all renders of the normalized prompt
+    """
+
+    return hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()[:32]
+
+
+def check_project_id(project_id: str) -> str:
+    """Validates a client supplied project id.
+
+    Args:
+        project_id (str): Project identifier
+
+    Returns:
+        str: The unchanged project id
+
+    Raises:
+        HTTPException: 400 if the id is not 1-64 letters, digits, ``-`` or ``_``
+    """
+
+    if not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", project_id):
+        raise HTTPException(status_code=400, detail="Invalid project id")
+    return project_id
+
+
+class ProjectStore:
+    """Persistent manim media directories, one per project.
+
+    Rendering every attempt of a project into the same ``--media_dir`` keeps
+    manim's ``partial_movie_files`` cache warm, so a re-render only pays for
+    the ``play()`` calls whose animations actually changed. Renders of the same
+    project are serialized with a file lock because manim writes fixed file
+    names inside the media directory. Projects untouched for ``ttl`` seconds
+    are deleted, and least recently rendered projects are deleted once all of
+    them together exceed ``max_bytes``. Projects being rendered are never
+    deleted.
+
+    Args:
+        project_dir (Optional[str]): Directory holding the projects. Defaults to
+            env PROJECT_MEDIA_DIR
+        ttl (Optional[int]): Seconds to keep unused projects. Defaults to env
+            PROJECT_TTL
+        max_bytes (Optional[int]): Size limit of all projects. Defaults to env
+            PROJECT_MAX_BYTES
+    """
+
+    _last_gc = 0.0
+    _gc_lock = threading.Lock()
+
+    def __init__(
+        self,
+        project_dir: Optional[str] = None,
+        ttl: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.project_dir = (
+            project_dir or os.getenv("PROJECT_MEDIA_DIR") or DEFAULT_PROJECT_DIR
+        )
+        self.ttl = ttl or int(os.getenv("PROJECT_TTL") or DEFAULT_PROJECT_TTL)
+        if max_bytes is None:
+            max_bytes = int(os.getenv("PROJECT_MAX_BYTES") or DEFAULT_PROJECT_MAX_BYTES)
+        self.max_bytes = max_bytes
+        os.makedirs(self.project_dir, exist_ok=True)
+
+    def media_dir(self, project_id: str) -> str:
+        """Returns the media directory of a project, creating it if needed.
+
+        Args:
+            project_id (str): Project identifier (letters, digits, ``-`` and ``_``)
+
+        Returns:
+            str: Path to the project's media directory
+
+        Raises:
+            HTTPException: 400 if the project id is invalid
+        """
+
+        path = os.path.join(self.project_dir, check_project_id(project_id))
+        os.makedirs(path, exist_ok=True)
+        os.utime(path)
+        return path
+
+    @contextmanager
+    def lock(self, project_id: str):
+        """Holds an exclusive lock on a project for the duration of a render.
+
+        The garbage collector may delete the project between opening its lock
+        file and acquiring the lock, so the lock only counts if its file is
+        still the project's; otherwise the project is created again.
+
+        Args:
+            project_id (str): Project identifier
+        """
+
+        while True:
+            lock_path = os.path.join(self.media_dir(project_id), ".lock")
+            try:
+                lock_file = open(lock_path, "a")
+            except FileNotFoundError:
+                continue
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if os.path.samestat(os.fstat(lock_file.fileno()), os.stat(lock_path)):
+                    break
+            except FileNotFoundError:
+                pass
+            lock_file.close()
+
+        with lock_file:
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def maybe_collect_garbage(self) -> None:
+        """Runs ``collect_garbage`` at most once every ``GC_INTERVAL`` seconds per process."""
+
+        with ProjectStore._gc_lock:
+            if time.time() - ProjectStore._last_gc < GC_INTERVAL:
+                return
+            ProjectStore._last_gc = time.time()
+        self.collect_garbage()
+
+    def collect_garbage(self) -> None:
+        """Deletes projects unused for ``ttl`` seconds, then LRU ones past ``max_bytes``."""
+
+        cutoff = time.time() - self.ttl
+        projects = []
+        total = 0
+        for name in os.listdir(self.project_dir):
+            path = os.path.join(self.project_dir, name)
+            if name.startswith(".deleted-"):
+                # Left behind by a process that stopped while deleting it
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                continue
+            if not os.path.isdir(path):
+                continue
+            if mtime < cutoff:
+                self._remove(path)
+                continue
+            size = _dir_size(path)
+            projects.append((mtime, size, path))
+            total += size
+
+        for _, size, path in sorted(projects):
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                total -= size
+
+    def _remove(self, path: str) -> bool:
+        """Deletes a project unless it is being rendered, returns whether it was."""
+
+        try:
+            lock_file = open(os.path.join(path, ".lock"), "a")
+        except FileNotFoundError:
+            return False
+        with lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            # Renamed first so that no render starts in a half deleted project
+            tombstone = os.path.join(self.project_dir, f".deleted-{uuid.uuid4().hex}")
+            try:
+                os.rename(path, tombstone)
+            except FileNotFoundError:
+                return False
+        shutil.rmtree(tombstone, ignore_errors=True)
+        return True
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
@@ -0,0 +1,112 @@
+import os
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import litellm
+
+from manimator.utils import metrics
+
+
+DEFAULT_PROMPT_CACHING = "auto"
+PROMPT_CACHING_MODES = ("auto", "on", "off")
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# Providers that only cache prompts up to explicit ``cache_control`` markers.
+# OpenAI and DeepSeek cache identical prefixes automatically, and Gemini's
+# marker-based context caching needs 32k+ token prefixes, so those are only
+# marked when PROMPT_CACHING=on.
+EXPLICIT_CACHE_PROVIDERS = ("anthropic", "bedrock", "vertex_ai")
+
+_marked_prefixes: Dict[int, Tuple[Sequence[dict], Tuple[dict, ...]]] = {}
+
+
+def uses_cache_markers(model: Optional[str]) -> bool:
+    """Returns whether message prefixes sent to ``model`` get cache markers.
+
+    Controlled by env PROMPT_CACHING: ``auto`` (default) marks prefixes for
+    Claude models on providers that require explicit markers, ``on`` marks
+    them for every model, ``off`` never does.
+    """
+
+    mode = os.getenv("PROMPT_CACHING") or DEFAULT_PROMPT_CACHING
+    if mode not in PROMPT_CACHING_MODES:
+        raise ValueError(
+            f"Unknown PROMPT_CACHING {mode!r}, expected one of {PROMPT_CACHING_MODES}"
+        )
+    if mode != "auto" or not model:
+        return mode == "on" and bool(model)
+    try:
+        _, provider, _, _ = litellm.get_llm_provider(model)
+    except Exception:
+        return False
+    return provider in EXPLICIT_CACHE_PROVIDERS and "claude" in model.lower()
+
+
+def _mark(message: dict) -> dict:
+    content = message["content"]
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    *head, last = content
+    return {**message, "content": [*head, {**last, "cache_control": CACHE_CONTROL}]}
+
+
+def cacheable_prefix(prefix: Sequence[dict]) -> Tuple[dict, ...]:
+    """Returns ``prefix`` with a cache breakpoint after its last message.
+
+    The marked copy is built once per prefix and reused, like the prefix
+    itself. A single breakpoint caches everything up to it: the system prompt
+    and all few-shot examples.
+
+    Args:
+        prefix (Sequence[dict]): A long-lived static message prefix
+
+    Returns:
+        Tuple[dict, ...]: The prefix with ``cache_control`` on its last message
+    """
+
+    entry = _marked_prefixes.get(id(prefix))
+    if entry is None or entry[0] is not prefix:
+        marked = (*prefix[:-1], _mark(prefix[-1])) if prefix else ()
+        # Keeping a reference to the prefix keeps its id from being reused
+        entry = _marked_prefixes[id(prefix)] = (prefix, marked)
+    return entry[1]
+
+
+def record_usage(usage: Any, operation: str, model: Optional[str]) -> None:
+    """Counts the prompt tokens of a completion served from and written to cache.
+
+    Providers report cache reads differently: Anthropic as
+    ``cache_read_input_tokens``, OpenAI and DeepSeek as
+    ``prompt_tokens_details.cached_tokens``; both are handled. Counters are
+    labelled by operation and model:
+
+    - ``llm_requests_total``
+    - ``llm_prompt_tokens_total``: all input tokens
+    - ``llm_cache_read_tokens_total``: input tokens read from the cache
+    - ``llm_cache_write_tokens_total``: input tokens written to the cache
+    - ``llm_completion_tokens_total``
+
+    Args:
+        usage (Any): ``usage`` of a litellm response, may be None
+        operation (str): Pipeline step, e.g. ``scene_description``
+        model (Optional[str]): Model that served the call
+    """
+
+    labels = {"operation": operation, "model": model or ""}
+    metrics.increment("llm_requests_total", **labels)
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cache_read = getattr(usage, "cache_read_input_tokens", None) or getattr(
+        details, "cached_tokens", None
+    )
+    cache_write = getattr(usage, "cache_creation_input_tokens", None)
+    metrics.increment(
+        "llm_prompt_tokens_total", getattr(usage, "prompt_tokens", 0) or 0, **labels
+    )
+    metrics.increment("llm_cache_read_tokens_total", cache_read or 0, **labels)
+    metrics.increment("llm_cache_write_tokens_total", cache_write or 0, **labels)
+    metrics.increment(
+        "llm_completion_tokens_total",
+        getattr(usage, "completion_tokens", 0) or 0,
+        **labels,
+    )
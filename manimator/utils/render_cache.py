@@ -0,0 +1,179 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from importlib import metadata
+from typing import Dict, List, Optional
+
+
+DEFAULT_RENDER_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "manimator", "renders"
+)
+DEFAULT_RENDER_CACHE_MAX_BYTES = 2 * 1024**3
+# Extensions of cached outputs: the video and the formats derived from it
+CACHED_FORMATS = ("mp4", "webm", "gif", "png")
+
+
+def get_manim_version() -> str:
+    """Returns the installed manim version, or "unknown" if it is not installed."""
+
+    try:
+        return metadata.version("manim")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def normalize_code(code: str) -> str:
+    """Normalizes scene code so that cosmetic differences do not change its hash.
+
+    Line endings are unified, trailing whitespace is stripped from every line
+    and leading/trailing blank lines are dropped.
+
+    Args:
+        code (str): Scene source code
+
+    Returns:
+        str: Normalized source code
+    """
+
+    lines = [line.rstrip() for line in code.replace("\r\n", "\n").split("\n")]
+    return "\n".join(lines).strip("\n")
+
+
+class RenderCache:
+    """Persistent, content-addressed cache of rendered Manim videos.
+
+    Videos are stored as ``<key>.mp4`` files where the key is a hash of the
+    normalized scene code, scene class name, quality and encoder flags, manim
+    version and the content of the images the scene loads. Other formats
+    derived from a video (WebM, GIF, PNG) are stored next to it as
+    ``<key>.<format>``.
+    The modification time of an entry is bumped on every hit, and the least
+    recently used entries are evicted once the cache grows past ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = (
+            cache_dir or os.getenv("RENDER_CACHE_DIR") or DEFAULT_RENDER_CACHE_DIR
+        )
+        if max_bytes is None:
+            max_bytes = int(
+                os.getenv("RENDER_CACHE_MAX_BYTES") or DEFAULT_RENDER_CACHE_MAX_BYTES
+            )
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(
+        self,
+        code: str,
+        scene_name: str,
+        quality_flags: List[str],
+        assets: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """Builds the cache key for a render.
+
+        Args:
+            code (str): Scene source code
+            scene_name (str): Name of the scene class to render
+            quality_flags (List[str]): Manim CLI flags affecting the output
+            assets (Optional[Dict[str, str]]): Content hashes of the files the
+                scene loads, by file name
+
+        Returns:
+            str: Hex digest identifying the render
+        """
+
+        digest = hashlib.sha256()
+        for part in (
+            normalize_code(code),
+            scene_name,
+            " ".join(quality_flags),
+            get_manim_version(),
+            *(f"{name}={content}" for name, content in sorted((assets or {}).items())),
+        ):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str, fmt: str = "mp4") -> str:
+        return os.path.join(self.cache_dir, f"{key}.{fmt}")
+
+    def get(self, key: str, fmt: str = "mp4") -> Optional[str]:
+        """Looks up a cached video and marks it as recently used.
+
+        Args:
+            key (str): Cache key from ``make_key``
+            fmt (str): Format of the output, one of ``CACHED_FORMATS``
+
+        Returns:
+            Optional[str]: Path to the cached video if present, None otherwise
+        """
+
+        path = self._entry_path(key, fmt)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, video_path: str, fmt: str = "mp4") -> str:
+        """Moves a rendered video into the cache and evicts old entries.
+
+        The video is moved rather than copied when it is on the same filesystem
+        as the cache, so callers must not rely on ``video_path`` afterwards.
+
+        Args:
+            key (str): Cache key from ``make_key``
+            video_path (str): Path to the freshly rendered video
+            fmt (str): Format of the output, one of ``CACHED_FORMATS``
+
+        Returns:
+            str: Path to the cached video
+        """
+
+        entry_path = self._entry_path(key, fmt)
+        try:
+            os.replace(video_path, entry_path)
+        except OSError:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as dst, open(video_path, "rb") as src:
+                    shutil.copyfileobj(src, dst)
+                os.replace(tmp_path, entry_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        self.evict(keep=key)
+        return entry_path
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Removes least recently used entries until the cache fits in ``max_bytes``.
+
+        Args:
+            keep (Optional[str]): Key of an entry that must not be evicted
+        """
+
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if name.rpartition(".")[2] not in CACHED_FORMATS:
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if keep and os.path.basename(path).startswith(f"{keep}."):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
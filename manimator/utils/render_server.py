@@ -0,0 +1,359 @@
+import atexit
+import functools
+import io
+import os
+import queue
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from multiprocessing.connection import Connection
+from typing import Callable, Dict, Optional
+
+from manimator.utils import metrics
+
+
+DEFAULT_RENDER_SERVER_WORKERS = 2
+DEFAULT_MAX_JOBS_PER_WORKER = 50
+DEFAULT_RENDER_TIMEOUT = 600
+
+# Progress bar line of manim, e.g. "Animation 3: Write(Text('Hi')):  45%|####   |"
+PROGRESS_PATTERN = re.compile(r"Animation (\d+)\b.*?(\d{1,3})%\|")
+# The same line with its frame count, e.g. "...  45%|####   | 7/15 [00:01<00:01]"
+FRAMES_PATTERN = re.compile(r"Animation (\d+)\b.*?\d{1,3}%\|[^|]*\|\s*\d+/(\d+)")
+
+ProgressFn = Callable[[str], None]
+
+
+def parse_render_progress(output: str) -> Optional[str]:
+    """Extracts the latest progress from manim's progress bar output.
+
+    Args:
+        output (str): Chunk of manim's stderr
+
+    Returns:
+        Optional[str]: Progress like ``Animation 3: 45%``, None if the chunk
+            holds no progress bar update
+    """
+
+    matches = PROGRESS_PATTERN.findall(output)
+    if not matches:
+        return None
+    animation, percent = matches[-1]
+    return f"Animation {animation}: {percent}%"
+
+
+class FrameCounter:
+    """Counts the frames rendered by manim from its progress bar output.
+
+    Animations served from manim's partial movie cache show no progress bar,
+    so only frames that were actually rendered are counted.
+    """
+
+    def __init__(self):
+        self._totals: Dict[str, int] = {}
+
+    def feed(self, output: str) -> None:
+        for animation, total in FRAMES_PATTERN.findall(output):
+            self._totals[animation] = int(total)
+
+    @property
+    def frames(self) -> int:
+        return sum(self._totals.values())
+
+
+class _ProgressStream(io.TextIOBase):
+    """Stand-in for ``sys.stderr`` forwarding manim's progress bars to the pool."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def write(self, text: str) -> int:
+        if PROGRESS_PATTERN.search(text):
+            self.conn.send(("progress", text))
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def _render_job(
+    scene_file: str, scene_name: str, media_dir: str, quality: str, conn=None
+) -> Optional[str]:
+    """Renders one scene inside a warm worker.
+
+    The scene module is executed in a fresh namespace and manim's global config
+    is only modified through ``tempconfig``, so nothing leaks into the next job.
+    Progress bar updates are sent over ``conn`` while the scene renders.
+    """
+
+    from manim import tempconfig
+
+    with open(scene_file) as f:
+        source = f.read()
+
+    cwd = os.getcwd()
+    stderr = sys.stderr
+    try:
+        if conn is not None:
+            sys.stderr = _ProgressStream(conn)
+        os.chdir(os.path.dirname(os.path.abspath(scene_file)))
+        with tempconfig(
+            {
+                "media_dir": media_dir,
+                "quality": quality,
+                "preview": False,
+                "input_file": scene_file,
+                "scene_names": [scene_name],
+            }
+        ):
+            namespace = {"__name__": "__manimator_scene__", "__file__": scene_file}
+            exec(compile(source, scene_file, "exec"), namespace)
+            scene = namespace[scene_name]()
+            scene.render()
+            movie_file_path = scene.renderer.file_writer.movie_file_path
+            return str(movie_file_path) if movie_file_path else None
+    finally:
+        sys.stderr = stderr
+        os.chdir(cwd)
+
+
+def _worker_main(conn) -> None:
+    """Entry point of a render worker: imports manim once, then serves jobs."""
+
+    try:
+        import manim  # noqa: F401
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+        return
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        try:
+            conn.send(("ok", _render_job(**job, conn=conn)))
+        except BaseException:
+            conn.send(("error", traceback.format_exc()))
+
+
+class _Worker:
+    """Handle of one worker process, started with ``python -m`` and a socket pair.
+
+    Running the module directly (rather than through ``multiprocessing``) keeps
+    the worker from inheriting the server's threads or re-importing its main
+    module.
+    """
+
+    def __init__(self):
+        parent_sock, child_sock = socket.socketpair()
+        package_root = os.path.dirname(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            path for path in (package_root, env.get("PYTHONPATH")) if path
+        )
+        self.process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "manimator.utils.render_server",
+                str(child_sock.fileno()),
+            ],
+            pass_fds=[child_sock.fileno()],
+            env=env,
+        )
+        child_sock.close()
+        self.conn = Connection(parent_sock.detach())
+        self.jobs = 0
+        self.ready = False
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.conn.close()
+
+
+class RenderWorkerPool:
+    """Pool of long-lived worker processes with manim already imported.
+
+    Starting the ``manim`` CLI costs several seconds per render for the Python
+    interpreter, ``import manim`` (numpy, cairo, pango, scipy) and config
+    initialization. Workers of this pool pay that once and then receive
+    ``(scene_file, scene_name, media_dir, quality)`` jobs over a pipe. Each
+    worker is recycled after ``max_jobs_per_worker`` jobs to bound memory
+    leaks, and replaced if it crashes or exceeds the render timeout.
+
+    Failures are raised as ``subprocess.CalledProcessError`` with the worker's
+    traceback as ``stderr``, matching what the CLI backend raises.
+
+    Args:
+        size (Optional[int]): Number of workers. Defaults to env RENDER_SERVER_WORKERS
+        max_jobs_per_worker (Optional[int]): Jobs before a worker is replaced.
+            Defaults to env MAX_JOBS_PER_WORKER
+        timeout (Optional[int]): Seconds a single render may take. Defaults to
+            env RENDER_TIMEOUT
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        max_jobs_per_worker: Optional[int] = None,
+        timeout: Optional[int] = None,
+    ):
+        self.size = size or int(
+            os.getenv("RENDER_SERVER_WORKERS") or DEFAULT_RENDER_SERVER_WORKERS
+        )
+        self.max_jobs_per_worker = max_jobs_per_worker or int(
+            os.getenv("MAX_JOBS_PER_WORKER") or DEFAULT_MAX_JOBS_PER_WORKER
+        )
+        self.timeout = timeout or int(
+            os.getenv("RENDER_TIMEOUT") or DEFAULT_RENDER_TIMEOUT
+        )
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers = set()
+        self._lock = threading.Lock()
+        for _ in range(self.size):
+            self._start_worker()
+
+    def _start_worker(self) -> None:
+        worker = _Worker()
+        with self._lock:
+            self._workers.add(worker)
+        self._idle.put(worker)
+
+    def _retire(self, worker: _Worker) -> None:
+        with self._lock:
+            self._workers.discard(worker)
+        worker.stop()
+        self._start_worker()
+
+    def _receive(self, worker: _Worker, cmd: list, deadline: float):
+        if not worker.conn.poll(max(0, deadline - time.monotonic())):
+            raise subprocess.CalledProcessError(
+                -1, cmd, stderr=f"Render timed out after {self.timeout}s"
+            )
+        try:
+            return worker.conn.recv()
+        except EOFError:
+            raise subprocess.CalledProcessError(
+                -1, cmd, stderr="Render worker exited unexpectedly"
+            )
+
+    def render(
+        self,
+        scene_file: str,
+        scene_name: str,
+        media_dir: str,
+        quality: str,
+        on_progress: Optional[ProgressFn] = None,
+    ) -> Optional[str]:
+        """Renders a scene in the next idle worker.
+
+        Args:
+            scene_file (str): Path to the Python file containing the scene
+            scene_name (str): Name of the scene class to render
+            media_dir (str): Directory for output media files
+            quality (str): Manim quality name, e.g. ``low_quality``
+            on_progress (Optional[ProgressFn]): Called with progress like
+                ``Animation 3: 45%`` while the scene renders
+
+        Returns:
+            Optional[str]: Path to the rendered video, None if the scene produced
+                no video
+
+        Raises:
+            subprocess.CalledProcessError: If the worker fails, crashes or times out
+        """
+
+        cmd = ["render-worker", scene_file, scene_name]
+        worker = self._idle.get()
+        healthy = False
+        deadline = time.monotonic() + self.timeout
+        try:
+            if not worker.ready:
+                status, payload = self._receive(worker, cmd, deadline)
+                if status != "ready":
+                    raise subprocess.CalledProcessError(1, cmd, stderr=payload)
+                worker.ready = True
+            worker.conn.send(
+                {
+                    "scene_file": scene_file,
+                    "scene_name": scene_name,
+                    "media_dir": media_dir,
+                    "quality": quality,
+                }
+            )
+            frames = FrameCounter()
+            status, payload = self._receive(worker, cmd, deadline)
+            while status == "progress":
+                frames.feed(payload)
+                progress = parse_render_progress(payload)
+                if on_progress and progress:
+                    on_progress(progress)
+                status, payload = self._receive(worker, cmd, deadline)
+            worker.jobs += 1
+            healthy = True
+            if status == "error":
+                raise subprocess.CalledProcessError(1, cmd, stderr=payload)
+            metrics.increment("render_frames_total", frames.frames)
+            return payload
+        finally:
+            if healthy and worker.jobs < self.max_jobs_per_worker:
+                self._idle.put(worker)
+            else:
+                self._retire(worker)
+
+    def shutdown(self) -> None:
+        """Stops all workers."""
+
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.stop()
+
+
+@functools.lru_cache(maxsize=None)
+def get_render_pool() -> RenderWorkerPool:
+    """Returns the process-wide render worker pool, starting it on first use."""
+
+    pool = RenderWorkerPool()
+    atexit.register(pool.shutdown)
+    return pool
+
+
+@functools.lru_cache(maxsize=None)
+def get_section_pool(size: int) -> RenderWorkerPool:
+    """Returns the process-wide worker pool for scene sections, starting it on first use.
+
+    Sections of one scene are rendered at once, so they get a pool of their
+    own sized by ``SECTION_WORKERS`` instead of queueing for the
+    ``RENDER_SERVER_WORKERS`` workers of whole scenes.
+
+    Args:
+        size (int): Number of workers
+    """
+
+    pool = RenderWorkerPool(size=size)
+    atexit.register(pool.shutdown)
+    return pool
+
+
+if __name__ == "__main__":
+    _worker_main(Connection(int(sys.argv[1])))
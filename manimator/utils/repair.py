@@ -0,0 +1,160 @@
+import logging
+import os
+import re
+from typing import Callable, Optional, Tuple
+from fastapi import HTTPException
+
+from manimator.api.animation_generation import repair_animation_response
+from manimator.utils import metrics
+from manimator.utils.schema import ManimProcessor, RenderError
+from manimator.utils.validation import CodeValidationError, validate_scene_code
+
+
+DEFAULT_REPAIR_BUDGET = 2
+# Only the end of manim's output is sent back, the traceback is at its end
+DEFAULT_REPAIR_ERROR_CHARS = 4000
+
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+PROGRESS_LINE = re.compile(r"^\s*(Animation \d+|Rendering|Merging)\b.*\|")
+
+logger = logging.getLogger(__name__)
+
+RenderFn = Callable[[str, str], Optional[str]]
+
+
+def trim_render_error(output: str, max_chars: Optional[int] = None) -> str:
+    """Reduces manim's output of a failed render to the part worth sending back.
+
+    Colour codes and progress bars are removed and, if there is a traceback,
+    only the last one is kept.
+
+    Args:
+        output (str): Output of the failed render
+        max_chars (Optional[int]): Size limit, the end of the output is kept.
+            Defaults to env REPAIR_ERROR_CHARS
+
+    Returns:
+        str: Trimmed error
+    """
+
+    max_chars = max_chars or int(
+        os.getenv("REPAIR_ERROR_CHARS") or DEFAULT_REPAIR_ERROR_CHARS
+    )
+    # Progress bars overwrite themselves with carriage returns
+    lines = ANSI_ESCAPE.sub("", output or "").replace("\r", "\n").splitlines()
+    lines = [line.rstrip() for line in lines if line.strip()]
+    lines = [line for line in lines if not PROGRESS_LINE.match(line)]
+    starts = [index for index, line in enumerate(lines) if "Traceback" in line]
+    if starts:
+        lines = lines[starts[-1] :]
+    error = "\n".join(lines)
+    return error[-max_chars:]
+
+
+def repair_code(
+    processor: ManimProcessor,
+    code: str,
+    error: str,
+    prompt: str = "",
+    on_token: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Asks the model to fix code that failed to render.
+
+    Args:
+        processor (ManimProcessor): Processor used to extract the code
+        code (str): Code that failed to render
+        error (str): Trimmed render or validation error
+        prompt (str): Description the code was generated from
+        on_token (Optional[Callable[[str], None]]): Receives the streamed
+            tokens of the fixed code
+
+    Returns:
+        str: Fixed code, not validated yet
+
+    Raises:
+        HTTPException: If the request fails (500) or no code is returned (400)
+    """
+
+    metrics.increment("repair_attempts_total")
+    fixed = processor.extract_code(
+        repair_animation_response(code, error, prompt, on_token=on_token)
+    )
+    if not fixed:
+        raise HTTPException(status_code=400, detail="No valid Manim code in repair")
+    return fixed
+
+
+def render_with_repair(
+    processor: ManimProcessor,
+    code: str,
+    scene_name: str,
+    temp_dir: str,
+    render: RenderFn,
+    prompt: str = "",
+    budget: Optional[int] = None,
+    on_repair: Optional[Callable[[int, int], None]] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+) -> Tuple[Optional[str], str]:
+    """Renders validated code, asking the model to fix it when manim fails.
+
+    Instead of generating the whole pipeline again, the code and the end of
+    the traceback are sent to ``CODE_GEN_MODEL`` and only the fixed code is
+    rendered again, at most ``budget`` times. Fixed code that fails validation
+    is sent back with the validation issues, within the same budget.
+    ``repairs_total`` counts the outcomes by ``result``: ``fixed`` or
+    ``failed``.
+
+    Args:
+        processor (ManimProcessor): Processor whose ``save_code`` writes the code
+        code (str): Validated Manim code
+        scene_name (str): Scene class of ``code``
+        temp_dir (str): Directory the scene file is written to
+        render (RenderFn): Renders a scene file and scene name, e.g. a
+            ``processor.render_scene`` call, and returns the video path
+        prompt (str): Description the code was generated from
+        budget (Optional[int]): Maximum number of repairs. Defaults to env
+            REPAIR_BUDGET, 0 disables repairs
+        on_repair (Optional[Callable[[int, int], None]]): Called with the
+            attempt number and the budget before every repair
+        on_token (Optional[Callable[[str], None]]): Receives the streamed
+            tokens of the fixed code
+
+    Returns:
+        Tuple[Optional[str], str]: Video path, see ``render_scene``, and the
+            code that rendered
+
+    Raises:
+        RenderError: If the code still fails to render once the budget is spent
+    """
+
+    if budget is None:
+        budget = int(os.getenv("REPAIR_BUDGET") or DEFAULT_REPAIR_BUDGET)
+
+    attempt = 0
+    while True:
+        try:
+            video_path = render(processor.save_code(code, temp_dir), scene_name)
+        except RenderError as e:
+            failure = e
+            error = trim_render_error(e.output)
+        else:
+            if attempt:
+                metrics.increment("repairs_total", result="fixed")
+            return video_path, code
+
+        while True:
+            if attempt >= budget:
+                if attempt:
+                    metrics.increment("repairs_total", result="failed")
+                raise failure
+            attempt += 1
+            if on_repair:
+                on_repair(attempt, budget)
+            try:
+                code = repair_code(processor, code, error, prompt, on_token)
+                scene_name = validate_scene_code(code)
+                break
+            except CodeValidationError as e:
+                error = e.detail
+            except HTTPException as e:
+                logger.warning("Repair attempt %d failed: %s", attempt, e.detail)
@@ -1,11 +1,89 @@
 import os
 import re
+import shutil
 import subprocess
 import tempfile
-from contextlib import contextmanager
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
 from fastapi import HTTPException
 
+from manimator.utils import metrics
+from manimator.utils.artifacts import ArtifactStore
+from manimator.utils.encoding import EncodeOptions, encode_video, export_video
+from manimator.utils.projects import ProjectStore
+from manimator.utils.render_cache import RenderCache
+from manimator.utils.render_server import (
+    FrameCounter,
+    ProgressFn,
+    RenderWorkerPool,
+    get_render_pool,
+    get_section_pool,
+    parse_render_progress,
+)
+from manimator.utils.sections import split_scene_sections
+from manimator.utils.tex_cache import TexCache, scene_tex_strings
+
+
+# Manim quality names by the letter of the CLI quality flag, e.g. -ql
+QUALITY_NAMES = {
+    "l": "low_quality",
+    "m": "medium_quality",
+    "h": "high_quality",
+    "p": "production_quality",
+    "k": "fourk_quality",
+}
+# Output directory manim writes videos to, by the letter of the quality flag
+VIDEO_DIRS = {
+    "l": "480p15",
+    "m": "720p30",
+    "h": "1080p60",
+    "p": "1440p60",
+    "k": "2160p60",
+}
+# Selectable render quality tiers and their CLI quality flag letters
+QUALITY_TIERS = {
+    "preview": "l",
+    "720p30": "m",
+    "1080p60": "h",
+}
+DEFAULT_RENDER_QUALITY = "preview"
+
+
+class RenderError(HTTPException):
+    """Raised when manim fails to render a scene.
+
+    Keeps manim's output, so the error can be fed back to the model to repair
+    the code.
+
+    Args:
+        output (str): Output of the failed render, usually ending in a traceback
+    """
+
+    def __init__(self, output: str):
+        self.output = output
+        super().__init__(status_code=500, detail=f"Render error: {output}")
+
+
+def resolve_quality(quality: Optional[str] = None) -> str:
+    """Returns the render quality tier to use.
+
+    Args:
+        quality (Optional[str]): One of ``QUALITY_TIERS``. Defaults to env
+            RENDER_QUALITY, or ``preview``
+
+    Raises:
+        ValueError: If the quality is not a known tier
+    """
+
+    quality = quality or os.getenv("RENDER_QUALITY") or DEFAULT_RENDER_QUALITY
+    if quality not in QUALITY_TIERS:
+        raise ValueError(
+            f"Unknown render quality {quality!r}, expected one of "
+            f"{tuple(QUALITY_TIERS)}"
+        )
+    return quality
+
 
 class ManimProcessor:
     """Handles Manim animation processing, including code extraction and video rendering.
@@ -14,8 +92,74 @@ class ManimProcessor:
     - Creating temporary directories for processing
     - Extracting Python code from model response
     - Saving and rendering Manim scenes
+    - Reusing previously rendered videos through a ``RenderCache``
+    - Rendering independent scene sections in parallel
+    - Handing out rendered videos through an ``ArtifactStore`` without copying
+    - Re-rendering projects incrementally in persistent media directories
+    - Sharing compiled LaTeX between renders through a ``TexCache``
+    - Rendering at selectable quality tiers (``QUALITY_TIERS``)
+    - Encoding with configurable settings and exporting WebM, GIF and PNG
+
+    Args:
+        render_cache (Optional[RenderCache]): Cache of rendered videos. A cache
+            in the default location is used when omitted
+        use_cache (bool): Whether to consult the render cache at all
+        parallel_sections (Optional[bool]): Whether to split scenes into sections
+            rendered concurrently. Defaults to env PARALLEL_SECTIONS
+        section_workers (Optional[int]): Maximum number of sections rendered at
+            once. Defaults to env SECTION_WORKERS or the number of CPUs
+        artifact_store (Optional[ArtifactStore]): Store for rendered videos. A
+            store in the default location is used when omitted
+        project_store (Optional[ProjectStore]): Persistent per-project media
+            directories. A store in the default location is used when omitted
+        render_backend (Optional[str]): ``warm`` to render in the pre-warmed
+            ``RenderWorkerPool`` or ``cli`` to start the manim CLI per render.
+            Defaults to env RENDER_BACKEND, or ``warm``
+        tex_cache (Optional[TexCache]): Shared cache of compiled LaTeX. A cache
+            in the default location is used when omitted
+        encode_options (Optional[EncodeOptions]): Encoder settings and output
+            formats. Defaults to the env settings, see ``EncodeOptions``
+
+    Attributes:
+        cache_hit (bool): Whether the last ``render_scene`` call was served
+            from the render cache
+        cache_key (Optional[str]): Render cache key of the last rendered scene
+        outputs (Dict[str, str]): Artifact paths of the last rendered scene by
+            format, the MP4 and every other format of ``encode_options``
     """
 
+    def __init__(
+        self,
+        render_cache: Optional[RenderCache] = None,
+        use_cache: bool = True,
+        parallel_sections: Optional[bool] = None,
+        section_workers: Optional[int] = None,
+        artifact_store: Optional[ArtifactStore] = None,
+        project_store: Optional[ProjectStore] = None,
+        render_backend: Optional[str] = None,
+        tex_cache: Optional[TexCache] = None,
+        encode_options: Optional[EncodeOptions] = None,
+    ):
+        self.tex_cache = tex_cache or TexCache()
+        self.encode_options = encode_options or EncodeOptions()
+        self.render_backend = render_backend or os.getenv("RENDER_BACKEND") or "warm"
+        self.artifact_store = artifact_store or ArtifactStore()
+        self.project_store = project_store or ProjectStore()
+        self.render_cache = (render_cache or RenderCache()) if use_cache else None
+        if parallel_sections is None:
+            parallel_sections = os.getenv("PARALLEL_SECTIONS", "").lower() in (
+                "1",
+                "true",
+                "yes",
+            )
+        self.parallel_sections = parallel_sections
+        self.section_workers = section_workers or int(
+            os.getenv("SECTION_WORKERS") or os.cpu_count() or 1
+        )
+        self.cache_hit = False
+        self.cache_key = None
+        self.outputs: Dict[str, str] = {}
+
     @contextmanager
     def create_temp_dir(self):
         """Creates and manages a temporary directory for processing Manim files.
@@ -71,7 +215,14 @@ class ManimProcessor:
         return scene_file
 
     def render_scene(
-        self, scene_file: str, scene_name: str, temp_dir: str
+        self,
+        scene_file: str,
+        scene_name: str,
+        temp_dir: str,
+        project_id: Optional[str] = None,
+        assets: Optional[Dict[str, str]] = None,
+        on_progress: Optional[ProgressFn] = None,
+        quality: Optional[str] = None,
     ) -> Optional[str]:
         """Renders a Manim scene to video.
 
@@ -79,36 +230,342 @@ class ManimProcessor:
             scene_file (str): Path to the Python file containing the scene
             scene_name (str): Name of the scene class to render
             temp_dir (str): Directory for output media files
+            project_id (Optional[str]): Project whose persistent media directory
+                is used instead of ``temp_dir``, so that manim only re-renders
+                the animations that changed since the project's last render
+            assets (Optional[Dict[str, str]]): Content hashes of the images next
+                to ``scene_file`` by file name, part of the render cache key
+            on_progress (Optional[ProgressFn]): Called with progress like
+                ``Animation 3: 45%`` parsed from manim's progress bars
+            quality (Optional[str]): One of ``QUALITY_TIERS``. Defaults to env
+                RENDER_QUALITY, or ``preview`` (480p15)
 
         Returns:
-            Optional[str]: Path to rendered video file if successful, None otherwise
+            Optional[str]: Path to the rendered video in the artifact store if
+                successful, None otherwise.
+                Identical scenes rendered before are returned from the render cache.
+                With ``parallel_sections`` the scene is split with
+                ``split_scene_sections`` when possible and its sections are
+                rendered concurrently
+                Other formats of ``encode_options`` are in ``outputs``
 
         Raises:
-            HTTPException: If rendering fails with status code 500
+            RenderError: If manim fails, an HTTPException with status code 500
+            HTTPException: If encoding the outputs fails with status code 500
+            ValueError: If the quality is not a known tier
+        """
+
+        quality = resolve_quality(quality)
+        quality_flags = [f"-q{QUALITY_TIERS[quality]}"]
+
+        with open(scene_file) as f:
+            code = f.read()
+        sections = (
+            split_scene_sections(code, scene_name) if self.parallel_sections else None
+        )
+        cache_flags = quality_flags + ["--sections"] if sections else quality_flags
+        cache_flags = cache_flags + self.encode_options.cache_flags()
+
+        self.cache_hit = False
+        self.cache_key = None
+        self.outputs = {}
+        if self.render_cache:
+            self.cache_key = self.render_cache.make_key(
+                code, scene_name, cache_flags, assets
+            )
+            video = self.cached_video(self.cache_key)
+            metrics.increment(
+                "cache_requests_total", cache="render", result="hit" if video else "miss"
+            )
+            if video:
+                self.cache_hit = True
+                self.outputs = {"mp4": video, **self._export(video, temp_dir)}
+                return video
+
+        self.project_store.maybe_collect_garbage()
+        media_dir = temp_dir
+        project_lock = nullcontext()
+        if project_id:
+            media_dir = self.project_store.media_dir(project_id)
+            project_lock = self.project_store.lock(project_id)
+
+        try:
+            with project_lock, metrics.span(
+                "render", backend=self.render_backend, quality=quality
+            ):
+                if sections:
+                    section_code, section_names = sections
+                    video_path = self._render_sections(
+                        section_code,
+                        section_names,
+                        scene_name,
+                        temp_dir,
+                        media_dir,
+                        quality_flags,
+                        on_progress,
+                    )
+                else:
+                    video_path = self._render_one(
+                        scene_file, scene_name, media_dir, quality_flags, on_progress
+                    )
+                if video_path and media_dir != temp_dir:
+                    # The next render of the project writes the same file name
+                    extension = os.path.splitext(video_path)[1]
+                    rendered_path = os.path.join(
+                        temp_dir, f"{scene_name}.rendered{extension}"
+                    )
+                    shutil.move(video_path, rendered_path)
+                    video_path = rendered_path
+        except subprocess.CalledProcessError as e:
+            raise RenderError(e.stderr or e.output or str(e))
+
+        if not video_path:
+            return None
+
+        try:
+            encoded_path = encode_video(
+                video_path,
+                self.encode_options,
+                os.path.join(temp_dir, f"{scene_name}.encoded.mp4"),
+            )
+        except subprocess.CalledProcessError as e:
+            raise HTTPException(status_code=500, detail=f"Encode error: {e.stderr}")
+        if encoded_path != video_path:
+            os.remove(video_path)
+
+        if self.cache_key:
+            cached_path = self.render_cache.put(self.cache_key, encoded_path)
+            video = self.artifact_store.add(cached_path)
+        else:
+            video = self.artifact_store.add(encoded_path, move=True)
+        self.outputs = {"mp4": video, **self._export(video, temp_dir)}
+        return video
+
+    def _export(self, video_path: str, temp_dir: str) -> Dict[str, str]:
+        """Derives the non-MP4 formats of ``encode_options`` from a final video.
+
+        Derived outputs are kept in the render cache next to their video, so
+        a GIF or PNG is only encoded once per rendered scene.
+
+        Returns:
+            Dict[str, str]: Artifact paths by format
+
+        Raises:
+            HTTPException: If ffmpeg fails with status code 500
+        """
+
+        outputs = {}
+        for fmt in self.encode_options.formats:
+            if fmt == "mp4":
+                continue
+            cached_path = (
+                self.render_cache.get(self.cache_key, fmt) if self.cache_key else None
+            )
+            if cached_path is None:
+                try:
+                    output_path = export_video(
+                        video_path,
+                        fmt,
+                        self.encode_options,
+                        os.path.join(temp_dir, f"output.{fmt}"),
+                    )
+                except subprocess.CalledProcessError as e:
+                    raise HTTPException(
+                        status_code=500, detail=f"Export error: {e.stderr}"
+                    )
+                if not self.cache_key:
+                    outputs[fmt] = self.artifact_store.add(output_path, move=True)
+                    continue
+                cached_path = self.render_cache.put(self.cache_key, output_path, fmt)
+            outputs[fmt] = self.artifact_store.add(cached_path)
+        return outputs
+
+    def _render_one(
+        self,
+        scene_file: str,
+        scene_name: str,
+        media_dir: str,
+        quality_flags: list,
+        on_progress: Optional[ProgressFn] = None,
+        pool: Optional[RenderWorkerPool] = None,
+    ) -> Optional[str]:
+        """Renders one scene with the configured backend and returns the video path, if any.
+
+        ``pool`` replaces the pool of ``get_render_pool`` for the warm backend.
+        """
+
+        tex_dir = os.path.join(media_dir, "Tex")
+        with open(scene_file) as f:
+            tex_strings = scene_tex_strings(f.read())
+        seeded, started_at = self.tex_cache.prepare(tex_dir, tex_strings)
+        try:
+            if self.render_backend == "warm":
+                video_path = (pool or get_render_pool()).render(
+                    scene_file,
+                    scene_name,
+                    media_dir,
+                    QUALITY_NAMES[quality_flags[-1][-1]],
+                    on_progress,
+                )
+                return video_path if video_path and os.path.exists(video_path) else None
+            return self._render_cli(
+                scene_file, scene_name, media_dir, quality_flags, on_progress
+            )
+        finally:
+            self.tex_cache.publish(tex_dir, seeded, started_at, tex_strings)
+
+    def _render_cli(
+        self,
+        scene_file: str,
+        scene_name: str,
+        media_dir: str,
+        quality_flags: list,
+        on_progress: Optional[ProgressFn] = None,
+    ) -> Optional[str]:
+        """Renders one scene with the manim CLI and returns the video path, if any.
+
+        The CLI output is read as it is produced so that progress bar updates
+        reach ``on_progress`` while the scene renders.
         """
 
         cmd = [
             "manim",
-            "-pql",
+            *quality_flags,
             "--media_dir",
-            temp_dir,
-            scene_file,
+            os.path.abspath(media_dir),
+            os.path.abspath(scene_file),
             scene_name,
         ]
+        # Run from the scene directory so relative image paths resolve
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=os.path.dirname(os.path.abspath(scene_file)),
+        )
+        output = []
+        frames = FrameCounter()
+        with process.stdout:
+            for chunk in iter(lambda: process.stdout.read1(4096), b""):
+                text = chunk.decode("utf-8", errors="replace")
+                output.append(text)
+                frames.feed(text)
+                progress = parse_render_progress(text)
+                if on_progress and progress:
+                    on_progress(progress)
+        if process.wait():
+            output = "".join(output)
+            raise subprocess.CalledProcessError(
+                process.returncode, cmd, output=output, stderr=output
+            )
+        metrics.increment("render_frames_total", frames.frames)
+        module_name = os.path.splitext(os.path.basename(scene_file))[0]
+        video_path = os.path.join(
+            media_dir,
+            "videos",
+            module_name,
+            VIDEO_DIRS[quality_flags[-1][-1]],
+            f"{scene_name}.mp4",
+        )
+        return video_path if os.path.exists(video_path) else None
 
-        try:
-            subprocess.run(cmd, check=True, capture_output=True, text=True)
-            video_path = os.path.join(
-                temp_dir, "videos", "scene", "480p15", f"{scene_name}.mp4"
+    def _render_sections(
+        self,
+        code: str,
+        section_names: List[str],
+        scene_name: str,
+        temp_dir: str,
+        media_dir: str,
+        quality_flags: list,
+        on_progress: Optional[ProgressFn] = None,
+    ) -> Optional[str]:
+        """Renders section scenes concurrently and concatenates them into one video.
+
+        Each section is rendered by its own manim process with a private media
+        directory below ``media_dir``, so up to ``section_workers`` sections use
+        separate cores; the warm backend uses a pool of that size, see
+        ``get_section_pool``. The partial videos share encoding settings and are
+        joined with ffmpeg's concat demuxer without re-encoding.
+
+        Raises:
+            subprocess.CalledProcessError: If a section fails to render
+            HTTPException: If joining the sections fails with status code 500
+        """
+
+        section_file = os.path.join(temp_dir, "sections.py")
+        with open(section_file, "w") as f:
+            f.write(code)
+
+        def render(index_name):
+            index, name = index_name
+            section_dir = os.path.join(media_dir, "sections", str(index))
+            section_progress = on_progress and (
+                lambda progress: on_progress(f"Section {index}, {progress}")
+            )
+            return self._render_one(
+                section_file,
+                name,
+                section_dir,
+                quality_flags,
+                section_progress,
+                pool,
             )
 
-            if not os.path.exists(video_path):
-                return None
+        pool = (
+            get_section_pool(self.section_workers)
+            if self.render_backend == "warm"
+            else None
+        )
+        workers = min(len(section_names), self.section_workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            section_videos = list(executor.map(render, enumerate(section_names)))
+        if not all(section_videos):
+            return None
 
-            temp_video = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-            with open(video_path, "rb") as f:
-                temp_video.write(f.read())
-            return temp_video.name
+        concat_list = os.path.join(temp_dir, "sections.txt")
+        with open(concat_list, "w") as f:
+            for video in section_videos:
+                escaped = video.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
 
+        video_path = os.path.join(temp_dir, f"{scene_name}.mp4")
+        cmd = [
+            "ffmpeg",
+            "-y",
+            "-f",
+            "concat",
+            "-safe",
+            "0",
+            "-i",
+            concat_list,
+            "-c",
+            "copy",
+            video_path,
+        ]
+        try:
+            subprocess.run(cmd, check=True, capture_output=True, text=True)
         except subprocess.CalledProcessError as e:
-            raise HTTPException(status_code=500, detail=f"Render error: {e.stderr}")
+            # Not a problem of the scene code, so not a RenderError to repair
+            raise HTTPException(status_code=500, detail=f"Concat error: {e.stderr}")
+        return video_path if os.path.exists(video_path) else None
+
+    def cached_video(self, cache_key: str) -> Optional[str]:
+        """Returns a previously rendered video from the render cache.
+
+        Args:
+            cache_key (str): Render cache key, e.g. a previous ``cache_key``
+
+        Returns:
+            Optional[str]: Path to an artifact of the video if it is still
+                cached, None otherwise
+        """
+
+        if not self.render_cache:
+            return None
+        cached_path = self.render_cache.get(cache_key)
+        if not cached_path:
+            return None
+        try:
+            return self.artifact_store.add(cached_path)
+        except FileNotFoundError:
+            return None
@@ -0,0 +1,372 @@
+import ast
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+
+# Scene methods that change what is on screen or advance the video
+SCENE_METHODS = {
+    "play",
+    "wait",
+    "add",
+    "remove",
+    "clear",
+    "bring_to_front",
+    "bring_to_back",
+    "add_foreground_mobject",
+    "add_foreground_mobjects",
+    "add_sound",
+}
+SHOWING_METHODS = SCENE_METHODS - {"wait", "remove", "clear", "add_sound"}
+# Animations that take their mobjects off screen
+REMOVING_ANIMATIONS = {
+    "FadeOut",
+    "Uncreate",
+    "Unwrite",
+    "ShrinkToCenter",
+    "FadeOutAndShift",
+}
+GROUP_ANIMATIONS = {"AnimationGroup", "Succession", "LaggedStart"}
+
+
+def _section_method(statement: ast.stmt, methods: Set[str]) -> Optional[str]:
+    """Returns the method name if a statement is a bare ``self.<method>()`` call."""
+
+    if not isinstance(statement, ast.Expr) or not isinstance(statement.value, ast.Call):
+        return None
+    func = statement.value.func
+    if (
+        isinstance(func, ast.Attribute)
+        and isinstance(func.value, ast.Name)
+        and func.value.id == "self"
+        and func.attr in methods
+    ):
+        return func.attr
+    return None
+
+
+def _self_attributes(node: ast.AST, ctx: type) -> Set[str]:
+    """Collects ``self.<attr>`` names used in the given context (Load or Store)."""
+
+    return {
+        child.attr
+        for child in ast.walk(node)
+        if isinstance(child, ast.Attribute)
+        and isinstance(child.value, ast.Name)
+        and child.value.id == "self"
+        and isinstance(child.ctx, ctx)
+    }
+
+
+def _uses_self(node: ast.AST) -> bool:
+    return any(
+        isinstance(child, ast.Name) and child.id == "self" for child in ast.walk(node)
+    )
+
+
+def _calls_self(node: ast.AST) -> bool:
+    return any(
+        isinstance(child, ast.Call)
+        and isinstance(child.func, ast.Attribute)
+        and _uses_self(child.func.value)
+        for child in ast.walk(node)
+    )
+
+
+def _names(node: ast.AST) -> Set[str]:
+    """Collects the variable names of an expression, without called functions."""
+
+    called = {
+        id(child.func) for child in ast.walk(node) if isinstance(child, ast.Call)
+    }
+    return {
+        child.id
+        for child in ast.walk(node)
+        if isinstance(child, ast.Name) and id(child) not in called
+    }
+
+
+def _leaf_animations(node: ast.AST) -> Iterator[Tuple[ast.AST, Set[str]]]:
+    """Yields the animations or mobjects of a scene method argument.
+
+    Lists, ``*`` arguments and animation groups are unpacked. Animations built
+    in a comprehension come with the names of the iterated collections.
+    """
+
+    if isinstance(node, ast.Starred):
+        yield from _leaf_animations(node.value)
+    elif isinstance(node, (ast.List, ast.Tuple)):
+        for element in node.elts:
+            yield from _leaf_animations(element)
+    elif isinstance(node, (ast.ListComp, ast.GeneratorExp)):
+        iterated = set().union(*(_names(loop.iter) for loop in node.generators))
+        for leaf, names in _leaf_animations(node.elt):
+            yield leaf, names | iterated
+    elif (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in GROUP_ANIMATIONS
+    ):
+        for argument in node.args:
+            yield from _leaf_animations(argument)
+    else:
+        yield node, set()
+
+
+def _on_screen(statements: List[ast.stmt], methods: Dict[str, ast.FunctionDef]) -> Set[str]:
+    """Returns the names of the mobjects that statements may leave on screen.
+
+    Scene method calls are followed in source order, including those of the
+    scene's own methods called along the way. A mobject counts as shown when
+    it is played or added and as gone once it is faded out, uncreated or
+    removed; fading out anything read from ``self``, like
+    ``*[FadeOut(m) for m in self.mobjects]``, and ``self.clear()`` empty the
+    screen. The tracking is by name, so it errs on the side of reporting
+    mobjects that are actually gone.
+    """
+
+    shown: Set[str] = set()
+    removed: Set[str] = set()
+
+    def visit(body: List[ast.stmt], active: frozenset) -> None:
+        nonlocal shown, removed
+        calls = sorted(
+            (
+                node
+                for statement in body
+                for node in ast.walk(statement)
+                if isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Attribute)
+                and isinstance(node.func.value, ast.Name)
+                and node.func.value.id == "self"
+            ),
+            key=lambda call: (call.lineno, call.col_offset),
+        )
+        for call in calls:
+            method = call.func.attr
+            if method in methods:
+                if method not in active:
+                    visit(methods[method].body, active | {method})
+                continue
+            if method == "clear":
+                shown, removed = set(), set()
+                continue
+            arguments = [*call.args, *(keyword.value for keyword in call.keywords)]
+            for argument in arguments:
+                for leaf, iterated in _leaf_animations(argument):
+                    names = _names(leaf) | iterated
+                    if (
+                        isinstance(leaf, ast.Call)
+                        and isinstance(leaf.func, ast.Name)
+                        and leaf.func.id in REMOVING_ANIMATIONS
+                    ):
+                        if "self" in names:
+                            shown, removed = set(), set()
+                        else:
+                            removed |= names
+                    elif method == "remove":
+                        removed |= names
+                    elif method in SHOWING_METHODS:
+                        shown |= names
+
+    visit(statements, frozenset())
+    return shown - removed
+
+
+def _bound_names(statements: List[ast.stmt]) -> Set[str]:
+    """Collects the local names assigned by statements of ``construct``."""
+
+    return {
+        node.id
+        for statement in statements
+        for node in ast.walk(statement)
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)
+    }
+
+
+def _split_preamble(preamble: List[ast.stmt]) -> Optional[List[ast.stmt]]:
+    """Returns the setup statements of a preamble, to be repeated in every section.
+
+    The animations of the preamble are only played in the first section. That
+    is only the same as the full scene if they leave nothing on screen, see
+    ``_on_screen``. Statements that do not use ``self`` are setup; statements
+    that use it in any other way than a bare scene method call make the
+    preamble unsafe to split.
+
+    Returns:
+        Optional[List[ast.stmt]]: Setup statements, or None if the preamble
+            cannot be split safely
+    """
+
+    setup: List[ast.stmt] = []
+    for statement in preamble:
+        if _section_method(statement, SCENE_METHODS):
+            call = statement.value
+            arguments = [*call.args, *(keyword.value for keyword in call.keywords)]
+            if any(map(_calls_self, arguments)):
+                return None
+        elif not _uses_self(statement):
+            setup.append(statement)
+        elif (
+            isinstance(statement, ast.Assign)
+            and all(isinstance(target, ast.Attribute) for target in statement.targets)
+            and not _calls_self(statement.value)
+        ):
+            # Configuration like ``self.camera.background_color = WHITE``
+            setup.append(statement)
+        else:
+            return None
+
+    if _on_screen(preamble, {}):
+        return None
+    return setup
+
+
+def _needed_setup(setup: List[ast.stmt], section: List[ast.stmt]) -> List[ast.stmt]:
+    """Drops the setup assignments whose names a section does not use."""
+
+    needed = set().union(*(_names(statement) for statement in section))
+    kept: List[ast.stmt] = []
+    for statement in reversed(setup):
+        if isinstance(statement, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            targets = getattr(statement, "targets", None) or [statement.target]
+            bound = set().union(*map(_names, targets))
+            if bound and not (bound & needed) and all(
+                isinstance(target, ast.Name) for target in targets
+            ):
+                continue
+        kept.append(statement)
+        needed |= _names(statement)
+    return kept[::-1]
+
+
+def split_scene_sections(code: str, scene_name: str) -> Optional[Tuple[str, List[str]]]:
+    """Splits a scene into independently renderable section scenes.
+
+    The ``construct`` method of ``scene_name`` is split on its top level
+    ``self.<method>()`` calls, which is how ``MANIM_SYSTEM_PROMPT`` asks for one
+    function per key concept. Every section becomes a subclass of the original
+    scene whose ``construct`` runs that call and the statements following it.
+    The statements before the first call are played in the first section only;
+    later sections repeat just their setup, see ``_split_preamble``. Other
+    classes of the code are left alone.
+
+    Each section is rendered in its own process from an empty screen, so the
+    scene is only split when its sections share no ``self`` attributes, no
+    section reads a local assigned by an earlier one and every section but the
+    last leaves nothing on screen, see ``_on_screen``.
+
+    Args:
+        code (str): Scene source code
+        scene_name (str): Name of the scene class to split
+
+    Returns:
+        Optional[Tuple[str, List[str]]]: Code extended with the section scenes
+            and their names in playback order, or None if the scene cannot be
+            split into at least two independent sections
+    """
+
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    scene = next(
+        (
+            node
+            for node in tree.body
+            if isinstance(node, ast.ClassDef) and node.name == scene_name
+        ),
+        None,
+    )
+    if scene is None:
+        return None
+    methods: Dict[str, ast.FunctionDef] = {
+        node.name: node for node in scene.body if isinstance(node, ast.FunctionDef)
+    }
+    construct = methods.pop("construct", None)
+    if construct is None:
+        return None
+
+    preamble: List[ast.stmt] = []
+    sections: List[List[ast.stmt]] = []
+    section_methods: List[str] = []
+    for statement in construct.body:
+        method = _section_method(statement, set(methods))
+        if method:
+            sections.append([statement])
+            section_methods.append(method)
+        elif sections:
+            sections[-1].append(statement)
+        else:
+            preamble.append(statement)
+
+    if len(sections) < 2:
+        return None
+    setup = _split_preamble(preamble)
+    if setup is None:
+        return None
+
+    stored = [
+        _self_attributes(methods[name], ast.Store)
+        | set().union(*(_self_attributes(s, ast.Store) for s in section))
+        for name, section in zip(section_methods, sections)
+    ]
+    loaded = [
+        _self_attributes(methods[name], ast.Load)
+        | set().union(*(_self_attributes(s, ast.Load) for s in section))
+        for name, section in zip(section_methods, sections)
+    ]
+    for i, attrs in enumerate(stored):
+        for j, used in enumerate(loaded):
+            if i != j and attrs & used:
+                return None
+
+    # Locals assigned by a section are gone in the next section's process
+    bound = [_bound_names(section) for section in sections]
+    read = [
+        set().union(*(_names(statement) for statement in section))
+        for section in sections
+    ]
+    for i, names in enumerate(bound):
+        if any(names & later for later in read[i + 1 :]):
+            return None
+
+    # The next section starts from an empty screen
+    if any(_on_screen(section, methods) for section in sections[:-1]):
+        return None
+
+    section_names = []
+    section_classes = []
+    for index, section in enumerate(sections, start=1):
+        name = f"{scene_name}Section{index}"
+        section_names.append(name)
+        section_classes.append(
+            ast.ClassDef(
+                name=name,
+                bases=[ast.Name(id=scene_name, ctx=ast.Load())],
+                keywords=[],
+                body=[
+                    ast.FunctionDef(
+                        name="construct",
+                        args=construct.args,
+                        body=[
+                            *(
+                                preamble
+                                if index == 1
+                                else _needed_setup(setup, section)
+                            ),
+                            *section,
+                        ],
+                        decorator_list=[],
+                        returns=None,
+                        type_params=[],
+                    )
+                ],
+                decorator_list=[],
+                type_params=[],
+            )
+        )
+
+    section_code = ast.unparse(
+        ast.fix_missing_locations(ast.Module(body=section_classes, type_ignores=[]))
+    )
+    return f"{code}\n\n\n{section_code}\n", section_names
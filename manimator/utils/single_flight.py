@@ -0,0 +1,156 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, List
+
+from manimator.utils import metrics
+
+
+class _Flight:
+    """Updates produced so far by an in-flight generator."""
+
+    def __init__(self):
+        self.updates: List[Any] = []
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one execution.
+
+    The first caller for a key runs the work; callers arriving with the same
+    key while it is in flight wait for it and receive the same result, or the
+    same exception. Keys are forgotten as soon as the work finishes, so later
+    calls run again (and are usually served by the pipeline caches). Attached
+    callers are counted in the ``single_flight_coalesced_total`` metric.
+
+    Args:
+        name (str): Label of the coalesced operation in metrics
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, Future] = {}
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Runs ``fn`` unless a call with the same key is in flight.
+
+        Args:
+            key (Hashable): Normalized identity of the request
+            fn (Callable[[], Any]): The work
+
+        Returns:
+            Any: Result of the single execution of ``fn``
+        """
+
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            metrics.increment("single_flight_coalesced_total", operation=self.name)
+            return future.result()
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return future.result()
+
+    def stream(self, key: Hashable, fn: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+        """Shares the updates of a generator between identical concurrent calls.
+
+        The generator runs in a background thread, so it completes for every
+        attached caller even if the caller that started it goes away. Callers
+        that attach late first receive the updates they missed.
+
+        Args:
+            key (Hashable): Normalized identity of the request
+            fn (Callable[[], Iterator[Any]]): Creates the generator
+
+        Yields:
+            Any: Every update of the single generator run
+        """
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if leader:
+            threading.Thread(
+                target=self._pump, args=(key, flight, fn), daemon=True
+            ).start()
+        else:
+            metrics.increment("single_flight_coalesced_total", operation=self.name)
+
+        index = 0
+        while True:
+            with flight.condition:
+                while index == len(flight.updates) and not flight.done:
+                    flight.condition.wait()
+                updates = flight.updates[index:]
+                done = flight.done
+            index += len(updates)
+            yield from updates
+            if done:
+                if flight.error is not None:
+                    raise flight.error
+                return
+
+    def _pump(self, key: Hashable, flight: _Flight, fn: Callable[[], Iterator[Any]]):
+        try:
+            for update in fn():
+                with flight.condition:
+                    flight.updates.append(update)
+                    flight.condition.notify_all()
+        except BaseException as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                del self._flights[key]
+            with flight.condition:
+                flight.done = True
+                flight.condition.notify_all()
+
+
+class AsyncSingleFlight:
+    """``SingleFlight`` for coroutines running on one event loop.
+
+    The shared coroutine runs as a task and is shielded from the callers, so a
+    client disconnecting does not cancel the work for the others.
+
+    Args:
+        name (str): Label of the coalesced operation in metrics
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Awaits ``fn()`` unless a call with the same key is in flight.
+
+        Args:
+            key (Hashable): Normalized identity of the request
+            fn (Callable[[], Awaitable[Any]]): Creates the coroutine
+
+        Returns:
+            Any: Result of the single execution of ``fn``
+        """
+
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        else:
+            metrics.increment("single_flight_coalesced_total", operation=self.name)
+        return await asyncio.shield(task)
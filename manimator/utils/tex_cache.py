@@ -0,0 +1,250 @@
+import ast
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from typing import Iterable, List, Optional, Set, Tuple
+
+from manimator.utils import metrics
+from manimator.utils.validation import extract_tex_strings
+
+
+DEFAULT_TEX_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "manimator", "tex"
+)
+DEFAULT_TEX_CACHE_MAX_BYTES = 512 * 1024**2
+
+
+class TexCache:
+    """Deployment-wide cache of compiled ``MathTex``/``Tex`` SVGs.
+
+    Manim names every compiled formula ``<hash>.svg`` in its ``Tex`` directory,
+    where the hash covers the full LaTeX document, i.e. the tex template and the
+    expression, and skips compilation when that file already exists. Before a
+    render, ``prepare`` hardlinks the cached SVGs of the scene's formulas into
+    the render's private ``Tex`` directory; afterwards ``publish`` atomically
+    adds the newly compiled SVGs to the shared directory. Renders never write
+    into the shared directory directly, so concurrent renders cannot observe
+    half-written files.
+
+    The SVGs of a formula are found through an index from the LaTeX string of
+    the ``MathTex``/``Tex`` call to the SVGs compiled from documents containing
+    it, so preparing a render costs one lookup per formula of the scene, not a
+    pass over the whole cache. Every entry is an empty file
+    ``index/<formula hash>/<svg name>``, so concurrent renders add entries
+    without rewriting each other's. A stale entry only means an SVG manim does
+    not use; formulas missing from the index are compiled as usual.
+
+    Least recently used SVGs are evicted once the cache exceeds ``max_bytes``.
+    Hits and misses are counted in the ``tex_cache_hits_total`` and
+    ``tex_cache_misses_total`` metrics.
+
+    Args:
+        cache_dir (Optional[str]): Shared SVG directory. Defaults to env TEX_CACHE_DIR
+        max_bytes (Optional[int]): Size limit. Defaults to env TEX_CACHE_MAX_BYTES
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = (
+            cache_dir or os.getenv("TEX_CACHE_DIR") or DEFAULT_TEX_CACHE_DIR
+        )
+        if max_bytes is None:
+            max_bytes = int(
+                os.getenv("TEX_CACHE_MAX_BYTES") or DEFAULT_TEX_CACHE_MAX_BYTES
+            )
+        self.max_bytes = max_bytes
+        self.index_dir = os.path.join(self.cache_dir, "index")
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    def _index_path(self, tex: str) -> str:
+        digest = hashlib.sha256(tex.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.index_dir, digest)
+
+    def _indexed(self, tex: str) -> Set[str]:
+        try:
+            return set(os.listdir(self._index_path(tex)))
+        except FileNotFoundError:
+            return set()
+
+    def _index(self, tex: str, svg_names: Set[str]) -> None:
+        path = self._index_path(tex)
+        for svg_name in svg_names:
+            while True:
+                os.makedirs(path, exist_ok=True)
+                try:
+                    open(os.path.join(path, svg_name), "a").close()
+                    break
+                except FileNotFoundError:
+                    # Removed as empty by a concurrent ``_prune_index``
+                    continue
+
+    def prepare(
+        self, tex_dir: str, tex_strings: Iterable[str] = ()
+    ) -> Tuple[Set[str], float]:
+        """Seeds a render's ``Tex`` directory with the cached SVGs of its formulas.
+
+        Args:
+            tex_dir (str): The render's ``Tex`` directory, ``<media_dir>/Tex``
+            tex_strings (Iterable[str]): LaTeX strings of the scene, see
+                ``scene_tex_strings``
+
+        Returns:
+            Tuple[Set[str], float]: Names of the seeded SVGs and the time the
+                render started, to be passed to ``publish``
+        """
+
+        started_at = time.time()
+        os.makedirs(tex_dir, exist_ok=True)
+        seeded = set()
+        for name in set().union(*map(self._indexed, set(tex_strings))):
+            if os.path.exists(os.path.join(tex_dir, name)):
+                seeded.add(name)
+                continue
+            shared_path = os.path.join(self.cache_dir, name)
+            try:
+                os.link(shared_path, os.path.join(tex_dir, name))
+            except FileNotFoundError:
+                continue
+            except OSError:
+                # No hardlinks across filesystems, copy the SVG instead
+                shutil.copyfile(shared_path, os.path.join(tex_dir, name))
+            seeded.add(name)
+        return seeded, started_at
+
+    def publish(
+        self,
+        tex_dir: str,
+        seeded: Set[str],
+        started_at: float,
+        tex_strings: Iterable[str] = (),
+    ) -> Tuple[int, int]:
+        """Adds the SVGs compiled by a render to the shared cache and its index.
+
+        Args:
+            tex_dir (str): The render's ``Tex`` directory
+            seeded (Set[str]): SVG names returned by ``prepare``
+            started_at (float): Render start time returned by ``prepare``
+            tex_strings (Iterable[str]): LaTeX strings passed to ``prepare``
+
+        Returns:
+            Tuple[int, int]: Number of formulas served from the cache and number
+                of formulas compiled by this render
+        """
+
+        hits = misses = 0
+        if not os.path.isdir(tex_dir):
+            return hits, misses
+        # Longest first, so that a document is indexed under its own formula
+        # rather than under a short string like "x" that it happens to contain
+        tex_strings = sorted(set(tex_strings), key=len, reverse=True)
+        compiled = {}
+        for name in os.listdir(tex_dir):
+            if not name.endswith(".tex"):
+                continue
+            tex_path = os.path.join(tex_dir, name)
+            svg_name = name[: -len(".tex")] + ".svg"
+            svg_path = os.path.join(tex_dir, svg_name)
+            try:
+                if os.stat(tex_path).st_mtime < started_at:
+                    # Written by an earlier render of the same project directory
+                    continue
+            except FileNotFoundError:
+                continue
+            if svg_name in seeded:
+                hits += 1
+                shared_path = os.path.join(self.cache_dir, svg_name)
+                if os.path.exists(shared_path):
+                    os.utime(shared_path)
+            elif os.path.exists(svg_path):
+                misses += 1
+                self._add(svg_path, svg_name)
+                try:
+                    with open(tex_path, encoding="utf-8", errors="replace") as f:
+                        document = f.read()
+                except FileNotFoundError:
+                    continue
+                tex = next((tex for tex in tex_strings if tex in document), None)
+                if tex is not None:
+                    compiled.setdefault(tex, set()).add(svg_name)
+
+        for tex, svg_names in compiled.items():
+            self._index(tex, svg_names)
+
+        metrics.increment("tex_cache_hits_total", hits)
+        metrics.increment("tex_cache_misses_total", misses)
+        if misses:
+            self.evict()
+        return hits, misses
+
+    def _add(self, svg_path: str, svg_name: str) -> None:
+        tmp_path = os.path.join(self.cache_dir, f".{svg_name}.{uuid.uuid4().hex}.tmp")
+        try:
+            try:
+                os.link(svg_path, tmp_path)
+            except OSError:
+                shutil.copyfile(svg_path, tmp_path)
+            os.replace(tmp_path, os.path.join(self.cache_dir, svg_name))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def evict(self) -> None:
+        """Removes least recently used SVGs until the cache fits in ``max_bytes``."""
+
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".svg"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        removed = False
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed = True
+        if removed:
+            self._prune_index()
+
+    def _prune_index(self) -> None:
+        """Removes index entries of evicted SVGs, and formulas left without any."""
+
+        for name in os.listdir(self.index_dir):
+            path = os.path.join(self.index_dir, name)
+            try:
+                svg_names = os.listdir(path)
+            except FileNotFoundError:
+                continue
+            for svg_name in svg_names:
+                if not os.path.exists(os.path.join(self.cache_dir, svg_name)):
+                    try:
+                        os.remove(os.path.join(path, svg_name))
+                    except FileNotFoundError:
+                        pass
+            try:
+                os.rmdir(path)
+            except OSError:
+                # Not empty, or already removed
+                pass
+
+
+def scene_tex_strings(code: str) -> List[str]:
+    """Returns the constant ``MathTex``/``Tex`` strings of scene code, for ``TexCache``."""
+
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    return [tex for _, tex, _ in extract_tex_strings(tree)]
@@ -0,0 +1,292 @@
+import ast
+import builtins
+import functools
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from typing import List, Optional, Set, Tuple
+from fastapi import HTTPException
+
+
+TEX_CLASSES = {"MathTex": "math", "Tex": "text", "SingleStringMathTex": "math"}
+
+# Used when manim, and so its TexTemplate, is not installed
+LATEX_PREAMBLE = r"""\documentclass{article}
+\usepackage[english]{babel}
+\usepackage{amsmath}
+\usepackage{amssymb}
+\begin{document}
+"""
+
+
+class CodeValidationError(HTTPException):
+    """Raised when generated Manim code fails static validation.
+
+    The detail lists every issue found, so it can be shown to the user or fed
+    back to the model to regenerate the code.
+
+    Args:
+        issues (List[str]): Human readable descriptions of the problems
+    """
+
+    def __init__(self, issues: List[str]):
+        self.issues = issues
+        super().__init__(
+            status_code=422,
+            detail="Invalid Manim code:\n" + "\n".join(f"- {issue}" for issue in issues),
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def get_manim_names() -> Optional[frozenset]:
+    """Returns the names exported by ``from manim import *``.
+
+    Returns:
+        Optional[frozenset]: Exported names, or None if manim is not installed
+    """
+
+    try:
+        import manim
+    except ImportError:
+        return None
+    if hasattr(manim, "__all__"):
+        return frozenset(manim.__all__)
+    return frozenset(name for name in dir(manim) if not name.startswith("_"))
+
+
+@functools.lru_cache(maxsize=None)
+def get_latex_preamble() -> str:
+    """Returns the start of the document manim compiles MathTex/Tex strings in.
+
+    Built from manim's configured ``TexTemplate``, so that strings are checked
+    with the packages, and document class, they will be rendered with.
+
+    Returns:
+        str: Document class and preamble up to ``\\begin{document}``, or
+            ``LATEX_PREAMBLE`` if manim is not installed
+    """
+
+    try:
+        from manim import config
+    except ImportError:
+        return LATEX_PREAMBLE
+    template = getattr(config, "tex_template", None)
+    documentclass = getattr(template, "documentclass", None)
+    preamble = getattr(template, "preamble", None)
+    if not isinstance(documentclass, str) or not isinstance(preamble, str):
+        return LATEX_PREAMBLE
+    post_doc_commands = getattr(template, "post_doc_commands", "") or ""
+    return "\n".join(
+        [documentclass, preamble, r"\begin{document}", post_doc_commands, ""]
+    )
+
+
+def _bound_names(tree: ast.AST) -> Set[str]:
+    """Collects every name bound anywhere in the module, ignoring scopes."""
+
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                names.add((alias.asname or alias.name).split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+        elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+            names.add(node.name)
+        elif isinstance(node, ast.MatchMapping) and node.rest:
+            names.add(node.rest)
+    return names
+
+
+def find_undefined_names(tree: ast.Module, known: Set[str]) -> List[Tuple[str, int]]:
+    """Finds names that are used but never bound, imported or provided by ``known``.
+
+    The analysis is deliberately flow insensitive: a name bound anywhere in
+    the module counts as defined everywhere, which keeps false positives out
+    while still catching misspelled or hallucinated classes and variables.
+
+    Args:
+        tree (ast.Module): Parsed scene code
+        known (Set[str]): Names available through star imports
+
+    Returns:
+        List[Tuple[str, int]]: Undefined names with the line of their first use
+    """
+
+    defined = _bound_names(tree) | set(dir(builtins)) | known
+    undefined = {}
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Name)
+            and isinstance(node.ctx, ast.Load)
+            and node.id not in defined
+        ):
+            undefined.setdefault(node.id, node.lineno)
+    return sorted(undefined.items(), key=lambda item: item[1])
+
+
+def extract_tex_strings(tree: ast.Module) -> List[Tuple[str, str, int]]:
+    """Extracts the constant LaTeX strings passed to ``MathTex``/``Tex``.
+
+    Args:
+        tree (ast.Module): Parsed scene code
+
+    Returns:
+        List[Tuple[str, str, int]]: ``(mode, tex, line)`` per call, where mode is
+            ``math`` or ``text``. Calls with non constant arguments are skipped
+    """
+
+    tex_strings = []
+    for node in ast.walk(tree):
+        if not (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Name)
+            and node.func.id in TEX_CLASSES
+            and node.args
+        ):
+            continue
+        if not all(
+            isinstance(arg, ast.Constant) and isinstance(arg.value, str)
+            for arg in node.args
+        ):
+            continue
+        separator = " " if TEX_CLASSES[node.func.id] == "math" else ""
+        tex = separator.join(arg.value for arg in node.args)
+        tex_strings.append((TEX_CLASSES[node.func.id], tex, node.lineno))
+    return tex_strings
+
+
+def check_latex(tex_strings: List[Tuple[str, str, int]], timeout: int = 30) -> List[str]:
+    """Compiles all LaTeX strings of a scene in a single LaTeX run.
+
+    Every string goes into the same document, wrapped like manim wraps it
+    (``align*`` for math). Errors reported in the LaTeX log are mapped back to
+    the string, and the scene line, that produced them.
+
+    Args:
+        tex_strings (List[Tuple[str, str, int]]): Output of ``extract_tex_strings``
+        timeout (int): Seconds before the LaTeX run is abandoned
+
+    Returns:
+        List[str]: One issue per failing string. Empty if everything compiles or
+            no ``latex`` binary is available
+    """
+
+    if not tex_strings or not shutil.which("latex"):
+        return []
+
+    lines = get_latex_preamble().splitlines()
+    ranges = []
+    for mode, tex, _ in tex_strings:
+        start = len(lines) + 1
+        if mode == "math":
+            lines.extend([r"\begin{align*}", tex, r"\end{align*}"])
+        else:
+            lines.extend([tex, r"\par"])
+        ranges.append((start, len(lines)))
+    lines.append(r"\end{document}")
+
+    with tempfile.TemporaryDirectory() as tex_dir:
+        tex_file = os.path.join(tex_dir, "validate.tex")
+        with open(tex_file, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        try:
+            result = subprocess.run(
+                ["latex", "-interaction=nonstopmode", "-no-shell-escape", tex_file],
+                cwd=tex_dir,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            return ["LaTeX compilation timed out"]
+    if result.returncode == 0:
+        return []
+
+    issues = []
+    failing = set()
+    error = None
+    for log_line in result.stdout.splitlines():
+        if log_line.startswith("! "):
+            error = log_line[2:].strip()
+            continue
+        match = re.match(r"l\.(\d+)", log_line)
+        if not (error and match):
+            continue
+        tex_line = int(match.group(1))
+        for index, (start, end) in enumerate(ranges):
+            if start <= tex_line <= end and index not in failing:
+                failing.add(index)
+                _, tex, scene_line = tex_strings[index]
+                issues.append(f"line {scene_line}: LaTeX error in {tex!r}: {error}")
+                break
+        error = None
+    return issues or ["LaTeX compilation failed"]
+
+
+def validate_scene_code(code: str, scene_name: Optional[str] = None) -> str:
+    """Statically validates generated Manim code before it is rendered.
+
+    Checks that the code parses, defines a Scene subclass with a ``construct``
+    method, only uses names that are defined or exported by manim, and that all
+    constant ``MathTex``/``Tex`` strings compile with LaTeX.
+
+    Args:
+        code (str): Scene code as returned by ``ManimProcessor.extract_code``
+        scene_name (Optional[str]): Scene class expected in the code. Defaults
+            to the first Scene subclass
+
+    Returns:
+        str: Name of the validated scene class
+
+    Raises:
+        CodeValidationError: With every issue found, status code 422
+    """
+
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        raise CodeValidationError([f"line {e.lineno}: syntax error: {e.msg}"])
+
+    scenes = {
+        node.name: node
+        for node in tree.body
+        if isinstance(node, ast.ClassDef)
+        and any(
+            isinstance(base, ast.Name) and base.id.endswith("Scene")
+            for base in node.bases
+        )
+    }
+    if not scenes:
+        raise CodeValidationError(["no Scene subclass found"])
+    scene_name = scene_name or next(iter(scenes))
+    if scene_name not in scenes:
+        raise CodeValidationError([f"Scene class {scene_name} not found"])
+
+    issues = []
+    if not any(
+        isinstance(node, ast.FunctionDef) and node.name == "construct"
+        for node in scenes[scene_name].body
+    ):
+        issues.append(f"{scene_name} has no construct method")
+
+    manim_names = get_manim_names()
+    if manim_names is not None:
+        for name, line in find_undefined_names(tree, set(manim_names)):
+            issues.append(f"line {line}: undefined name {name!r}")
+
+    if not issues:
+        issues.extend(check_latex(extract_tex_strings(tree)))
+    if issues:
+        raise CodeValidationError(issues)
+    return scene_name